@@ -0,0 +1,295 @@
+"""baseline schema
+
+Tables as created by Base.metadata.create_all before migrations were
+introduced. Databases created that way are stamped at this revision by
+app.core.schema.upgrade_database instead of running it.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 10:37:28.870409
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.String(), nullable=False),
+    sa.Column('category_name', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=True),
+    sa.Column('last_sync', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_categories_category_id'), 'categories', ['category_id'], unique=False)
+    op.create_index(op.f('ix_categories_id'), 'categories', ['id'], unique=False)
+    op.create_index(op.f('ix_categories_subscription_id'), 'categories', ['subscription_id'], unique=False)
+    op.create_index(op.f('ix_categories_type'), 'categories', ['type'], unique=False)
+
+    op.create_table('episode_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('series_id', sa.Integer(), nullable=True),
+    sa.Column('season_num', sa.Integer(), nullable=True),
+    sa.Column('episode_num', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('container_extension', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_episode_cache_id'), 'episode_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_episode_cache_series_id'), 'episode_cache', ['series_id'], unique=False)
+    op.create_index(op.f('ix_episode_cache_subscription_id'), 'episode_cache', ['subscription_id'], unique=False)
+
+    op.create_table('m3u_group_hashes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('m3u_source_id', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=False),
+    sa.Column('group_title', sa.String(), nullable=False),
+    sa.Column('content_hash', sa.String(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('m3u_source_id', 'content_type', 'group_title', name='uq_m3u_group_hashes_group')
+    )
+    op.create_index(op.f('ix_m3u_group_hashes_id'), 'm3u_group_hashes', ['id'], unique=False)
+    op.create_index(op.f('ix_m3u_group_hashes_m3u_source_id'), 'm3u_group_hashes', ['m3u_source_id'], unique=False)
+
+    op.create_table('m3u_sources',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('source_type', sa.Enum('URL', 'FILE', name='sourcetype'), nullable=False),
+    sa.Column('url', sa.String(), nullable=True),
+    sa.Column('file_path', sa.String(), nullable=True),
+    sa.Column('output_dir', sa.String(), nullable=False),
+    sa.Column('movies_dir', sa.String(), nullable=True),
+    sa.Column('series_dir', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('sync_status', sa.String(), nullable=True),
+    sa.Column('last_sync', sa.DateTime(), nullable=True),
+    sa.Column('m3u_hash', sa.String(), nullable=True),
+    sa.Column('http_etag', sa.String(), nullable=True),
+    sa.Column('http_last_modified', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_m3u_sources_id'), 'm3u_sources', ['id'], unique=False)
+    op.create_index(op.f('ix_m3u_sources_name'), 'm3u_sources', ['name'], unique=True)
+
+    op.create_table('m3u_sync_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('m3u_source_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('last_sync', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('items_added', sa.Integer(), nullable=False),
+    sa.Column('items_deleted', sa.Integer(), nullable=False),
+    sa.Column('error_message', sa.String(), nullable=True),
+    sa.Column('task_id', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_m3u_sync_state_id'), 'm3u_sync_state', ['id'], unique=False)
+    op.create_index(op.f('ix_m3u_sync_state_m3u_source_id'), 'm3u_sync_state', ['m3u_source_id'], unique=False)
+
+    op.create_table('movie_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('stream_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('category_id', sa.String(), nullable=True),
+    sa.Column('container_extension', sa.String(), nullable=True),
+    sa.Column('tmdb_id', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_movie_cache_id'), 'movie_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_movie_cache_stream_id'), 'movie_cache', ['stream_id'], unique=False)
+    op.create_index(op.f('ix_movie_cache_subscription_id'), 'movie_cache', ['subscription_id'], unique=False)
+
+    op.create_table('output_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_type', sa.String(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('root', sa.String(), nullable=False),
+    sa.Column('rel_path', sa.String(), nullable=False),
+    sa.Column('source_key', sa.String(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('root', 'rel_path', name='uq_output_files_root_path')
+    )
+    op.create_index(op.f('ix_output_files_id'), 'output_files', ['id'], unique=False)
+    op.create_index('ix_output_files_owner_source', 'output_files', ['owner_type', 'owner_id', 'source_key'], unique=False)
+    op.create_index(op.f('ix_output_files_root'), 'output_files', ['root'], unique=False)
+
+    op.create_table('reconcile_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('root', sa.String(), nullable=False),
+    sa.Column('cursor', sa.String(), nullable=True),
+    sa.Column('pass_started_at', sa.DateTime(), nullable=True),
+    sa.Column('last_run', sa.DateTime(), nullable=True),
+    sa.Column('last_completed', sa.DateTime(), nullable=True),
+    sa.Column('dirs_scanned', sa.Integer(), nullable=False),
+    sa.Column('entries_scanned', sa.Integer(), nullable=False),
+    sa.Column('orphans_removed', sa.Integer(), nullable=False),
+    sa.Column('missing_found', sa.Integer(), nullable=False),
+    sa.Column('error_message', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reconcile_state_id'), 'reconcile_state', ['id'], unique=False)
+    op.create_index(op.f('ix_reconcile_state_root'), 'reconcile_state', ['root'], unique=True)
+
+    op.create_table('schedules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.Enum('MOVIES', 'SERIES', name='synctype'), nullable=False),
+    sa.Column('enabled', sa.Boolean(), nullable=False),
+    sa.Column('frequency', sa.Enum('FIVE_MINUTES', 'HOURLY', 'SIX_HOURS', 'TWELVE_HOURS', 'DAILY', 'WEEKLY', name='frequency'), nullable=False),
+    sa.Column('last_run', sa.DateTime(), nullable=True),
+    sa.Column('next_run', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_schedules_id'), 'schedules', ['id'], unique=False)
+    op.create_index(op.f('ix_schedules_subscription_id'), 'schedules', ['subscription_id'], unique=False)
+
+    op.create_table('selected_categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.String(), nullable=True),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_selected_categories_category_id'), 'selected_categories', ['category_id'], unique=False)
+    op.create_index(op.f('ix_selected_categories_id'), 'selected_categories', ['id'], unique=False)
+    op.create_index(op.f('ix_selected_categories_subscription_id'), 'selected_categories', ['subscription_id'], unique=False)
+    op.create_index(op.f('ix_selected_categories_type'), 'selected_categories', ['type'], unique=False)
+
+    op.create_table('series_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('series_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('category_id', sa.String(), nullable=True),
+    sa.Column('tmdb_id', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_series_cache_id'), 'series_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_series_cache_series_id'), 'series_cache', ['series_id'], unique=False)
+    op.create_index(op.f('ix_series_cache_subscription_id'), 'series_cache', ['subscription_id'], unique=False)
+
+    op.create_table('settings',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('value', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_settings_key'), 'settings', ['key'], unique=False)
+
+    op.create_table('subscriptions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('xtream_url', sa.String(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=False),
+    sa.Column('movies_dir', sa.String(), nullable=False),
+    sa.Column('series_dir', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_subscriptions_id'), 'subscriptions', ['id'], unique=False)
+    op.create_index(op.f('ix_subscriptions_name'), 'subscriptions', ['name'], unique=True)
+
+    op.create_table('sync_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subscription_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('last_sync', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('items_added', sa.Integer(), nullable=False),
+    sa.Column('items_deleted', sa.Integer(), nullable=False),
+    sa.Column('error_message', sa.String(), nullable=True),
+    sa.Column('task_id', sa.String(), nullable=True),
+    sa.Column('progress_current', sa.Integer(), nullable=False),
+    sa.Column('progress_total', sa.Integer(), nullable=False),
+    sa.Column('progress_phase', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sync_state_id'), 'sync_state', ['id'], unique=False)
+    op.create_index(op.f('ix_sync_state_subscription_id'), 'sync_state', ['subscription_id'], unique=False)
+
+    op.create_table('m3u_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('m3u_source_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('group_title', sa.String(), nullable=True),
+    sa.Column('logo', sa.String(), nullable=True),
+    sa.Column('tvg_id', sa.String(), nullable=True),
+    sa.Column('tvg_name', sa.String(), nullable=True),
+    sa.Column('entry_type', sa.Enum('MOVIE', 'SERIES', name='entrytype'), nullable=False),
+    sa.Column('entry_key', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['m3u_source_id'], ['m3u_sources.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_m3u_entries_id'), 'm3u_entries', ['id'], unique=False)
+    op.create_index(op.f('ix_m3u_entries_m3u_source_id'), 'm3u_entries', ['m3u_source_id'], unique=False)
+
+    op.create_table('m3u_selections',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('m3u_source_id', sa.Integer(), nullable=False),
+    sa.Column('group_title', sa.String(), nullable=False),
+    sa.Column('selection_type', sa.Enum('MOVIE', 'SERIES', name='selectiontype'), nullable=False),
+    sa.ForeignKeyConstraint(['m3u_source_id'], ['m3u_sources.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_m3u_selections_id'), 'm3u_selections', ['id'], unique=False)
+    op.create_index(op.f('ix_m3u_selections_m3u_source_id'), 'm3u_selections', ['m3u_source_id'], unique=False)
+
+    op.create_table('schedule_executions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('schedule_id', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.Enum('SUCCESS', 'FAILED', 'CANCELLED', 'RUNNING', name='executionstatus'), nullable=False),
+    sa.Column('items_processed', sa.Integer(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['schedule_id'], ['schedules.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_schedule_executions_id'), 'schedule_executions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('schedule_executions')
+    op.drop_table('m3u_selections')
+    op.drop_table('m3u_entries')
+    op.drop_table('sync_state')
+    op.drop_table('subscriptions')
+    op.drop_table('settings')
+    op.drop_table('series_cache')
+    op.drop_table('selected_categories')
+    op.drop_table('schedules')
+    op.drop_table('reconcile_state')
+    op.drop_table('output_files')
+    op.drop_table('movie_cache')
+    op.drop_table('m3u_sync_state')
+    op.drop_table('m3u_sources')
+    op.drop_table('m3u_group_hashes')
+    op.drop_table('episode_cache')
+    op.drop_table('categories')
+    # Named enum types outlive their tables on PostgreSQL
+    for name in ('executionstatus', 'selectiontype', 'entrytype', 'frequency', 'synctype', 'sourcetype'):
+        sa.Enum(name=name).drop(op.get_bind(), checkfirst=True)
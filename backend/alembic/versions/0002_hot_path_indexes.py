@@ -0,0 +1,55 @@
+"""hot path indexes
+
+Composite indexes for the filters the sync tasks, the scheduler and the
+selection pages run on every request, and a unique index making the sync
+state row per (subscription, type) a guarantee instead of a convention.
+
+The M3U entry indexes were previously created at startup by
+add_missing_columns, so every index is created only if it does not exist.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 11:02:41.518236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_categories_subscription_type', 'categories', ['subscription_id', 'type']),
+    ('ix_selected_categories_subscription_type', 'selected_categories', ['subscription_id', 'type']),
+    ('ix_movie_cache_subscription_stream', 'movie_cache', ['subscription_id', 'stream_id']),
+    ('ix_series_cache_subscription_series', 'series_cache', ['subscription_id', 'series_id']),
+    ('ix_schedules_enabled_next_run', 'schedules', ['enabled', 'next_run']),
+    ('ix_m3u_entries_source_key', 'm3u_entries', ['m3u_source_id', 'entry_key']),
+    ('ix_m3u_entries_source_group', 'm3u_entries', ['m3u_source_id', 'group_title', 'entry_type']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+    # Concurrent "create if missing" could leave duplicate sync states; keep
+    # the oldest row, which is the one .first() has been returning
+    op.execute(sa.text(
+        "DELETE FROM sync_state WHERE id NOT IN "
+        "(SELECT MIN(id) FROM sync_state GROUP BY subscription_id, type)"
+    ))
+    op.create_index('ux_sync_state_subscription_type', 'sync_state', ['subscription_id', 'type'],
+                    unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_sync_state_subscription_type', table_name='sync_state', if_exists=True)
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,44 @@
+"""unique cache keys
+
+A provider item is cached once per subscription. Making that a unique
+index lets the sync tasks write the cache with INSERT .. ON CONFLICT
+instead of a SELECT per row.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 13:15:07.204511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, item column, index replaced, unique index)
+KEYS = [
+    ('movie_cache', 'stream_id', 'ix_movie_cache_subscription_stream', 'ux_movie_cache_subscription_stream'),
+    ('series_cache', 'series_id', 'ix_series_cache_subscription_series', 'ux_series_cache_subscription_series'),
+]
+
+
+def upgrade() -> None:
+    for table, item_column, index, unique_index in KEYS:
+        op.execute(sa.text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MIN(id) FROM {table} GROUP BY subscription_id, {item_column})"
+        ))
+        op.drop_index(index, table_name=table, if_exists=True)
+        op.create_index(unique_index, table, ['subscription_id', item_column], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for table, item_column, index, unique_index in KEYS:
+        op.drop_index(unique_index, table_name=table, if_exists=True)
+        op.create_index(index, table, ['subscription_id', item_column], unique=False, if_not_exists=True)
@@ -0,0 +1,58 @@
+"""content stats
+
+Item counts per source for the dashboard, kept up to date by the sync
+tasks instead of being counted over the cache tables on every poll.
+Existing counts are filled in from the cache.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 15:42:10.381627
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A database created by create_all before it was stamped already has the table
+    if not sa.inspect(op.get_bind()).has_table('content_stats'):
+        op.create_table('content_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_type', sa.String(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('movies', sa.Integer(), nullable=False),
+        sa.Column('series', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source_type', 'source_id', name='uq_content_stats_source')
+        )
+        op.create_index(op.f('ix_content_stats_id'), 'content_stats', ['id'], unique=False)
+
+    op.execute(sa.text(
+        "INSERT INTO content_stats (source_type, source_id, movies, series, updated_at) "
+        "SELECT 'xtream', s.id, "
+        "(SELECT COUNT(*) FROM movie_cache WHERE subscription_id = s.id), "
+        "(SELECT COUNT(*) FROM series_cache WHERE subscription_id = s.id), "
+        "CURRENT_TIMESTAMP FROM subscriptions s"
+    ))
+    op.execute(sa.text(
+        "INSERT INTO content_stats (source_type, source_id, movies, series, updated_at) "
+        "SELECT 'm3u', s.id, "
+        "(SELECT COUNT(*) FROM m3u_entries WHERE m3u_source_id = s.id AND entry_type = 'MOVIE'), "
+        "(SELECT COUNT(*) FROM m3u_entries WHERE m3u_source_id = s.id AND entry_type = 'SERIES'), "
+        "CURRENT_TIMESTAMP FROM m3u_sources s"
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_content_stats_id'), table_name='content_stats')
+    op.drop_table('content_stats')
@@ -0,0 +1,40 @@
+"""browse indexes
+
+Indexes for the paginated browse API: rows of one source ordered by
+title, optionally within a group or category, so every page is an index
+seek regardless of the catalogue size.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 17:08:52.640193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_m3u_entries_source_title', 'm3u_entries', ['m3u_source_id', 'title']),
+    ('ix_m3u_entries_source_group_title', 'm3u_entries', ['m3u_source_id', 'group_title', 'title']),
+    ('ix_movie_cache_subscription_name', 'movie_cache', ['subscription_id', 'name']),
+    ('ix_movie_cache_subscription_category_name', 'movie_cache', ['subscription_id', 'category_id', 'name']),
+    ('ix_series_cache_subscription_name', 'series_cache', ['subscription_id', 'name']),
+    ('ix_series_cache_subscription_category_name', 'series_cache', ['subscription_id', 'category_id', 'name']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,90 @@
+"""title search
+
+Full-text index over the titles of every cached catalogue: movies, series
+and episodes of Xtream subscriptions and M3U entries.
+
+On SQLite this is one FTS5 table, `title_search`. Its rowid encodes the
+indexed row as `id * 4 + kind` (see app.services.title_search), and
+triggers on the cache tables keep it up to date with every insert, update
+and delete the syncs make, one row at a time. Existing rows are indexed
+here. On PostgreSQL every cache table gets a GIN index over the tsvector
+of its title instead, which the database maintains by itself.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 18:21:37.905114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (kind, table, title column, owner column); kinds are part of the stored rowids
+INDEXED = [
+    (0, 'movie_cache', 'name', 'subscription_id'),
+    (1, 'series_cache', 'name', 'subscription_id'),
+    (2, 'episode_cache', 'title', 'subscription_id'),
+    (3, 'm3u_entries', 'title', 'm3u_source_id'),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for _, table, title, _ in INDEXED:
+            op.create_index(
+                f'ix_{table}_{title}_search', table,
+                [sa.text(f"to_tsvector('simple', coalesce({title}, ''))")],
+                unique=False, postgresql_using='gin', if_not_exists=True,
+            )
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS title_search USING fts5("
+        "title, owner_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    for kind, table, title, owner in INDEXED:
+        rowid = f"{{row}}.id * 4 + {kind}"
+        insert = (
+            f"INSERT INTO title_search (rowid, title, owner_id) "
+            f"SELECT {rowid.format(row='new')}, new.{title}, new.{owner} WHERE new.{title} IS NOT NULL;"
+        )
+        delete = f"DELETE FROM title_search WHERE rowid = {rowid.format(row='old')};"
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} "
+            f"BEGIN {insert} END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} "
+            f"BEGIN {delete} END"
+        )
+        # Upserts rewrite unchanged titles on every sync; only real changes are reindexed
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {title}, {owner} ON {table} "
+            f"WHEN old.{title} IS NOT new.{title} OR old.{owner} IS NOT new.{owner} "
+            f"BEGIN {delete} {insert} END"
+        )
+        op.execute(
+            f"INSERT INTO title_search (rowid, title, owner_id) "
+            f"SELECT id * 4 + {kind}, {title}, {owner} FROM {table} "
+            f"WHERE {title} IS NOT NULL"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        for _, table, title, _ in reversed(INDEXED):
+            op.drop_index(f'ix_{table}_{title}_search', table_name=table, if_exists=True)
+        return
+
+    for _, table, _, _ in reversed(INDEXED):
+        for event in ('update', 'delete', 'insert'):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{event}")
+    op.execute("DROP TABLE IF EXISTS title_search")
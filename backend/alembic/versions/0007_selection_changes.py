@@ -0,0 +1,45 @@
+"""selection changes
+
+Log of selection edits (added and removed categories or groups), written
+when a selection is saved and consumed by the next sync of the source.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 19:02:44.517380
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A database created by create_all before it was stamped already has the table
+    if not sa.inspect(op.get_bind()).has_table('selection_changes'):
+        op.create_table('selection_changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_type', sa.String(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=False),
+        sa.Column('added', sa.JSON(), nullable=False),
+        sa.Column('removed', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_selection_changes_id'), 'selection_changes', ['id'], unique=False)
+        op.create_index('ix_selection_changes_source', 'selection_changes',
+                        ['source_type', 'source_id', 'content_type'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_selection_changes_source', table_name='selection_changes')
+    op.drop_index(op.f('ix_selection_changes_id'), table_name='selection_changes')
+    op.drop_table('selection_changes')
@@ -1,11 +1,14 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from typing import AsyncGenerator, Generator, Iterator, Optional
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Query, Session
 from app.core.config import settings
 from app.core import security
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal, ReadSessionLocal
+from app.services.catalogue import Catalogue, fetch_page, gzip_chunks, iter_ndjson
 from app.db.session import SessionLocal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token")
@@ -17,6 +20,46 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+def get_read_db() -> Generator:
+    """Session on a read-only connection, for endpoints that never write"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncGenerator:
+    """AsyncSession for `async def` endpoints: queries are awaited instead of blocking the event loop"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db() -> AsyncGenerator:
+    """AsyncSession on a read-only connection"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def catalogue_page(query: Query, catalogue: Catalogue, cursor: Optional[str], limit: int) -> dict:
+    """Browse page response, 400 for a cursor this API did not hand out"""
+    try:
+        items, next_cursor = fetch_page(query, catalogue, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+def catalogue_export(request: Request, db: Session, query: Query, catalogue: Catalogue) -> StreamingResponse:
+    """Stream every row of a browse query as NDJSON, gzip-compressed if the client accepts it"""
+    def rows() -> Iterator[bytes]:
+        # Runs while the response is sent, after the request's dependencies finished
+        try:
+            yield from iter_ndjson(query, catalogue)
+        finally:
+            db.close()
+
+    chunks, headers = rows(), {}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        chunks, headers = gzip_chunks(chunks), {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
+
 def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -8,9 +8,14 @@ from app.models.selection import SelectedCategory
 from app.models.cache import MovieCache, SeriesCache, EpisodeCache
 from app.models.schedule import Schedule
 from app.models.schedule_execution import ScheduleExecution
-from app.models.m3u_source import M3USource
 from app.models.m3u_entry import M3UEntry
 from app.models.m3u_selection import M3USelection
+from app.models.m3u_group_hash import M3UGroupHash
+from app.models.output_file import OutputFile
+from app.services.output_manifest import purge_root, purge_legacy_tree
+from app.services.content_stats import clear_stats, refresh_stats
+from app.services.output_reconciler import output_roots
+from app.tasks.reconcile import reconcile_outputs_task
 from app.core.config import settings
 import os
 import shutil
@@ -26,44 +31,29 @@ def delete_generated_files(db: Session = Depends(get_db)):
     try:
         deleted_count = 0
         errors = []
-        
-        # Get all Xtream subscriptions to find their directories
-        subscriptions = db.query(Subscription).all()
-        
-        for sub in subscriptions:
-            # Delete files from movies directory
-            if sub.movies_dir and os.path.exists(sub.movies_dir):
-                try:
-                    shutil.rmtree(sub.movies_dir)
-                    os.makedirs(sub.movies_dir, exist_ok=True)
-                    deleted_count += 1
-                except Exception as e:
-                    errors.append(f"Error deleting files from {sub.movies_dir}: {str(e)}")
-            
-            # Delete files from series directory
-            if sub.series_dir and os.path.exists(sub.series_dir):
-                try:
-                    shutil.rmtree(sub.series_dir)
-                    os.makedirs(sub.series_dir, exist_ok=True)
-                    deleted_count += 1
-                except Exception as e:
-                    errors.append(f"Error deleting files from {sub.series_dir}: {str(e)}")
-        
-        # Get all M3U sources to find their output directories
-        m3u_sources = db.query(M3USource).all()
-        
-        for source in m3u_sources:
-            # Delete files from output directory
-            if source.output_dir and os.path.exists(source.output_dir):
-                try:
-                    shutil.rmtree(source.output_dir)
-                    os.makedirs(source.output_dir, exist_ok=True)
+
+        # Every output root we know about: configured directories plus any
+        # root still referenced by the manifest (e.g. a removed subscription)
+        roots = set(output_roots(db))
+        roots.update(r for (r,) in db.query(OutputFile.root).distinct())
+
+        manifest_in_use = db.query(OutputFile.id).first() is not None
+
+        for root in sorted(roots):
+            try:
+                count, tracked = purge_root(db, root)
+                db.commit()
+                deleted_count += count
+                if not tracked and os.path.exists(root):
+                    # Tree generated before the manifest existed
+                    purge_legacy_tree(root)
                     deleted_count += 1
-                except Exception as e:
-                    errors.append(f"Error deleting files from {source.output_dir}: {str(e)}")
+            except Exception as e:
+                db.rollback()
+                errors.append(f"Error deleting files from {root}: {str(e)}")
         
-        # Also clean the main output directory if it exists
-        if hasattr(settings, 'OUTPUT_DIR') and os.path.exists(settings.OUTPUT_DIR):
+        # Also clean the main output directory if nothing has been tracked yet
+        if not manifest_in_use and hasattr(settings, 'OUTPUT_DIR') and os.path.exists(settings.OUTPUT_DIR):
             try:
                 # Iterate over all items in the output directory
                 for item in os.listdir(settings.OUTPUT_DIR):
@@ -89,11 +79,19 @@ def delete_generated_files(db: Session = Depends(get_db)):
         return {"message": f"Error deleting files: {str(e)}", "success": False}
 
 
+@router.post("/reconcile")
+def trigger_reconcile():
+    """Run the output reconciliation sweeper now instead of waiting for its schedule"""
+    task = reconcile_outputs_task.delay()
+    return {"message": "Reconciliation started", "task_id": task.id, "success": True}
+
+
 @router.post("/clear-movie-cache")
 def clear_movie_cache(db: Session = Depends(get_db)):
     """Clear movie cache from database - movies will be re-synced on next sync"""
     try:
         count = db.query(MovieCache).delete()
+        refresh_stats(db, subscription_ids=[sub_id for sub_id, in db.query(Subscription.id)])
         db.commit()
         return {
             "message": f"Movie cache cleared successfully ({count} entries removed)",
@@ -111,6 +109,7 @@ def clear_series_cache(db: Session = Depends(get_db)):
     try:
         episode_count = db.query(EpisodeCache).delete()
         series_count = db.query(SeriesCache).delete()
+        refresh_stats(db, subscription_ids=[sub_id for sub_id, in db.query(Subscription.id)])
         db.commit()
         return {
             "message": f"Series cache cleared ({series_count} series, {episode_count} episodes removed)",
@@ -137,6 +136,8 @@ def reset_database(db: Session = Depends(get_db)):
 
         # Delete M3U entries (preserve sources and selections)
         db.query(M3UEntry).delete()
+        db.query(M3UGroupHash).delete()
+        clear_stats(db)
 
         db.commit()
 
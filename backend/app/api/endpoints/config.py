@@ -8,7 +8,7 @@ from app.api import deps
 router = APIRouter()
 
 @router.get("/", response_model=ConfigResponse)
-def get_config(db: Session = Depends(get_db)):
+def get_config(db: Session = Depends(deps.get_read_db)):
     settings = {s.key: s.value for s in db.query(SettingsModel).all()}
     return ConfigResponse(**settings)
 
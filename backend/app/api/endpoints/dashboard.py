@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Dict, List, Any
-from app.db.session import get_db
+from sqlalchemy import and_, case, func
+from typing import Any
+from app.api.deps import get_read_db
 from app.models.subscription import Subscription
 from app.models.m3u_source import M3USource
-from app.models.m3u_entry import M3UEntry, EntryType
-from app.models.sync_state import SyncState
+from app.models.sync_state import SyncState, SyncStatus
 from app.models.schedule import Schedule
-from app.models.cache import MovieCache, SeriesCache
+from app.models.content_stats import ContentStats
+from app.services.content_stats import SOURCE_M3U, SOURCE_XTREAM
 from datetime import datetime, timedelta
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,58 +20,58 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def etag_response(request: Request, payload: Any) -> Response:
+    """JSON response tagged with a hash of its body; 304 when the client already has it.
+
+    The dashboard polls every few seconds and its numbers rarely change, so
+    browsers revalidate (Cache-Control: no-cache) and mostly get an empty 304.
+    """
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _count_if(condition):
+    """COUNT of the rows matching condition, to aggregate several counts in one query"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
 @router.get("/stats")
-def get_dashboard_stats(db: Session = Depends(get_db)) -> Dict[str, Any]:
+def get_dashboard_stats(request: Request, db: Session = Depends(get_read_db)) -> Response:
     """Get overall dashboard statistics"""
     
-    # Source statistics
-    xtream_total = db.query(Subscription).count()
-    xtream_active = db.query(Subscription).filter(Subscription.is_active == True).count()
-    
-    m3u_total = db.query(M3USource).count()
-    m3u_active = db.query(M3USource).filter(M3USource.is_active == True).count()
-    
-    # Content statistics from M3U entries
-    m3u_movies = db.query(M3UEntry).filter(M3UEntry.entry_type == EntryType.MOVIE).count()
-    m3u_series = db.query(M3UEntry).filter(M3UEntry.entry_type == EntryType.SERIES).count()
-    
-    # Content statistics from Xtream Cache
-    xtream_movies = db.query(MovieCache).count()
-    xtream_series = db.query(SeriesCache).count()
-    
-    movies_count = m3u_movies + xtream_movies
-    series_count = m3u_series + xtream_series
-    
-    # Sync status
-    recent_syncs = db.query(SyncState).order_by(
-        SyncState.last_sync.desc()
-    ).limit(5).all()
-    
-    # In-progress syncs
-    syncing = db.query(SyncState).filter(
-        SyncState.status == "syncing"
-    ).count()
-    
-    # Error count (last 24h)
+    # Source statistics, one aggregate per source table
+    xtream_total, xtream_active = db.query(
+        func.count(Subscription.id), _count_if(Subscription.is_active == True)
+    ).one()
+    m3u_total, m3u_active = db.query(
+        func.count(M3USource.id), _count_if(M3USource.is_active == True)
+    ).one()
+    
+    # Content statistics, counted by the sync tasks
+    movies_count, series_count = db.query(
+        func.coalesce(func.sum(ContentStats.movies), 0),
+        func.coalesce(func.sum(ContentStats.series), 0)
+    ).one()
+    
+    # Sync status: in progress, errors in the last 24h, success rate over 30 days
     yesterday = datetime.utcnow() - timedelta(days=1)
-    errors_24h = db.query(SyncState).filter(
-        SyncState.status == "error",
-        SyncState.last_sync >= yesterday
-    ).count()
-    
-    # Success rate (last 30 days)
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    total_syncs = db.query(SyncState).filter(
-        SyncState.last_sync >= thirty_days_ago
-    ).count()
-    successful_syncs = db.query(SyncState).filter(
-        SyncState.status == "success",
-        SyncState.last_sync >= thirty_days_ago
-    ).count()
+    syncing, errors_24h, total_syncs, successful_syncs = db.query(
+        _count_if(SyncState.status == SyncStatus.RUNNING),
+        _count_if(and_(SyncState.status == SyncStatus.FAILED, SyncState.last_sync >= yesterday)),
+        _count_if(SyncState.last_sync >= thirty_days_ago),
+        _count_if(and_(SyncState.status == SyncStatus.SUCCESS, SyncState.last_sync >= thirty_days_ago)),
+    ).one()
     
     success_rate = (successful_syncs / total_syncs * 100) if total_syncs > 0 else 0
     
-    return {
+    return etag_response(request, {
         "sources": {
             "total": xtream_total + m3u_total,
             "xtream": xtream_total,
@@ -86,34 +89,34 @@ def get_dashboard_stats(db: Session = Depends(get_db)) -> Dict[str, Any]:
             "errors_24h": errors_24h,
             "success_rate": round(success_rate, 1)
         }
-    }
+    })
 
 
 @router.get("/recent-activity")
 def get_recent_activity(
+    request: Request,
     limit: int = 10,
-    db: Session = Depends(get_db)
-) -> List[Dict[str, Any]]:
+    db: Session = Depends(get_read_db)
+) -> Response:
     """Get recent sync activity"""
     
-    recent_syncs = db.query(SyncState).order_by(
+    # Subscription names joined in, sync states of deleted subscriptions stay "Unknown"
+    recent_syncs = db.query(SyncState, Subscription.name).outerjoin(
+        Subscription, Subscription.id == SyncState.subscription_id
+    ).order_by(
         SyncState.last_sync.desc()
     ).limit(limit).all()
     
     activity = []
-    for sync in recent_syncs:
+    for sync, subscription_name in recent_syncs:
         # Determine source name and type
         source_name = "Unknown"
         source_type = "unknown"
         
-        if sync.sync_type == "movies" or sync.sync_type == "series":
+        if subscription_name is not None:
             # XtreamTV sync
-            sub = db.query(Subscription).filter(
-                Subscription.id == sync.subscription_id
-            ).first()
-            if sub:
-                source_name = sub.name
-                source_type = "xtream"
+            source_name = subscription_name
+            source_type = "xtream"
         
         # Calculate duration if we have both start and update times
         duration = None
@@ -125,38 +128,36 @@ def get_recent_activity(
             "id": sync.id,
             "source_name": source_name,
             "source_type": source_type,
-            "sync_type": sync.sync_type,
+            "sync_type": sync.type,
             "status": sync.status,
             "items_processed": (sync.items_added or 0) + (sync.items_deleted or 0),
             "timestamp": sync.last_sync.isoformat() if sync.last_sync else None,
             "duration": duration,
-            "error_message": sync.error_message if sync.status == "error" else None
+            "error_message": sync.error_message if sync.status == SyncStatus.FAILED else None
         })
     
-    return activity
+    return etag_response(request, activity)
 
 
 @router.get("/scheduled-syncs")
-def get_scheduled_syncs(db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
+def get_scheduled_syncs(request: Request, db: Session = Depends(get_read_db)) -> Response:
     """Get upcoming scheduled syncs"""
     
-    schedules = db.query(Schedule).filter(
-        Schedule.is_active == True
+    schedules = db.query(Schedule, Subscription.name).outerjoin(
+        Subscription, Subscription.id == Schedule.subscription_id
+    ).filter(
+        Schedule.enabled == True
     ).all()
     
     scheduled = []
-    for schedule in schedules:
+    for schedule, subscription_name in schedules:
         # Get source name
         source_name = "Unknown"
         source_type = "unknown"
         
-        if schedule.subscription_id:
-            sub = db.query(Subscription).filter(
-                Subscription.id == schedule.subscription_id
-            ).first()
-            if sub:
-                source_name = sub.name
-                source_type = "xtream"
+        if subscription_name is not None:
+            source_name = subscription_name
+            source_type = "xtream"
         
         # Calculate next run time
         next_run = None
@@ -172,60 +173,47 @@ def get_scheduled_syncs(db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
             "id": schedule.id,
             "source_name": source_name,
             "source_type": source_type,
-            "sync_type": schedule.sync_type,
+            "sync_type": schedule.type,
             "frequency": schedule.frequency,
             "next_run": next_run.isoformat() if next_run else None,
             "last_run": schedule.last_run.isoformat() if schedule.last_run else None
         })
     
-    return scheduled
+    return etag_response(request, scheduled)
 
 
 @router.get("/content-by-source")
-def get_content_by_source(db: Session = Depends(get_db)) -> List[Dict[str, Any]]:
+def get_content_by_source(request: Request, db: Session = Depends(get_read_db)) -> Response:
     """Get content breakdown by source"""
     
     result = []
     
-    # XtreamTV sources
-    subscriptions = db.query(Subscription).all()
-    for sub in subscriptions:
-        # Count from Cache
-        movies_count = db.query(MovieCache).filter(
-            MovieCache.subscription_id == sub.id
-        ).count()
-        
-        series_count = db.query(SeriesCache).filter(
-            SeriesCache.subscription_id == sub.id
-        ).count()
-        
+    # XtreamTV sources, with the counts the sync tasks stored (none before the first sync)
+    subscriptions = db.query(Subscription.name, ContentStats.movies, ContentStats.series).outerjoin(
+        ContentStats,
+        and_(ContentStats.source_type == SOURCE_XTREAM, ContentStats.source_id == Subscription.id)
+    ).order_by(Subscription.id)
+    for name, movies, series in subscriptions:
         result.append({
-            "source_name": sub.name,
+            "source_name": name,
             "source_type": "xtream",
-            "movies": movies_count,
-            "series": series_count,
-            "total": movies_count + series_count
+            "movies": movies or 0,
+            "series": series or 0,
+            "total": (movies or 0) + (series or 0)
         })
     
     # M3U sources
-    m3u_sources = db.query(M3USource).all()
-    for source in m3u_sources:
-        movies = db.query(M3UEntry).filter(
-            M3UEntry.m3u_source_id == source.id,
-            M3UEntry.entry_type == EntryType.MOVIE
-        ).count()
-        
-        series = db.query(M3UEntry).filter(
-            M3UEntry.m3u_source_id == source.id,
-            M3UEntry.entry_type == EntryType.SERIES
-        ).count()
-        
+    m3u_sources = db.query(M3USource.name, ContentStats.movies, ContentStats.series).outerjoin(
+        ContentStats,
+        and_(ContentStats.source_type == SOURCE_M3U, ContentStats.source_id == M3USource.id)
+    ).order_by(M3USource.id)
+    for name, movies, series in m3u_sources:
         result.append({
-            "source_name": source.name,
+            "source_name": name,
             "source_type": "m3u",
-            "movies": movies,
-            "series": series,
-            "total": movies + series
+            "movies": movies or 0,
+            "series": series or 0,
+            "total": (movies or 0) + (series or 0)
         })
     
-    return result
+    return etag_response(request, result)
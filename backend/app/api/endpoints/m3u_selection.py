@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from app.api.deps import get_read_db
 from app.db.session import get_db
 from app.models.m3u_source import M3USource
-from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.m3u_entry import M3UEntry
 from app.models.m3u_selection import M3USelection, SelectionType
+from app.services.content_stats import SOURCE_M3U
+from app.services.selection_changes import apply_selection, record_selection_change
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -26,73 +30,81 @@ class GroupSelectionRequest(BaseModel):
     groups: List[GroupSelectionItem]
 
 
+def count_groups(db: Session, source_id: int) -> Dict[Tuple[str, str], int]:
+    """Entries per (group_title, entry_type) of a source, counted by the database.
+
+    A single GROUP BY over the ix_m3u_entries_source_group index, so the cost
+    depends on the number of groups rather than on the number of entries.
+    Entries without a group are counted as "Uncategorized", like generation
+    does.
+    """
+    rows = db.query(
+        M3UEntry.group_title, M3UEntry.entry_type, func.count()
+    ).filter(
+        M3UEntry.m3u_source_id == source_id
+    ).group_by(
+        M3UEntry.group_title, M3UEntry.entry_type
+    ).all()
+
+    counts: Dict[Tuple[str, str], int] = {}
+    for group_title, entry_type, count in rows:
+        key = (group_title or "Uncategorized", entry_type.value)
+        counts[key] = counts.get(key, 0) + count
+    return counts
+
+
 @router.get("/{source_id}/groups", response_model=List[GroupInfo])
-def get_m3u_groups(source_id: int, db: Session = Depends(get_db)):
+def get_m3u_groups(source_id: int, db: Session = Depends(get_read_db)):
     """Get all groups from M3U source with selection status"""
     source = db.query(M3USource).filter(M3USource.id == source_id).first()
     if not source:
         raise HTTPException(status_code=404, detail="M3U source not found")
     
-    # Get all entries for this source
-    entries = db.query(M3UEntry).filter(M3UEntry.m3u_source_id == source_id).all()
-    
-    if not entries:
+    counts = count_groups(db, source_id)
+    if not counts:
         return []
     
     # Get selected groups
-    selected_groups = db.query(M3USelection).filter(
+    selected_groups = db.query(M3USelection.group_title, M3USelection.selection_type).filter(
         M3USelection.m3u_source_id == source_id
     ).all()
     
     selected_set = {(sel.group_title, sel.selection_type.value) for sel in selected_groups}
     
-    # Group by group_title and entry_type
-    groups_dict = {}
-    for entry in entries:
-        group = entry.group_title or "Uncategorized"
-        entry_type = entry.entry_type.value
-        key = (group, entry_type)
-        
-        if key not in groups_dict:
-            groups_dict[key] = {
-                "group_title": group,
-                "entry_type": entry_type,
-                "count": 0,
-                "selected": key in selected_set
-            }
-        groups_dict[key]["count"] += 1
-    
-    return list(groups_dict.values())
+    return [
+        {
+            "group_title": group,
+            "entry_type": entry_type,
+            "count": count,
+            "selected": (group, entry_type) in selected_set
+        }
+        for (group, entry_type), count in counts.items()
+    ]
 
 
 @router.get("/{source_id}/selected", response_model=List[GroupInfo])
-def get_selected_groups(source_id: int, db: Session = Depends(get_db)):
+def get_selected_groups(source_id: int, db: Session = Depends(get_read_db)):
     """Get only selected groups for M3U source"""
     source = db.query(M3USource).filter(M3USource.id == source_id).first()
     if not source:
         raise HTTPException(status_code=404, detail="M3U source not found")
     
-    selected_groups = db.query(M3USelection).filter(
+    selected_groups = db.query(M3USelection.group_title, M3USelection.selection_type).filter(
         M3USelection.m3u_source_id == source_id
     ).all()
+    if not selected_groups:
+        return []
     
-    result = []
-    for sel in selected_groups:
-        # Get count from entries
-        count = db.query(M3UEntry).filter(
-            M3UEntry.m3u_source_id == source_id,
-            M3UEntry.group_title == sel.group_title,
-            M3UEntry.entry_type == EntryType(sel.selection_type.value)
-        ).count()
-        
-        result.append({
+    counts = count_groups(db, source_id)
+    return [
+        {
             "group_title": sel.group_title,
             "entry_type": sel.selection_type.value,
-            "count": count,
+            "count": counts.get((sel.group_title, sel.selection_type.value), 0),
             "selected": True
-        })
-    
-    return result
+        }
+        for sel in selected_groups
+    ]
 
 
 @router.post("/{source_id}")
@@ -107,44 +119,38 @@ def save_group_selection(
     if not source:
         raise HTTPException(status_code=404, detail="M3U source not found")
     
-    # Determine scope of deletion
-    query = db.query(M3USelection).filter(M3USelection.m3u_source_id == source_id)
-    
+    # Types whose selection is replaced; the others are left alone
     if selection_type:
         try:
-            stype = SelectionType(selection_type)
-            query = query.filter(M3USelection.selection_type == stype)
+            scope_types = [SelectionType(selection_type)]
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid selection_type: {selection_type}")
-            
-    # Clear existing selections in scope
-    query.delete()
-    
-    # Add new selections
-    for group_data in request.groups:
-        # If selection_type is enforced, validate group type matches
-        if selection_type and group_data.entry_type != selection_type:
-            continue # Skip groups that don't match the target type (safety check)
+    else:
+        scope_types = list(SelectionType)
 
+    wanted: Dict[SelectionType, List[Dict]] = {stype: [] for stype in scope_types}
+    for group_data in request.groups:
         try:
             stype = SelectionType(group_data.entry_type)
         except ValueError:
-             # Skip invalid types or raise error? 
-             # For robustness, let's skip or log. 
-             # But since we validated model, it should be a string.
-             # If it's not "movie" or "series", it will fail.
-             continue
-
-        selection = M3USelection(
-            m3u_source_id=source_id,
-            group_title=group_data.group_title,
-            selection_type=stype
+            continue  # neither movie nor series, nothing a sync could generate
+        # Groups of another type than the one enforced are skipped (safety check)
+        if stype in wanted:
+            wanted[stype].append({"group_title": group_data.group_title})
+
+    added = removed = 0
+    for stype, groups in wanted.items():
+        diff = apply_selection(
+            db, M3USelection.__table__, {"m3u_source_id": source_id, "selection_type": stype},
+            ("group_title",), groups,
         )
-        db.add(selection)
-    
+        record_selection_change(db, SOURCE_M3U, source_id, stype.value,
+                                [key[0] for key in diff.added], [key[0] for key in diff.removed])
+        added += len(diff.added)
+        removed += len(diff.removed)
     db.commit()
     
-    return {"message": f"Saved {len(request.groups)} group selections"}
+    return {"message": f"Saved {len(request.groups)} group selections", "added": added, "removed": removed}
 
 
 
@@ -1,16 +1,33 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import AsyncIterable, AsyncIterator, List
+from app.core.config import settings
+from app.api.deps import catalogue_export, catalogue_page, get_async_db, get_read_db
 from app.db.session import get_db
 from app.models.m3u_source import M3USource, SourceType
-from app.models.m3u_entry import M3UEntry
+from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.m3u_group_hash import M3UGroupHash
 from app.tasks.m3u_sync import sync_m3u_source_task
+from app.services.output_manifest import purge_root, OWNER_M3U
+from app.services.content_stats import clear_stats, SOURCE_M3U
+from app.services.selection_changes import clear_selection_changes
+from app.services.m3u_fetch import DownloadBudgetExceeded
+from app.services.m3u_upload import PlaylistUpload, UploadResult, UPLOAD_EXTENSIONS
+from app.services.catalogue import DEFAULT_PAGE_SIZE, M3U_ENTRIES, MAX_PAGE_SIZE, browse_query
 from pathlib import Path
 import os
 import shutil
 
 router = APIRouter()
 
+# Uploaded playlists, one file per source
+UPLOAD_DIR = Path("/app/uploads/m3u")
+
+# Bytes read from a multipart upload at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 # Schema classes (inline for simplicity)
 from pydantic import BaseModel
 from datetime import datetime
@@ -45,13 +62,20 @@ class M3UEntryResponse(BaseModel):
     title: str
     group_title: Optional[str]
     entry_type: str
+    url: str
+    logo: Optional[str] = None
+    tvg_id: Optional[str] = None
     
     class Config:
         from_attributes = True
 
+class M3UEntryPage(BaseModel):
+    items: List[M3UEntryResponse]
+    next_cursor: Optional[str] = None  # pass back as `cursor` for the next page, None on the last
+
 
 @router.get("/", response_model=List[M3USourceResponse])
-def list_m3u_sources(db: Session = Depends(get_db)):
+def list_m3u_sources(db: Session = Depends(get_read_db)):
     """List all M3U sources"""
     sources = db.query(M3USource).all()
     return sources
@@ -91,31 +115,34 @@ def create_m3u_source_from_url(source: M3USourceCreate, db: Session = Depends(ge
     return db_source
 
 
-@router.post("/upload")
-async def upload_m3u_file(
-    name: str = Form(...),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    """Upload M3U file and create source"""
-    # Check if name already exists
-    existing = db.query(M3USource).filter(M3USource.name == name).first()
-    if existing:
+async def _upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _store_upload(chunks: AsyncIterable[bytes], target: Path,
+                        content_encoding: Optional[str] = None) -> UploadResult:
+    """Stream an uploaded playlist to target without blocking the event loop"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        async with PlaylistUpload(str(target), settings.M3U_DOWNLOAD_MAX_BYTES, content_encoding) as upload:
+            await upload.write_all(chunks)
+            return await upload.commit()
+    except DownloadBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid playlist upload: {e}")
+
+
+async def _check_name_available(db: AsyncSession, name: str):
+    if await db.scalar(select(M3USource.id).where(M3USource.name == name)) is not None:
         raise HTTPException(status_code=400, detail="Source name already exists")
-    
-    # Validate file extension
-    if not file.filename.endswith(('.m3u', '.m3u8')):
-        raise HTTPException(status_code=400, detail="File must be .m3u or .m3u8")
-    
-    # Create uploads directory if it doesn't exist
-    upload_dir = Path("/app/uploads/m3u")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Save uploaded file
-    file_path = upload_dir / f"{name}.m3u"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+
+
+async def _create_file_source(db: AsyncSession, name: str, file_path: Path) -> M3USource:
     # Set output directory
     output_dir = f"/output/m3u/{name}"
     movies_dir = None
@@ -133,13 +160,85 @@ async def upload_m3u_file(
     )
     
     db.add(db_source)
-    db.commit()
-    db.refresh(db_source)
+    await db.commit()
+    await db.refresh(db_source)
     
     # Do NOT trigger sync - user must select groups first
     # sync_m3u_source_task.delay(db_source.id)
+    return db_source
+
+
+@router.post("/upload")
+async def upload_m3u_file(
+    name: str = Form(...),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Upload M3U file and create source"""
+    # Check if name already exists
+    await _check_name_available(db, name)
     
-    return {"id": db_source.id, "name": db_source.name, "message": "File uploaded successfully"}
+    # Validate file extension
+    if not file.filename.endswith(UPLOAD_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="File must be .m3u or .m3u8 (optionally .gz)")
+    
+    # Save uploaded file
+    result = await _store_upload(_upload_chunks(file), UPLOAD_DIR / f"{name}.m3u")
+    db_source = await _create_file_source(db, name, Path(result.path))
+    
+    return {
+        "id": db_source.id,
+        "name": db_source.name,
+        "entries": result.entries,
+        "message": "File uploaded successfully"
+    }
+
+
+@router.post("/upload/stream")
+async def upload_m3u_stream(name: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Create a source from a playlist sent as the raw request body.
+
+    Unlike the multipart upload, chunks are written to disk as they arrive.
+    The body may be gzip or xz compressed.
+    """
+    await _check_name_available(db, name)
+
+    result = await _store_upload(request.stream(), UPLOAD_DIR / f"{name}.m3u",
+                                 request.headers.get("content-encoding"))
+    db_source = await _create_file_source(db, name, Path(result.path))
+
+    return {
+        "id": db_source.id,
+        "name": db_source.name,
+        "entries": result.entries,
+        "message": "File uploaded successfully"
+    }
+
+
+@router.put("/{source_id}/file")
+async def replace_m3u_file(source_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Replace the playlist of a file source with the raw request body.
+
+    The new file is swapped in atomically, a running sync keeps reading the
+    previous one. The next sync picks up the change through the content hash.
+    """
+    source = await db.get(M3USource, source_id)
+    if not source:
+        raise HTTPException(status_code=404, detail="M3U source not found")
+    if source.source_type != SourceType.FILE:
+        raise HTTPException(status_code=400, detail="Only file sources have an uploaded playlist")
+
+    result = await _store_upload(request.stream(), Path(source.file_path),
+                                 request.headers.get("content-encoding"))
+
+    return {
+        "id": source.id,
+        "name": source.name,
+        "entries": result.entries,
+        "size": result.size,
+        "changed": result.sha256 != source.m3u_hash,
+        "message": "File uploaded successfully"
+    }
 
 
 @router.post("/{source_id}/sync")
@@ -155,11 +254,33 @@ def trigger_m3u_sync(source_id: int, force: bool = False, db: Session = Depends(
     return {"message": "Sync started", "task_id": task.id}
 
 
-@router.get("/{source_id}/entries", response_model=List[M3UEntryResponse])
-def get_m3u_entries(source_id: int, db: Session = Depends(get_db)):
-    """Get entries for M3U source"""
-    entries = db.query(M3UEntry).filter(M3UEntry.m3u_source_id == source_id).all()
-    return entries
+@router.get("/{source_id}/entries", response_model=M3UEntryPage)
+def get_m3u_entries(
+    source_id: int,
+    group: Optional[str] = None,
+    type: Optional[EntryType] = None,
+    prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db)
+):
+    """Browse entries of an M3U source by title, a page at a time"""
+    query = browse_query(db, M3U_ENTRIES, source_id, group=group, entry_type=type, prefix=prefix)
+    return catalogue_page(query, M3U_ENTRIES, cursor, limit)
+
+
+@router.get("/{source_id}/entries/export")
+def export_m3u_entries(
+    source_id: int,
+    request: Request,
+    group: Optional[str] = None,
+    type: Optional[EntryType] = None,
+    prefix: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Every matching entry as NDJSON, streamed"""
+    query = browse_query(db, M3U_ENTRIES, source_id, group=group, entry_type=type, prefix=prefix)
+    return catalogue_export(request, db, query, M3U_ENTRIES)
 
 
 @router.delete("/{source_id}")
@@ -171,9 +292,23 @@ def delete_m3u_source(source_id: int, db: Session = Depends(get_db)):
     
     # Delete entries
     db.query(M3UEntry).filter(M3UEntry.m3u_source_id == source_id).delete()
+    db.query(M3UGroupHash).filter(M3UGroupHash.m3u_source_id == source_id).delete()
+    clear_stats(db, SOURCE_M3U, source_id)
+    clear_selection_changes(db, SOURCE_M3U, source_id)
     
-    # Delete output directory
-    if os.path.exists(source.output_dir):
+    # Delete generated files recorded in the manifest
+    roots = {
+        source.output_dir,
+        source.movies_dir or f"{source.output_dir}/movies",
+        source.series_dir or f"{source.output_dir}/series",
+    }
+    tracked = False
+    for root in roots:
+        _, root_tracked = purge_root(db, root, OWNER_M3U, source_id)
+        tracked = tracked or root_tracked
+
+    # Output tree written before the manifest existed
+    if not tracked and os.path.exists(source.output_dir):
         shutil.rmtree(source.output_dir)
     
     # Delete uploaded file if exists
@@ -206,8 +341,12 @@ def update_m3u_source(
             raise HTTPException(status_code=400, detail="Source name already exists")
         source.name = updates.name
     
-    if updates.url and source.source_type == SourceType.URL:
+    if updates.url and source.source_type == SourceType.URL and updates.url != source.url:
         source.url = updates.url
+        # Validators of the old URL mean nothing for the new one
+        source.m3u_hash = None
+        source.http_etag = None
+        source.http_last_modified = None
     
     db.commit()
     db.refresh(source)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List
+from app.api.deps import get_read_db
 from app.db.session import get_db
 from app.models.m3u_sync_state import M3USyncState
 from app.schemas import M3USyncStatusResponse, SyncTriggerResponse
@@ -9,7 +10,7 @@ from app.tasks.m3u_sync import sync_m3u_source_task
 router = APIRouter()
 
 @router.get("/status", response_model=List[M3USyncStatusResponse])
-def get_sync_status(db: Session = Depends(get_db)):
+def get_sync_status(db: Session = Depends(get_read_db)):
     states = db.query(M3USyncState).all()
     return [
         M3USyncStatusResponse(
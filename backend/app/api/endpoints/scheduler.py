@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
-from app.db.session import SessionLocal
 from app.models.schedule import Schedule, SyncType, Frequency
 from app.models.schedule_execution import ScheduleExecution, ExecutionStatus
 from pydantic import BaseModel
@@ -37,20 +37,14 @@ class ExecutionHistoryItem(BaseModel):
     class Config:
         from_attributes = True
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/config/{subscription_id}", response_model=List[ScheduleConfig])
 async def get_schedule_config(
     subscription_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """Get all schedule configurations for a subscription"""
-    schedules = db.query(Schedule).filter(Schedule.subscription_id == subscription_id).all()
+    query = select(Schedule).where(Schedule.subscription_id == subscription_id)
+    schedules = (await db.scalars(query)).all()
     
     # Ensure we have entries for both types
     if not schedules:
@@ -63,8 +57,8 @@ async def get_schedule_config(
                 frequency=Frequency.DAILY
             )
             db.add(schedule)
-        db.commit()
-        schedules = db.query(Schedule).filter(Schedule.subscription_id == subscription_id).all()
+        await db.commit()
+        schedules = (await db.scalars(query)).all()
     
     return schedules
 
@@ -73,13 +67,13 @@ async def update_schedule_config(
     subscription_id: int,
     sync_type: SyncType,
     update: ScheduleUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """Update schedule configuration for a specific sync type and subscription"""
-    schedule = db.query(Schedule).filter(
+    schedule = await db.scalar(select(Schedule).where(
         Schedule.subscription_id == subscription_id,
         Schedule.type == sync_type
-    ).first()
+    ).limit(1))
     
     if not schedule:
         # Create if doesn't exist
@@ -98,8 +92,8 @@ async def update_schedule_config(
     else:
         schedule.next_run = None
     
-    db.commit()
-    db.refresh(schedule)
+    await db.commit()
+    await db.refresh(schedule)
     
     return schedule
 
@@ -109,16 +103,16 @@ async def get_execution_history(
     limit: int = Query(50, le=200),
     offset: int = Query(0, ge=0),
     sync_type: Optional[SyncType] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(deps.get_async_read_db)
 ):
     """Get execution history for a subscription with optional filtering by sync type"""
-    query = db.query(ScheduleExecution).join(Schedule).filter(
+    query = select(ScheduleExecution).join(Schedule).where(
         Schedule.subscription_id == subscription_id
     )
     
     if sync_type:
-        query = query.filter(Schedule.type == sync_type)
+        query = query.where(Schedule.type == sync_type)
     
-    executions = query.order_by(ScheduleExecution.started_at.desc()).offset(offset).limit(limit).all()
+    executions = await db.scalars(query.order_by(ScheduleExecution.started_at.desc()).offset(offset).limit(limit))
     
-    return executions
+    return executions.all()
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List
+from app.api.deps import get_read_db
+from app.schemas import SearchHit
+from app.services.title_search import DEFAULT_LIMIT, MAX_LIMIT, search_titles
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[SearchHit])
+def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    db: Session = Depends(get_read_db)
+):
+    """Titles of all subscriptions and M3U sources matching every word of q, best match first"""
+    return search_titles(db, q, limit)
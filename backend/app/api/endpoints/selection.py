@@ -1,27 +1,33 @@
 from typing import List
+from celery.result import AsyncResult
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime
+from app.core.celery_app import celery_app
 from app.db.session import get_db
 from app.models.selection import SelectedCategory
 from app.models.category import Category
 from app.models.subscription import Subscription
-from app.schemas import CategoryResponse, SelectionUpdate, SyncResponse
+from app.schemas import CategoryRefreshStatus, CategoryResponse, SelectionUpdate, SyncTriggerResponse
 from app.api import deps
-from app.services.xtream import XtreamClient
+from app.services.categories import CATEGORY_MOVIE, CATEGORY_SERIES
+from app.services.content_stats import SOURCE_XTREAM
+from app.services.selection_changes import apply_selection, record_selection_change
+from app.tasks.categories import STATE_PROGRESS, refresh_categories_task
 
 router = APIRouter()
 
-def get_xtream_client(db: Session, subscription_id: int) -> XtreamClient:
-    sub = db.query(Subscription).filter(Subscription.id == subscription_id).first()
+async def get_active_subscription(db: AsyncSession, subscription_id: int) -> Subscription:
+    sub = await db.get(Subscription, subscription_id)
     if not sub:
         raise HTTPException(status_code=404, detail="Subscription not found")
     if not sub.is_active:
         raise HTTPException(status_code=400, detail="Subscription is inactive")
-    return XtreamClient(sub.xtream_url, sub.username, sub.password)
+    return sub
 
 @router.get("/movies/{subscription_id}", response_model=List[CategoryResponse])
-def get_movie_categories(subscription_id: int, db: Session = Depends(get_db)):
+def get_movie_categories(subscription_id: int, db: Session = Depends(deps.get_read_db)):
     """Get movie categories from database"""
     # Get all categories from database
     categories = db.query(Category).filter(
@@ -47,7 +53,7 @@ def get_movie_categories(subscription_id: int, db: Session = Depends(get_db)):
     ]
 
 @router.get("/series/{subscription_id}", response_model=List[CategoryResponse])
-def get_series_categories(subscription_id: int, db: Session = Depends(get_db)):
+def get_series_categories(subscription_id: int, db: Session = Depends(deps.get_read_db)):
     """Get series categories from database"""
     # Get all categories from database
     categories = db.query(Category).filter(
@@ -72,132 +78,59 @@ def get_series_categories(subscription_id: int, db: Session = Depends(get_db)):
         for cat in categories
     ]
 
-@router.post("/movies/sync/{subscription_id}", response_model=SyncResponse)
-async def sync_movie_categories(subscription_id: int, db: Session = Depends(get_db)):
-    """Sync movie categories from Xtream to database"""
-    client = get_xtream_client(db, subscription_id)
-    try:
-        categories = await client.get_vod_categories()
-        # Fetch all streams to calculate counts
-        streams = await client.get_vod_streams()
-        
-        # Calculate counts
-        counts = {}
-        for stream in streams:
-            cat_id = str(stream.get("category_id"))
-            counts[cat_id] = counts.get(cat_id, 0) + 1
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch from Xtream: {str(e)}")
+async def start_category_refresh(db: AsyncSession, subscription_id: int, category_type: str) -> str:
+    await get_active_subscription(db, subscription_id)
+    # Enqueueing talks to the broker, keep it off the event loop
+    task = await run_in_threadpool(refresh_categories_task.delay, subscription_id, category_type)
+    return task.id
 
-    # Clear existing movie categories for this subscription
-    db.query(Category).filter(
-        Category.subscription_id == subscription_id,
-        Category.type == "movie"
-    ).delete()
-    
-    # Add new categories
-    now = datetime.utcnow()
-    for cat in categories:
-        cat_id = str(cat["category_id"])
-        db.add(Category(
-            subscription_id=subscription_id,
-            category_id=cat_id,
-            category_name=cat["category_name"],
-            type="movie",
-            item_count=counts.get(cat_id, 0),
-            last_sync=now
-        ))
-    
-    db.commit()
-    
-    return SyncResponse(
-        categories_synced=len(categories),
-        timestamp=now
-    )
+@router.post("/movies/sync/{subscription_id}", response_model=SyncTriggerResponse)
+async def sync_movie_categories(subscription_id: int, db: AsyncSession = Depends(deps.get_async_db)):
+    """Start refreshing movie categories from Xtream; poll /refresh/{task_id} for the outcome"""
+    task_id = await start_category_refresh(db, subscription_id, CATEGORY_MOVIE)
+    return SyncTriggerResponse(message="Movie category refresh started", task_id=task_id)
 
-@router.post("/series/sync/{subscription_id}", response_model=SyncResponse)
-async def sync_series_categories(subscription_id: int, db: Session = Depends(get_db)):
-    """Sync series categories from Xtream to database"""
-    client = get_xtream_client(db, subscription_id)
-    try:
-        categories = await client.get_series_categories()
-        # Fetch all series to calculate counts
-        series_list = await client.get_series()
-        
-        # Calculate counts
-        counts = {}
-        for series in series_list:
-            cat_id = str(series.get("category_id"))
-            counts[cat_id] = counts.get(cat_id, 0) + 1
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch from Xtream: {str(e)}")
+@router.post("/series/sync/{subscription_id}", response_model=SyncTriggerResponse)
+async def sync_series_categories(subscription_id: int, db: AsyncSession = Depends(deps.get_async_db)):
+    """Start refreshing series categories from Xtream; poll /refresh/{task_id} for the outcome"""
+    task_id = await start_category_refresh(db, subscription_id, CATEGORY_SERIES)
+    return SyncTriggerResponse(message="Series category refresh started", task_id=task_id)
 
-    # Clear existing series categories for this subscription
-    db.query(Category).filter(
-        Category.subscription_id == subscription_id,
-        Category.type == "series"
-    ).delete()
-    
-    # Add new categories
-    now = datetime.utcnow()
-    for cat in categories:
-        cat_id = str(cat["category_id"])
-        db.add(Category(
-            subscription_id=subscription_id,
-            category_id=cat_id,
-            category_name=cat["category_name"],
-            type="series",
-            item_count=counts.get(cat_id, 0),
-            last_sync=now
-        ))
-    
-    db.commit()
-    
-    return SyncResponse(
-        categories_synced=len(categories),
-        timestamp=now
+@router.get("/refresh/{task_id}", response_model=CategoryRefreshStatus)
+def get_category_refresh(task_id: str):
+    """State of a category refresh started by /movies/sync or /series/sync"""
+    result = AsyncResult(task_id, app=celery_app)
+    # Built in one go so the task's ISO timestamp is validated into a datetime
+    fields = {}
+    if result.state == STATE_PROGRESS:
+        fields["phase"] = result.info.get("phase")
+    elif result.successful():
+        fields["categories_synced"] = result.result["categories_synced"]
+        fields["timestamp"] = result.result["timestamp"]
+    elif result.failed():
+        fields["error"] = str(result.result)
+    return CategoryRefreshStatus(task_id=task_id, state=result.state, **fields)
+
+def save_category_selection(db: Session, subscription_id: int, category_type: str,
+                            selection: SelectionUpdate) -> List[CategoryResponse]:
+    """Store only the difference to the saved selection and log it for the next sync"""
+    diff = apply_selection(
+        db, SelectedCategory.__table__, {"subscription_id": subscription_id, "type": category_type},
+        ("category_id",),
+        [{"category_id": c.category_id, "name": c.category_name} for c in selection.categories],
     )
+    record_selection_change(db, SOURCE_XTREAM, subscription_id, category_type,
+                            [key[0] for key in diff.added], [key[0] for key in diff.removed])
+    db.commit()
+
+    return [CategoryResponse(category_id=c.category_id, category_name=c.category_name, selected=True) for c in selection.categories]
 
 @router.post("/movies/{subscription_id}", response_model=List[CategoryResponse])
 def update_movie_selection(subscription_id: int, selection: SelectionUpdate, db: Session = Depends(get_db)):
     """Update movie category selection"""
-    # Clear existing selection for this subscription
-    db.query(SelectedCategory).filter(
-        SelectedCategory.subscription_id == subscription_id,
-        SelectedCategory.type == "movie"
-    ).delete()
-    
-    # Add new selection
-    for cat in selection.categories:
-        db.add(SelectedCategory(
-            subscription_id=subscription_id,
-            category_id=cat.category_id,
-            name=cat.category_name,
-            type="movie"
-        ))
-    db.commit()
-    
-    return [CategoryResponse(category_id=c.category_id, category_name=c.category_name, selected=True) for c in selection.categories]
+    return save_category_selection(db, subscription_id, CATEGORY_MOVIE, selection)
 
 @router.post("/series/{subscription_id}", response_model=List[CategoryResponse])
 def update_series_selection(subscription_id: int, selection: SelectionUpdate, db: Session = Depends(get_db)):
     """Update series category selection"""
-    # Clear existing selection for this subscription
-    db.query(SelectedCategory).filter(
-        SelectedCategory.subscription_id == subscription_id,
-        SelectedCategory.type == "series"
-    ).delete()
-    
-    # Add new selection
-    for cat in selection.categories:
-        db.add(SelectedCategory(
-            subscription_id=subscription_id,
-            category_id=cat.category_id,
-            name=cat.category_name,
-            type="series"
-        ))
-    db.commit()
-    
-    return [CategoryResponse(category_id=c.category_id, category_name=c.category_name, selected=True) for c in selection.categories]
+    return save_category_selection(db, subscription_id, CATEGORY_SERIES, selection)
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.api import deps
 from app.models.subscription import Subscription
-from app.schemas import SubscriptionCreate, SubscriptionUpdate, SubscriptionResponse
+from app.services.catalogue import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, XTREAM_MOVIES, XTREAM_SERIES, browse_query,
+)
+from app.services.content_stats import clear_stats, SOURCE_XTREAM
+from app.services.selection_changes import clear_selection_changes
+from app.schemas import (
+    CachedMoviePage, CachedSeriesPage, SubscriptionCreate, SubscriptionUpdate, SubscriptionResponse,
+)
 
 router = APIRouter()
 
 @router.get("/", response_model=List[SubscriptionResponse])
 def read_subscriptions(
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
     skip: int = 0,
     limit: int = 100,
 ):
@@ -30,7 +37,7 @@ def create_subscription(
 @router.get("/{subscription_id}", response_model=SubscriptionResponse)
 def read_subscription(
     subscription_id: int,
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_read_db),
 ):
     subscription = db.query(Subscription).filter(Subscription.id == subscription_id).first()
     if subscription is None:
@@ -66,5 +73,57 @@ def delete_subscription(
         raise HTTPException(status_code=404, detail="Subscription not found")
     
     db.delete(db_subscription)
+    clear_stats(db, SOURCE_XTREAM, subscription_id)
+    clear_selection_changes(db, SOURCE_XTREAM, subscription_id)
     db.commit()
     return db_subscription
+
+@router.get("/{subscription_id}/movies", response_model=CachedMoviePage)
+def browse_movies(
+    subscription_id: int,
+    category_id: Optional[str] = None,
+    prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(deps.get_read_db),
+):
+    """Browse the subscription's cached movies by name, a page at a time"""
+    query = browse_query(db, XTREAM_MOVIES, subscription_id, group=category_id, prefix=prefix)
+    return deps.catalogue_page(query, XTREAM_MOVIES, cursor, limit)
+
+@router.get("/{subscription_id}/movies/export")
+def export_movies(
+    subscription_id: int,
+    request: Request,
+    category_id: Optional[str] = None,
+    prefix: Optional[str] = None,
+    db: Session = Depends(deps.get_read_db),
+):
+    """Every matching cached movie as NDJSON, streamed"""
+    query = browse_query(db, XTREAM_MOVIES, subscription_id, group=category_id, prefix=prefix)
+    return deps.catalogue_export(request, db, query, XTREAM_MOVIES)
+
+@router.get("/{subscription_id}/series", response_model=CachedSeriesPage)
+def browse_series(
+    subscription_id: int,
+    category_id: Optional[str] = None,
+    prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(deps.get_read_db),
+):
+    """Browse the subscription's cached series by name, a page at a time"""
+    query = browse_query(db, XTREAM_SERIES, subscription_id, group=category_id, prefix=prefix)
+    return deps.catalogue_page(query, XTREAM_SERIES, cursor, limit)
+
+@router.get("/{subscription_id}/series/export")
+def export_series(
+    subscription_id: int,
+    request: Request,
+    category_id: Optional[str] = None,
+    prefix: Optional[str] = None,
+    db: Session = Depends(deps.get_read_db),
+):
+    """Every matching cached series as NDJSON, streamed"""
+    query = browse_query(db, XTREAM_SERIES, subscription_id, group=category_id, prefix=prefix)
+    return deps.catalogue_export(request, db, query, XTREAM_SERIES)
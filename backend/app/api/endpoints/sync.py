@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from typing import List
+from app.api.deps import get_read_db
 from app.db.session import get_db
 from app.models.sync_state import SyncState
 from app.schemas import SyncStatusResponse, SyncTriggerResponse
@@ -9,7 +10,7 @@ from app.tasks.sync import sync_movies_task, sync_series_task
 router = APIRouter()
 
 @router.get("/status", response_model=List[SyncStatusResponse])
-def get_sync_status(db: Session = Depends(get_db)):
+def get_sync_status(db: Session = Depends(get_read_db)):
     states = db.query(SyncState).all()
     return [
         SyncStatusResponse(
@@ -1,5 +1,7 @@
 from celery import Celery
+from celery.signals import worker_process_init
 from app.core.config import settings
+from app.core.database import ROLE_WORKER, configure_sessions
 import logging
 import sys
 
@@ -28,9 +30,22 @@ celery_app.conf.beat_schedule = {
         'task': 'app.tasks.sync.check_schedules_task',
         'schedule': 60.0,  # Run every 60 seconds
     },
+    'reconcile-output-trees': {
+        'task': 'app.tasks.reconcile.reconcile_outputs_task',
+        'schedule': settings.RECONCILE_INTERVAL,
+    },
 }
 celery_app.conf.timezone = 'UTC'
 
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Pooled connections must not be shared with the parent across fork()
+    configure_sessions(ROLE_WORKER)
+
+
 # Import tasks to register them
 from app.tasks import sync  # noqa
 from app.tasks import m3u_sync  # noqa
+from app.tasks import reconcile  # noqa
+from app.tasks import categories  # noqa
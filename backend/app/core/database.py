@@ -0,0 +1,213 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import struct
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.schema import Table
+from app.core.config import settings
+
+# Rows per INSERT .. ON CONFLICT statement, well below SQLite's bound parameter limit
+UPSERT_BATCH_SIZE = 1000
+
+ROLE_API = "api"
+ROLE_WORKER = "worker"
+
+# API sessions for requests that only read, bound by configure_sessions(ROLE_API)
+ReadSessionLocal = sessionmaker(autoflush=False)
+
+# Sessions for async endpoints, so database calls do not block the event loop;
+# bound by configure_sessions(ROLE_API). Objects stay loaded after commit
+# because lazy loading is not possible outside of an await.
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+# Async driver for each backend, same database
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+def create_db_engine(url: Optional[str] = None, role: str = ROLE_API, read_only: bool = False) -> Engine:
+    """Engine for DATABASE_URL, tuned for the process that uses it.
+
+    PostgreSQL gets a connection pool sized for the role: the API serves
+    concurrent requests, a Celery worker process runs one task at a time.
+    SQLite is switched to WAL so readers never wait for the writer, and a
+    writer waits up to SQLITE_BUSY_TIMEOUT for the lock instead of failing
+    with "database is locked".
+
+    A `read_only` engine has its own pool whose connections refuse writes,
+    so requests that only read never queue behind (or hold) a write lock.
+    """
+    url = url or settings.DATABASE_URL
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT},
+        )
+        event.listen(engine, "connect", _configure_sqlite)
+        if read_only:
+            event.listen(engine, "connect", _sqlite_query_only)
+        return engine
+
+    if role == ROLE_WORKER:
+        pool_size, max_overflow = settings.DATABASE_WORKER_POOL_SIZE, settings.DATABASE_WORKER_MAX_OVERFLOW
+    else:
+        pool_size, max_overflow = settings.DATABASE_POOL_SIZE, settings.DATABASE_MAX_OVERFLOW
+    return create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_pre_ping=True,  # Connections dropped by the server or a restart are replaced
+        pool_recycle=1800,
+        execution_options={"postgresql_readonly": True} if read_only else {},
+    )
+
+
+def async_url(url: str) -> URL:
+    """DATABASE_URL with the async driver of its backend"""
+    url = make_url(url)
+    return url.set(drivername=f"{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_backend_name()]}")
+
+
+def create_async_db_engine(url: Optional[str] = None, read_only: bool = False) -> AsyncEngine:
+    """Async engine for DATABASE_URL, configured like the API's create_db_engine"""
+    url = async_url(url or settings.DATABASE_URL)
+    if url.get_backend_name() == "sqlite":
+        engine = create_async_engine(url, connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT})
+        event.listen(engine.sync_engine, "connect", _configure_sqlite)
+        if read_only:
+            event.listen(engine.sync_engine, "connect", _sqlite_query_only)
+        return engine
+
+    return create_async_engine(
+        url,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        execution_options={"postgresql_readonly": True} if read_only else {},
+    )
+
+
+def configure_sessions(role: str) -> Engine:
+    """Bind SessionLocal (and for the API, the read-only and async sessions) to engines for this process and role"""
+    from app.db.session import SessionLocal
+    engine = create_db_engine(role=role)
+    SessionLocal.configure(bind=engine)
+    if role == ROLE_API:
+        ReadSessionLocal.configure(bind=create_db_engine(role=role, read_only=True))
+        AsyncSessionLocal.configure(bind=create_async_db_engine())
+        AsyncReadSessionLocal.configure(bind=create_async_db_engine(read_only=True))
+    return engine
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, safe with WAL
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT * 1000)}")
+    cursor.close()
+
+
+def _sqlite_query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def upsert(db: Session, table: Table, rows: Sequence[Dict], index_elements: List[str],
+           update_columns: List[str]) -> int:
+    """Insert rows, updating `update_columns` of rows that already exist.
+
+    Existence is decided by the unique index over `index_elements`, in the
+    database, as INSERT .. ON CONFLICT DO UPDATE on both SQLite and
+    PostgreSQL. Rows are sent in batches; the caller commits.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        raise NotImplementedError(f"Upsert is not supported on {dialect}")
+
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        statement = insert(table).values(list(rows[start:start + UPSERT_BATCH_SIZE]))
+        statement = statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: statement.excluded[column] for column in update_columns},
+        )
+        db.execute(statement)
+    return len(rows)
+
+
+def lock_id(name: str) -> int:
+    """Stable signed 64-bit key for pg_advisory_lock"""
+    return struct.unpack(">q", hashlib.sha1(name.encode("utf-8")).digest()[:8])[0]
+
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def sync_lock(engine: Engine, name: str) -> Iterator[bool]:
+    """Hold an exclusive lock named `name` across all workers, without waiting.
+
+    Yields False if another process holds it. On PostgreSQL this is a
+    session advisory lock on a dedicated connection, released when the
+    block exits or the connection dies. SQLite has no advisory locks, so
+    an flock() on a file next to the database stands in; it covers every
+    worker on the host, which is all SQLite supports anyway.
+    """
+    if is_postgres(engine):
+        key = lock_id(name)
+        with engine.connect() as conn:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+            conn.commit()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                    conn.commit()
+        return
+
+    database = engine.url.database
+    if not database or database == ":memory:":
+        # A private in-memory database is only visible to this process
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(name, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    directory = os.path.dirname(os.path.abspath(database))
+    path = os.path.join(directory, f".lock-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:16]}")
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            acquired = True
+        except BlockingIOError:
+            acquired = False
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(f, fcntl.LOCK_UN)
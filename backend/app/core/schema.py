@@ -0,0 +1,89 @@
+import logging
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+from app.db.base_class import Base
+# Every model must be imported so its table is part of Base.metadata
+from app.models import (  # noqa
+    cache, category, content_stats, m3u_entry, m3u_group_hash, m3u_selection, m3u_source,
+    m3u_sync_state, output_file, reconcile_state, schedule, schedule_execution, selection,
+    selection_change, settings, subscription, sync_state,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Revision matching the schema create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+
+# Created by migrations without a model (the FTS5 search index and its shadow tables)
+UNMODELLED_TABLE_PREFIXES = ("title_search",)
+
+
+def alembic_config() -> Config:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    return config
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """Autogenerate filter: leave tables that have no model alone"""
+    return not (type_ == "table" and reflected and compare_to is None
+                and name.startswith(UNMODELLED_TABLE_PREFIXES))
+
+
+def upgrade_database(engine: Engine):
+    """Bring the database schema to the latest migration.
+
+    A database created by `create_all` (no alembic_version table) is first
+    completed to the baseline revision and stamped, then upgraded like any
+    other. Tables it lacked are created from the current models, with their
+    current indexes, which is why index migrations use if_(not_)exists and
+    table migrations check whether the table is already there.
+    """
+    tables = set(inspect(engine).get_table_names())
+    unversioned = bool(tables) and "alembic_version" not in tables
+    if unversioned:
+        logger.info("Database predates migrations, stamping it at the baseline revision")
+        Base.metadata.create_all(bind=engine)
+        add_missing_columns(engine, Base.metadata)
+
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        if unversioned:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
+
+def add_missing_columns(engine: Engine, metadata: MetaData) -> int:
+    """Add nullable columns that models gained after their table was created.
+
+    Databases created by `create_all` before migrations were introduced may
+    lack columns of the baseline revision; this brings them up to it before
+    they are stamped. Only additive, nullable columns are handled here;
+    server defaults are not backfilled and indexes are left to migrations.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = 0
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable:
+                    logger.warning(f"Cannot add NOT NULL column {table.name}.{column.name} automatically")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                conn.execute(text(ddl))
+                logger.info(f"Added column {table.name}.{column.name}")
+                added += 1
+    return added
@@ -4,8 +4,8 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from app.api.api import api_router
 from app.core.config import settings
-from app.db.base import Base
-from app.db.session import engine
+from app.core.database import ROLE_API, configure_sessions
+from app.core.schema import upgrade_database
 import os
 import logging
 import sys
@@ -25,8 +25,9 @@ logging.basicConfig(
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("httpcore").setLevel(logging.WARNING)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create or migrate tables
+engine = configure_sessions(ROLE_API)
+upgrade_database(engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
 class MovieCache(Base):
     __tablename__ = "movie_cache"
+    __table_args__ = (
+        # Conflict target of the cache upsert
+        Index("ux_movie_cache_subscription_stream", "subscription_id", "stream_id", unique=True),
+        # Keyset pages of the browse API, ordered by name
+        Index("ix_movie_cache_subscription_name", "subscription_id", "name"),
+        Index("ix_movie_cache_subscription_category_name", "subscription_id", "category_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subscription_id = Column(Integer, nullable=False, index=True)
@@ -15,6 +22,11 @@ class MovieCache(Base):
 
 class SeriesCache(Base):
     __tablename__ = "series_cache"
+    __table_args__ = (
+        Index("ux_series_cache_subscription_series", "subscription_id", "series_id", unique=True),
+        Index("ix_series_cache_subscription_name", "subscription_id", "name"),
+        Index("ix_series_cache_subscription_category_name", "subscription_id", "category_id", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subscription_id = Column(Integer, nullable=False, index=True)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Integer, DateTime, UniqueConstraint
+from datetime import datetime
+from app.db.base_class import Base
+
+class ContentStats(Base):
+    """Cached item counts per source, refreshed when a sync commits so the dashboard never counts rows"""
+    __tablename__ = "content_stats"
+    __table_args__ = (
+        UniqueConstraint("source_type", "source_id", name="uq_content_stats_source"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_type = Column(String, nullable=False)  # 'xtream' or 'm3u'
+    source_id = Column(Integer, nullable=False)  # subscription id or m3u source id
+    movies = Column(Integer, nullable=False, default=0)
+    series = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, Enum as SQLEnum
 from app.db.base_class import Base
 import enum
 
@@ -8,6 +8,14 @@ class EntryType(str, enum.Enum):
 
 class M3UEntry(Base):
     __tablename__ = "m3u_entries"
+    __table_args__ = (
+        Index("ix_m3u_entries_source_key", "m3u_source_id", "entry_key"),
+        # Covers the per-group counts of the selection page
+        Index("ix_m3u_entries_source_group", "m3u_source_id", "group_title", "entry_type"),
+        # Keyset pages of the browse API, ordered by title
+        Index("ix_m3u_entries_source_title", "m3u_source_id", "title"),
+        Index("ix_m3u_entries_source_group_title", "m3u_source_id", "group_title", "title"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     m3u_source_id = Column(Integer, ForeignKey("m3u_sources.id"), nullable=False, index=True)
@@ -18,3 +26,4 @@ class M3UEntry(Base):
     tvg_id = Column(String, nullable=True)
     tvg_name = Column(String, nullable=True)
     entry_type = Column(SQLEnum(EntryType), default=EntryType.MOVIE, nullable=False)
+    entry_key = Column(String, nullable=True)  # Stable identity within the source, see m3u_sync.entry_identity
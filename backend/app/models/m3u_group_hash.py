@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer, DateTime, UniqueConstraint
+from datetime import datetime
+from app.db.base_class import Base
+
+class M3UGroupHash(Base):
+    __tablename__ = "m3u_group_hashes"
+    __table_args__ = (
+        UniqueConstraint("m3u_source_id", "content_type", "group_title", name="uq_m3u_group_hashes_group"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    m3u_source_id = Column(Integer, nullable=False, index=True)
+    content_type = Column(String, nullable=False)  # movies or series
+    group_title = Column(String, nullable=False)
+    content_hash = Column(String, nullable=False)  # sha1 over the group's planned paths and entry fields
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
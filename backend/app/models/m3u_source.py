@@ -21,5 +21,9 @@ class M3USource(Base):
     is_active = Column(Boolean, default=True)
     sync_status = Column(String, default="idle") # idle, syncing, success, error
     last_sync = Column(DateTime, nullable=True)
+    # Change detection: hash of the last parsed playlist and HTTP validators
+    m3u_hash = Column(String, nullable=True)  # sha256 of the playlist bytes
+    http_etag = Column(String, nullable=True)
+    http_last_modified = Column(String, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, DateTime, UniqueConstraint, Index
+from datetime import datetime
+from app.db.base_class import Base
+
+class OutputFile(Base):
+    __tablename__ = "output_files"
+    __table_args__ = (
+        UniqueConstraint("root", "rel_path", name="uq_output_files_root_path"),
+        Index("ix_output_files_owner_source", "owner_type", "owner_id", "source_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_type = Column(String, nullable=False)  # 'xtream' or 'm3u'
+    owner_id = Column(Integer, nullable=False)  # subscription id or m3u source id
+    root = Column(String, nullable=False, index=True)  # output directory the path is relative to
+    rel_path = Column(String, nullable=False)
+    source_key = Column(String, nullable=False)  # e.g. 'movie:123', 'series:45', 'entry:<url>'
+    size = Column(Integer, nullable=False, default=0)
+    content_hash = Column(String, nullable=False)  # sha1 of file content
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
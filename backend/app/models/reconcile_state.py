@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from app.db.base_class import Base
+
+class ReconcileState(Base):
+    __tablename__ = "reconcile_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    root = Column(String, unique=True, index=True, nullable=False)  # output directory being audited
+    cursor = Column(String, nullable=True)  # last fully audited directory, relative to root (None = start of pass)
+    pass_started_at = Column(DateTime, nullable=True)
+    last_run = Column(DateTime, nullable=True)
+    last_completed = Column(DateTime, nullable=True)  # end of the last full pass over the tree
+    # Counters for the current pass
+    dirs_scanned = Column(Integer, nullable=False, default=0)
+    entries_scanned = Column(Integer, nullable=False, default=0)
+    orphans_removed = Column(Integer, nullable=False, default=0)
+    missing_found = Column(Integer, nullable=False, default=0)
+    error_message = Column(String, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, Enum as SQLEnum
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 import enum
@@ -18,6 +18,10 @@ class Frequency(str, enum.Enum):
 
 class Schedule(Base):
     __tablename__ = "schedules"
+    __table_args__ = (
+        # Due schedules: enabled == True AND next_run <= now
+        Index("ix_schedules_enabled_next_run", "enabled", "next_run"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     subscription_id = Column(Integer, nullable=False, index=True)
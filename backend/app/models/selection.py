@@ -1,8 +1,11 @@
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, Index
 from app.db.base_class import Base
 
 class SelectedCategory(Base):
     __tablename__ = "selected_categories"
+    __table_args__ = (
+        Index("ix_selected_categories_subscription_type", "subscription_id", "type"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subscription_id = Column(Integer, nullable=False, index=True)
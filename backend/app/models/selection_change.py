@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Index
+from datetime import datetime
+from app.db.base_class import Base
+
+class SelectionChange(Base):
+    """Categories or groups added to and removed from a selection, until the next sync handles them"""
+    __tablename__ = "selection_changes"
+    __table_args__ = (
+        Index("ix_selection_changes_source", "source_type", "source_id", "content_type"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_type = Column(String, nullable=False)  # 'xtream' or 'm3u'
+    source_id = Column(Integer, nullable=False)  # subscription id or m3u source id
+    content_type = Column(String, nullable=False)  # 'movie' or 'series'
+    added = Column(JSON, nullable=False)  # category ids (xtream) or group titles (m3u)
+    removed = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
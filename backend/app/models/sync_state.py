@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Enum
+from sqlalchemy import Column, String, Integer, DateTime, Enum, Index
 import enum
 from datetime import datetime
 from app.db.base_class import Base
@@ -15,6 +15,10 @@ class SyncType(str, enum.Enum):
 
 class SyncState(Base):
     __tablename__ = "sync_state"
+    __table_args__ = (
+        # One state row per subscription and content type
+        Index("ux_sync_state_subscription_type", "subscription_id", "type", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     subscription_id = Column(Integer, nullable=False, index=True)
@@ -69,9 +69,13 @@ class CategoryResponse(CategoryBase):
 class SelectionUpdate(BaseModel):
     categories: list[CategoryBase]
 
-class SyncResponse(BaseModel):
-    categories_synced: int
-    timestamp: datetime
+class CategoryRefreshStatus(BaseModel):
+    task_id: str
+    state: str  # Celery state: PENDING, STARTED, PROGRESS, SUCCESS or FAILURE
+    phase: Optional[str] = None
+    categories_synced: Optional[int] = None
+    timestamp: Optional[datetime] = None
+    error: Optional[str] = None
 
 class SubscriptionBase(BaseModel):
     name: str
@@ -100,3 +104,38 @@ class SubscriptionResponse(SubscriptionBase):
     class Config:
         from_attributes = True
 
+
+class CachedMovie(BaseModel):
+    id: int
+    stream_id: int
+    name: str
+    category_id: Optional[str] = None
+    container_extension: Optional[str] = None
+    tmdb_id: Optional[str] = None
+
+class CachedMoviePage(BaseModel):
+    items: list[CachedMovie]
+    next_cursor: Optional[str] = None  # pass back as `cursor` for the next page, None on the last
+
+class CachedSeries(BaseModel):
+    id: int
+    series_id: int
+    name: str
+    category_id: Optional[str] = None
+    tmdb_id: Optional[str] = None
+
+class CachedSeriesPage(BaseModel):
+    items: list[CachedSeries]
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    kind: str  # movie, series or episode of a subscription, or m3u entry
+    id: int
+    title: str
+    entry_type: str
+    group: Optional[str] = None
+    source_type: str
+    source_id: int
+    source_name: Optional[str] = None
+    strm_path: Optional[str] = None  # None until a sync wrote the item
+    score: float
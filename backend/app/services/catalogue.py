@@ -0,0 +1,127 @@
+import base64
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.schema import Column
+from app.models.cache import MovieCache, SeriesCache
+from app.models.m3u_entry import M3UEntry
+
+# Rows per browse page when the client does not ask, and the most it may ask for
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows fetched per keyset query while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+
+class Catalogue(NamedTuple):
+    """A browsable table: rows of one owner, ordered by (title, id)"""
+    owner: Column  # subscription or source the rows belong to
+    title: Column
+    id: Column
+    group: Column  # category or group title
+    type: Optional[Column]
+    fields: Tuple[Column, ...]  # returned for every row
+
+
+M3U_ENTRIES = Catalogue(
+    owner=M3UEntry.m3u_source_id, title=M3UEntry.title, id=M3UEntry.id,
+    group=M3UEntry.group_title, type=M3UEntry.entry_type,
+    fields=(M3UEntry.id, M3UEntry.title, M3UEntry.group_title, M3UEntry.entry_type,
+            M3UEntry.url, M3UEntry.logo, M3UEntry.tvg_id),
+)
+XTREAM_MOVIES = Catalogue(
+    owner=MovieCache.subscription_id, title=MovieCache.name, id=MovieCache.id,
+    group=MovieCache.category_id, type=None,
+    fields=(MovieCache.id, MovieCache.stream_id, MovieCache.name, MovieCache.category_id,
+            MovieCache.container_extension, MovieCache.tmdb_id),
+)
+XTREAM_SERIES = Catalogue(
+    owner=SeriesCache.subscription_id, title=SeriesCache.name, id=SeriesCache.id,
+    group=SeriesCache.category_id, type=None,
+    fields=(SeriesCache.id, SeriesCache.series_id, SeriesCache.name, SeriesCache.category_id,
+            SeriesCache.tmdb_id),
+)
+
+
+def encode_cursor(title: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([title, row_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Position after which the next page starts; ValueError if it was not made by encode_cursor"""
+    try:
+        title, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(title, str) or not isinstance(row_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return title, row_id
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def browse_query(db: Session, catalogue: Catalogue, owner_id: int, group: Optional[str] = None,
+                 entry_type: Optional[str] = None, prefix: Optional[str] = None) -> Query:
+    """Rows of one owner matching the filters, unordered.
+
+    The title prefix is a range on the (case-sensitive) title so it is
+    answered from the (owner, title) and (owner, group, title) indexes.
+    Rows without a title cannot be positioned by a cursor and are left out.
+    """
+    query = db.query(*catalogue.fields).filter(catalogue.owner == owner_id, catalogue.title.isnot(None))
+    if group is not None:
+        query = query.filter(catalogue.group == group)
+    if entry_type is not None and catalogue.type is not None:
+        query = query.filter(catalogue.type == entry_type)
+    if prefix:
+        query = query.filter(catalogue.title >= prefix, catalogue.title < prefix_upper_bound(prefix))
+    return query
+
+
+def fetch_page(query: Query, catalogue: Catalogue, cursor: Optional[str],
+               limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """One page of rows after cursor and the cursor of the next page (None on the last).
+
+    Keyset pagination: the page starts with an index seek past the last
+    (title, id) returned, so every page costs the same however deep it is.
+    """
+    if cursor is not None:
+        title, row_id = decode_cursor(cursor)
+        query = query.filter(
+            catalogue.title >= title,
+            or_(catalogue.title > title, and_(catalogue.title == title, catalogue.id > row_id)),
+        )
+    rows = query.order_by(catalogue.title, catalogue.id).limit(limit + 1).all()
+    items = [dict(row._mapping) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last[catalogue.title.key], last[catalogue.id.key])
+    return items, next_cursor
+
+
+def iter_ndjson(query: Query, catalogue: Catalogue, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Every matching row as one JSON line, fetched a page at a time"""
+    cursor = None
+    while True:
+        items, cursor = fetch_page(query, catalogue, cursor, batch_size)
+        if items:
+            yield "".join(json.dumps(item, default=str) + "\n" for item in items).encode("utf-8")
+        if cursor is None:
+            return
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a stream of chunks into one gzip member without buffering it"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
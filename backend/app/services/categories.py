@@ -0,0 +1,63 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+from app.models.category import Category
+
+CATEGORY_MOVIE = "movie"
+CATEGORY_SERIES = "series"
+
+
+def count_by_category(items: Iterable[Dict]) -> Dict[str, int]:
+    """Items per category id of a provider's stream or series list"""
+    return dict(Counter(str(item.get("category_id")) for item in items))
+
+
+def store_categories(db: Session, subscription_id: int, category_type: str, categories: List[Dict],
+                     counts: Optional[Dict[str, int]] = None) -> int:
+    """Bring a subscription's stored categories in line with the provider's list.
+
+    Categories are matched by id: new ones are inserted, listed ones updated
+    and vanished ones deleted, with one batched statement each, and the
+    rows keep their ids (instead of being deleted and re-added). Without
+    `counts` the stored item counts are kept (new categories start at 0):
+    counting needs the full catalogue, which only the syncs download.
+    The caller commits. Returns the number of categories listed.
+    """
+    table = Category.__table__
+    stored = {
+        row.category_id: row for row in db.execute(
+            select(table.c.id, table.c.category_id, table.c.category_name, table.c.item_count)
+            .where(table.c.subscription_id == subscription_id, table.c.type == category_type)
+        )
+    }
+
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    listed = set()
+    for category in categories:
+        category_id = str(category["category_id"])
+        if category_id in listed:
+            continue
+        listed.add(category_id)
+        name = category["category_name"]
+        row = stored.get(category_id)
+        count = counts.get(category_id, 0) if counts is not None else (row.item_count if row else 0)
+        if row is None:
+            inserts.append({"subscription_id": subscription_id, "category_id": category_id,
+                            "category_name": name, "type": category_type, "item_count": count,
+                            "last_sync": now})
+        else:
+            updates.append({"_id": row.id, "_name": name, "_count": count, "_now": now})
+
+    if inserts:
+        db.execute(insert(table), inserts)
+    if updates:
+        db.execute(update(table).where(table.c.id == bindparam("_id")).values(
+            category_name=bindparam("_name"), item_count=bindparam("_count"), last_sync=bindparam("_now"),
+        ), updates)
+    stale_ids = [row.id for category_id, row in stored.items() if category_id not in listed]
+    if stale_ids:
+        db.execute(delete(table).where(table.c.id.in_(stale_ids)))
+    return len(listed)
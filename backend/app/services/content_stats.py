@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.database import upsert
+from app.models.cache import MovieCache, SeriesCache
+from app.models.content_stats import ContentStats
+from app.models.m3u_entry import M3UEntry, EntryType
+
+SOURCE_XTREAM = "xtream"
+SOURCE_M3U = "m3u"
+
+
+def _store(db: Session, source_type: str, source_id: int, movies: int, series: int):
+    upsert(db, ContentStats.__table__, [{
+        "source_type": source_type, "source_id": source_id,
+        "movies": movies, "series": series, "updated_at": datetime.utcnow(),
+    }], ["source_type", "source_id"], ["movies", "series", "updated_at"])
+
+
+def refresh_xtream_stats(db: Session, subscription_id: int):
+    """Recount a subscription's cached movies and series; the caller commits"""
+    movies = db.query(func.count(MovieCache.id)).filter(MovieCache.subscription_id == subscription_id).scalar()
+    series = db.query(func.count(SeriesCache.id)).filter(SeriesCache.subscription_id == subscription_id).scalar()
+    _store(db, SOURCE_XTREAM, subscription_id, movies, series)
+
+
+def refresh_m3u_stats(db: Session, source_id: int):
+    """Recount an M3U source's cached entries by type; the caller commits"""
+    counts = dict(
+        db.query(M3UEntry.entry_type, func.count(M3UEntry.id))
+        .filter(M3UEntry.m3u_source_id == source_id)
+        .group_by(M3UEntry.entry_type)
+    )
+    _store(db, SOURCE_M3U, source_id, counts.get(EntryType.MOVIE, 0), counts.get(EntryType.SERIES, 0))
+
+
+def refresh_stats(db: Session, subscription_ids: Iterable[int] = (), m3u_source_ids: Iterable[int] = ()):
+    for subscription_id in subscription_ids:
+        refresh_xtream_stats(db, subscription_id)
+    for source_id in m3u_source_ids:
+        refresh_m3u_stats(db, source_id)
+
+
+def clear_stats(db: Session, source_type: Optional[str] = None, source_id: Optional[int] = None):
+    """Forget the counts of a deleted source, or of every source of a type (or all)"""
+    query = db.query(ContentStats)
+    if source_type is not None:
+        query = query.filter(ContentStats.source_type == source_type)
+    if source_id is not None:
+        query = query.filter(ContentStats.source_id == source_id)
+    query.delete(synchronize_session=False)
@@ -0,0 +1,75 @@
+import threading
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, bindparam, delete
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.schema import Table
+from app.core.config import settings
+from app.core.database import upsert
+
+# One write transaction at a time per process, whatever thread flushes
+_write_lock = threading.Lock()
+
+
+class DBWriter:
+    """Buffers a sync's row changes and applies them in short transactions.
+
+    Syncs run for a long time but only need the database for bookkeeping
+    (cache rows, output manifest, group hashes). Instead of accumulating
+    those changes in the task's session and committing them in one burst,
+    they are queued here in order and written `batch_size` rows per
+    transaction on a connection of their own, so the SQLite write lock is
+    only ever held for a moment and API writes get in between.
+    """
+
+    def __init__(self, bind: Engine, batch_size: Optional[int] = None):
+        self.bind = bind
+        self.batch_size = batch_size or settings.DB_WRITE_BATCH_SIZE
+        # (statement key, row) in the order the changes were made
+        self._pending: List[Tuple[tuple, Dict]] = []
+        self.transactions = 0
+
+    def upsert(self, table: Table, rows: Sequence[Dict], index_elements: List[str],
+               update_columns: List[str]):
+        """Queue an insert-or-update of rows, see app.core.database.upsert"""
+        key = ("upsert", table, tuple(index_elements), tuple(update_columns))
+        self._queue(key, rows)
+
+    def delete(self, table: Table, keys: Sequence[Dict]):
+        """Queue deletion of the rows matching each dict of column values"""
+        for columns, group in groupby(keys, key=lambda k: tuple(sorted(k))):
+            self._queue(("delete", table, columns), list(group))
+
+    def _queue(self, key: tuple, rows: Sequence[Dict]):
+        self._pending.extend((key, row) for row in rows)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self):
+        """Write everything queued, one transaction per `batch_size` rows"""
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            # Dropped before writing: a failing batch is not retried by the next flush
+            del self._pending[:self.batch_size]
+            with _write_lock, Session(self.bind) as session, session.begin():
+                for key, group in groupby(batch, key=lambda op: op[0]):
+                    self._execute(session, key, [row for _, row in group])
+            self.transactions += 1
+
+    @staticmethod
+    def _execute(session: Session, key: tuple, rows: List[Dict]):
+        if key[0] == "upsert":
+            _, table, index_elements, update_columns = key
+            # A row changed twice in one batch: only the last version is
+            # sent, PostgreSQL refuses to update a row twice in a statement
+            latest = {tuple(row[c] for c in index_elements): row for row in rows}
+            upsert(session, table, list(latest.values()), list(index_elements), list(update_columns))
+        else:
+            _, table, columns = key
+            statement = delete(table).where(and_(*(table.c[c] == bindparam(f"key_{c}") for c in columns)))
+            session.connection().execute(statement, [{f"key_{c}": row[c] for c in columns} for row in rows])
@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import logging
+import lzma
+import os
+import tempfile
+import time
+import uuid
+import zlib
+from typing import Callable, NamedTuple, Optional
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk when hashing or downloading a playlist
+CHUNK_SIZE = 1024 * 1024
+
+# Magic numbers of compressed playlist files (.m3u.gz, .m3u.xz)
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# Longest delay between download attempts
+MAX_RETRY_DELAY = 30.0
+
+
+class DownloadBudgetExceeded(Exception):
+    """The playlist is larger than M3U_DOWNLOAD_MAX_BYTES or took longer than M3U_DOWNLOAD_TIMEOUT"""
+
+
+class PlaylistSnapshot(NamedTuple):
+    """A playlist fetched for change detection"""
+    path: Optional[str]  # local copy to parse, None when the server answered 304
+    sha256: Optional[str]  # of the decompressed playlist
+    etag: Optional[str]
+    last_modified: Optional[str]
+    encoding: str = 'utf-8'
+    spooled: bool = False  # path is a temporary download the caller must remove
+
+    @property
+    def not_modified(self) -> bool:
+        return self.path is None
+
+    def discard(self):
+        """Remove the temporary download, if any"""
+        if self.spooled and self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def hash_file(file_path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_file(file_path: str) -> PlaylistSnapshot:
+    """Hash a playlist file, pinned to its current content.
+
+    The file is hard-linked to a private name first, so an upload replacing
+    it during the sync (an atomic rename) cannot change what is parsed.
+    """
+    directory, name = os.path.split(file_path)
+    pinned = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.sync")
+    try:
+        os.link(file_path, pinned)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Filesystem without hard links: read the file in place
+        return PlaylistSnapshot(file_path, hash_file(file_path), None, None)
+    try:
+        return PlaylistSnapshot(pinned, hash_file(pinned), None, None, spooled=True)
+    except BaseException:
+        os.remove(pinned)
+        raise
+
+
+class _Decompressor:
+    """Incremental decompressor that also handles concatenated streams (multi-member gzip)"""
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.stream = factory()
+        self.pending = False  # input fed that has not completed a stream yet
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            self.pending = True
+            out.append(self.stream.decompress(data))
+            if not self.stream.eof:
+                break
+            data = self.stream.unused_data
+            self.stream = self.factory()
+            self.pending = False
+        return b"".join(out)
+
+    def finish(self):
+        if self.pending:
+            raise ValueError("Compressed playlist is truncated")
+
+
+def _gzip():
+    return _Decompressor(lambda: zlib.decompressobj(16 + zlib.MAX_WBITS))
+
+
+def _xz():
+    return _Decompressor(lzma.LZMADecompressor)
+
+
+class PlaylistDecoder:
+    """Undo the Content-Encoding and any gzip/xz compression of the playlist file itself.
+
+    Raw response bytes go in chunk by chunk, playlist bytes come out. File
+    compression is recognised by its magic number, whatever the URL or the
+    Content-Type say.
+    """
+
+    def __init__(self, content_encoding: Optional[str] = None):
+        content_encoding = (content_encoding or "identity").lower()
+        if content_encoding in ("gzip", "x-gzip"):
+            self.transport = _gzip()
+        elif content_encoding == "identity":
+            self.transport = None
+        else:
+            raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+        self.file: Optional[_Decompressor] = None
+        self.head = b""  # start of the body, until the file format is known
+        self.sniffed = False
+
+    def feed(self, data: bytes) -> bytes:
+        if self.transport is not None:
+            data = self.transport.decompress(data)
+        if not self.sniffed:
+            self.head += data
+            if len(self.head) < len(XZ_MAGIC):
+                return b""
+            data = self._sniff()
+        return self.file.decompress(data) if self.file is not None else data
+
+    def finish(self) -> bytes:
+        """Remaining output; raises ValueError if a compressed stream was cut short"""
+        data = b""
+        if not self.sniffed:
+            data = self._sniff()
+            if self.file is not None:
+                data = self.file.decompress(data)
+        for layer in (self.transport, self.file):
+            if layer is not None:
+                layer.finish()
+        return data
+
+    def _sniff(self) -> bytes:
+        self.sniffed = True
+        if self.head.startswith(GZIP_MAGIC):
+            self.file = _gzip()
+        elif self.head.startswith(XZ_MAGIC):
+            self.file = _xz()
+        data, self.head = self.head, b""
+        return data
+
+
+class _Spool:
+    """Decoded playlist being written to a temporary file and hashed"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.file = open(path, 'wb')
+        self.reset(None)
+
+    def reset(self, content_encoding: Optional[str]):
+        """Start over, e.g. when the server ignored a Range request"""
+        self.file.seek(0)
+        self.file.truncate()
+        self.decoder = PlaylistDecoder(content_encoding)
+        self.digest = hashlib.sha256()
+        self.received = 0  # raw bytes, the offset to resume from
+        self.size = 0  # decoded bytes
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise DownloadBudgetExceeded(f"Playlist exceeds {self.max_bytes} bytes")
+        self.digest.update(data)
+        self.file.write(data)
+
+
+async def download_playlist(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                            max_bytes: Optional[int] = None, timeout: Optional[float] = None,
+                            retries: Optional[int] = None,
+                            transport: Optional[httpx.AsyncBaseTransport] = None) -> PlaylistSnapshot:
+    """Download a playlist to a temporary file, decompressing and hashing it while it streams.
+
+    The stored validators are sent as If-None-Match / If-Modified-Since, so
+    a server that supports them answers 304 and nothing is downloaded.
+    gzip transfer encoding is negotiated, and .gz/.xz playlist files are
+    decompressed on the fly. An interrupted download is resumed with a
+    Range request when the server advertised byte ranges, and restarted
+    otherwise. Size and time are capped by the M3U_DOWNLOAD_* settings.
+    """
+    max_bytes = settings.M3U_DOWNLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    timeout = settings.M3U_DOWNLOAD_TIMEOUT if timeout is None else timeout
+    retries = settings.M3U_DOWNLOAD_RETRIES if retries is None else retries
+    deadline = time.monotonic() + timeout
+
+    headers = {'Accept-Encoding': 'gzip'}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    fd, path = tempfile.mkstemp(prefix='m3u-', suffix='.m3u')
+    os.close(fd)
+    spool = _Spool(path, max_bytes)
+    validator = None  # ETag or Last-Modified of the representation being downloaded
+    resumable = False
+    first = None  # headers of the response that started the current download
+    attempt = 0
+    try:
+        async with httpx.AsyncClient(follow_redirects=True, transport=transport) as client:
+            while True:
+                request_headers = dict(headers)
+                if first is not None:
+                    # Conditional headers only apply to the first request
+                    request_headers.pop('If-None-Match', None)
+                    request_headers.pop('If-Modified-Since', None)
+                if spool.received:
+                    request_headers['Range'] = f"bytes={spool.received}-"
+                    request_headers['If-Range'] = validator
+                try:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DownloadBudgetExceeded(f"Download took longer than {timeout:.0f}s")
+                    async with client.stream('GET', url, headers=request_headers,
+                                             timeout=min(remaining, 60.0)) as response:
+                        if response.status_code == 304 and first is None:
+                            logger.info(f"M3U URL not modified since last sync: {url}")
+                            spool.file.close()
+                            os.remove(path)
+                            return PlaylistSnapshot(None, None, etag, last_modified)
+
+                        if spool.received and response.status_code == 206:
+                            content_range = response.headers.get('content-range', '')
+                            if not content_range.startswith(f"bytes {spool.received}-"):
+                                raise ValueError(f"Unexpected Content-Range in resumed download: {content_range}")
+                            logger.info(f"Resuming download of {url} at byte {spool.received}")
+                        else:
+                            response.raise_for_status()
+                            if spool.received:
+                                logger.info(f"Server ignored the range request, restarting download of {url}")
+                            first = response.headers
+                            spool.reset(response.headers.get('content-encoding'))
+                            validator = first.get('etag') or first.get('last-modified')
+                            # A weak ETag cannot be used with If-Range
+                            resumable = (first.get('accept-ranges', '').lower() == 'bytes' and
+                                         validator is not None and not validator.startswith('W/'))
+
+                        async for chunk in response.aiter_raw():
+                            spool.received += len(chunk)
+                            spool.write(spool.decoder.feed(chunk))
+                            if time.monotonic() > deadline:
+                                raise DownloadBudgetExceeded(f"Download took longer than {timeout:.0f}s")
+                    break
+                except httpx.TransportError as e:
+                    attempt += 1
+                    if attempt > retries:
+                        raise
+                    if not resumable:
+                        spool.received = 0  # Next response starts over
+                    delay = min(2 ** attempt, MAX_RETRY_DELAY, max(deadline - time.monotonic(), 0))
+                    logger.warning(
+                        f"Download of {url} interrupted after {spool.received} bytes "
+                        f"(attempt {attempt}/{retries}): {e}"
+                    )
+                    await asyncio.sleep(delay)
+
+        spool.write(spool.decoder.finish())
+        spool.file.close()
+    except BaseException:
+        spool.file.close()
+        os.remove(path)
+        raise
+
+    # Only trust an explicit charset; text/* defaults to ISO-8859-1 otherwise
+    content_type = first.get('content-type', '')
+    encoding = None
+    if 'charset=' in content_type.lower():
+        encoding = content_type.lower().split('charset=', 1)[1].split(';')[0].strip().strip('"')
+
+    logger.info(f"Downloaded {spool.received} bytes ({spool.size} decoded) from {url}")
+    return PlaylistSnapshot(
+        path,
+        spool.digest.hexdigest(),
+        first.get('etag'),
+        first.get('last-modified'),
+        encoding or 'utf-8',
+        spooled=True,
+    )
+
+
+def fetch_playlist(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                   **kwargs) -> PlaylistSnapshot:
+    """Blocking wrapper around download_playlist for the Celery tasks"""
+    return asyncio.run(download_playlist(url, etag, last_modified, **kwargs))
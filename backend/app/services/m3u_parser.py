@@ -1,123 +1,236 @@
+import mmap
+import multiprocessing
+import os
 import re
-import requests
-from typing import List, Dict, Optional
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 import logging
+from app.services.m3u_fetch import fetch_playlist
 
 logger = logging.getLogger(__name__)
 
+# Files at least this large are parsed in a process pool
+PARALLEL_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# Byte ranges per worker process, more than one evens out uneven chunks
+CHUNKS_PER_WORKER = 4
+
+_EXTINF_BOUNDARY = b'\n#EXTINF'
+
+
+# One scanner for the whole EXTINF line: each match is either a key="value"
+# attribute or the first comma outside a quoted value followed by the title.
+# Keys must follow whitespace or the previous value's closing quote (left
+# unconsumed by the lookahead) so matching never starts mid-word, and quoted
+# values are skipped whole so commas inside them never start the title.
+_EXTINF_TOKEN_RE = re.compile(r'[\s"]\s*([\w.:-]+)="([^"]*)(?=")|,(.*)', re.DOTALL)
+
+
+def parse_extinf_attributes(line: str) -> Tuple[Dict[str, str], str]:
+    """Split an EXTINF line into its attributes (lower-cased keys) and title"""
+    attributes: Dict[str, str] = {}
+    title = ''
+    for key, value, rest in _EXTINF_TOKEN_RE.findall(line):
+        if key:
+            # Keep the first occurrence of a repeated attribute. Keys repeat on
+            # every line, interning them keeps one copy in memory and pickles
+            attributes.setdefault(sys.intern(key.lower()), value)
+        else:
+            title = rest.strip()
+    return attributes, title
+
+
+def _previous_line(mm, end: int) -> bytes:
+    """Last non-blank line before offset `end` (which starts a line)"""
+    while end > 0:
+        start = mm.rfind(b'\n', 0, end - 1) + 1
+        line = mm[start:end].strip()
+        if line:
+            return line
+        end = start
+    return b''
+
+
+def split_extinf_ranges(mm, parts: int) -> List[Tuple[int, int]]:
+    """Split a mapped playlist into up to `parts` byte ranges starting on #EXTINF lines.
+
+    A boundary is only placed where the sequential parser would not be
+    waiting for a URL, i.e. the previous non-blank line is not an EXTINF
+    line, so the ranges parse to exactly the same entries.
+    """
+    size = len(mm)
+    boundaries = [0]
+    for i in range(1, parts):
+        pos = max(size * i // parts, boundaries[-1])
+        while True:
+            found = mm.find(_EXTINF_BOUNDARY, pos)
+            if found == -1:
+                break
+            start = found + 1
+            if not _previous_line(mm, start).startswith(b'#EXTINF'):
+                if start > boundaries[-1]:
+                    boundaries.append(start)
+                break
+            pos = start
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_range(file_path: str, start: int, end: int, encoding: str = 'utf-8',
+                 errors: str = 'strict') -> List[Dict]:
+    """Worker: map the file, decode one byte range and parse it"""
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode(encoding, errors)
+    return list(M3UParser()._iter_entries(text.split('\n')))
+
+
+def _pool_available() -> bool:
+    # Daemonic processes (e.g. some worker pools) may not start children
+    return (os.cpu_count() or 1) > 1 and not multiprocessing.current_process().daemon
+
+
 class M3UParser:
     """Parser for M3U/M3U8 playlist files"""
     
     def __init__(self):
         self.entries = []
+        self.count = 0
     
     def parse_from_url(self, url: str) -> List[Dict]:
         """Fetch and parse M3U from URL"""
+        return list(self.iter_from_url(url))
+    
+    def parse_from_file(self, file_path: str) -> List[Dict]:
+        """Parse M3U from file"""
+        return list(self.iter_from_file(file_path))
+    
+    def parse_content(self, content: str) -> List[Dict]:
+        """Parse M3U content and extract entries"""
+        return list(self.iter_lines(content.split('\n')))
+
+    def iter_from_url(self, url: str) -> Iterator[Dict]:
+        """Download the playlist to a temporary file, then parse it from disk"""
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            content = response.text
-            return self.parse_content(content)
+            snapshot = fetch_playlist(url)
         except Exception as e:
             logger.error(f"Error fetching M3U from URL {url}: {e}")
             raise
-    
-    def parse_from_file(self, file_path: str) -> List[Dict]:
-        """Parse M3U from file"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return self.parse_content(content)
+            # Decode like the server said, replacing bytes that do not fit
+            yield from self.iter_from_file(snapshot.path, encoding=snapshot.encoding, errors='replace')
+        finally:
+            snapshot.discard()
+
+    def iter_from_file(self, file_path: str, parallel: Optional[bool] = None,
+                       encoding: str = 'utf-8', errors: str = 'strict') -> Iterator[Dict]:
+        """Read the playlist line by line and yield entries as they are parsed.
+
+        Files above PARALLEL_THRESHOLD_BYTES are parsed in a process pool
+        unless `parallel` says otherwise. Downloaded playlists pass the
+        server's charset and errors='replace', like the streaming URL parser.
+        """
+        if parallel is None:
+            parallel = os.path.getsize(file_path) >= PARALLEL_THRESHOLD_BYTES and _pool_available()
+        if parallel:
+            yield from self.iter_from_file_parallel(file_path, encoding=encoding, errors=errors)
+            return
+        try:
+            # newline='\n' splits on LF only, like the in-memory parser
+            with open(file_path, 'r', encoding=encoding, errors=errors, newline='\n') as f:
+                yield from self.iter_lines(f)
         except Exception as e:
             logger.error(f"Error reading M3U file {file_path}: {e}")
             raise
-    
-    def parse_content(self, content: str) -> List[Dict]:
-        """Parse M3U content and extract entries"""
-        entries = []
-        lines = content.strip().split('\n')
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            # Skip empty lines and comments that aren't EXTINF
-            if not line or (line.startswith('#') and not line.startswith('#EXTINF')):
-                i += 1
+
+    def iter_from_file_parallel(self, file_path: str, workers: Optional[int] = None,
+                                encoding: str = 'utf-8', errors: str = 'strict') -> Iterator[Dict]:
+        """Parse byte ranges of a memory-mapped file in a process pool, yielding entries in file order"""
+        workers = workers or os.cpu_count() or 1
+        started = time.perf_counter()
+        self.count = 0
+        try:
+            with open(file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    ranges = split_extinf_ranges(mm, workers * CHUNKS_PER_WORKER)
+
+            with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+                starts, ends = zip(*ranges)
+                count = len(ranges)
+                for entries in pool.map(_parse_range, [file_path] * count, starts, ends,
+                                        [encoding] * count, [errors] * count):
+                    self.count += len(entries)
+                    yield from entries
+        except Exception as e:
+            logger.error(f"Error reading M3U file {file_path}: {e}")
+            raise
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Parsed {self.count} entries from {size / 1048576:.0f} MB in {elapsed:.2f}s "
+            f"({size / 1048576 / elapsed:.0f} MB/s, {len(ranges)} chunks on {workers} processes)"
+        )
+
+    def iter_lines(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """Parse playlist lines lazily, holding at most one pending entry"""
+        self.count = 0
+        yield from self._iter_entries(lines)
+        logger.info(f"Parsed {self.count} entries from M3U content")
+
+    def _iter_entries(self, lines: Iterable[str]) -> Iterator[Dict]:
+        pending = None  # EXTINF entry waiting for its URL line
+
+        for raw_line in lines:
+            line = raw_line.strip()
+            if not line:
+                continue
+
+            if pending is not None:
+                # The next non-empty line after EXTINF is consumed as its URL
+                entry, pending = pending, None
+                if not line.startswith('#'):
+                    entry['url'] = line
+
+                    # Refine entry_type based on URL pattern (more reliable for Xtream Codes)
+                    if '/series/' in line:
+                        entry['entry_type'] = 'series'
+                    elif '/movie/' in line:
+                        entry['entry_type'] = 'movie'
+
+                    self.count += 1
+                    yield entry
                 continue
-            
-            # Look for EXTINF line
+
+            # Look for EXTINF line, skip other comments and stray lines
             if line.startswith('#EXTINF'):
-                # Parse EXTINF metadata
-                entry = self._parse_extinf(line)
-                
-                # Next non-empty line should be the URL
-                i += 1
-                while i < len(lines) and not lines[i].strip():
-                    i += 1
-                
-                if i < len(lines):
-                    url = lines[i].strip()
-                    if url and not url.startswith('#'):
-                        entry['url'] = url
-                        
-                        # Refine entry_type based on URL pattern (more reliable for Xtream Codes)
-                        if '/series/' in url:
-                            entry['entry_type'] = 'series'
-                        elif '/movie/' in url:
-                            entry['entry_type'] = 'movie'
-                            
-                        entries.append(entry)
-            
-            i += 1
-        
-        logger.info(f"Parsed {len(entries)} entries from M3U content")
-        return entries
+                pending = self._parse_extinf(line)
     
     def _parse_extinf(self, line: str) -> Dict:
         """Parse EXTINF line and extract metadata"""
-        entry = {
-            'title': '',
-            'logo': None,
-            'group_title': None,
-            'tvg_id': None,
-            'tvg_name': None,
-            'entry_type': 'live'
+        attributes, title = parse_extinf_attributes(line)
+        group_title = attributes.get('group-title')
+        if group_title:
+            # A handful of groups are shared by every entry
+            group_title = attributes['group-title'] = sys.intern(group_title)
+        logo = attributes.get('tvg-logo')
+        if logo is None:
+            logo = attributes.get('logo')
+
+        # Entry type defaults to live, it is refined based on the URL in iter_lines
+        return {
+            'title': title,
+            'logo': logo,
+            'group_title': group_title,
+            'tvg_id': attributes.get('tvg-id'),
+            'tvg_name': attributes.get('tvg-name'),
+            'entry_type': 'live',
+            'attributes': attributes,
         }
-        
-        # Extract tvg-id
-        tvg_id_match = re.search(r'tvg-id="([^"]*)"', line)
-        if tvg_id_match:
-            entry['tvg_id'] = tvg_id_match.group(1)
-        
-        # Extract tvg-name
-        tvg_name_match = re.search(r'tvg-name="([^"]*)"', line)
-        if tvg_name_match:
-            entry['tvg_name'] = tvg_name_match.group(1)
-        
-        # Extract tvg-logo or logo
-        logo_match = re.search(r'tvg-logo="([^"]*)"', line)
-        if not logo_match:
-            logo_match = re.search(r'logo="([^"]*)"', line)
-        if logo_match:
-            entry['logo'] = logo_match.group(1)
-        
-        # Extract group-title
-        group_match = re.search(r'group-title="([^"]*)"', line)
-        if group_match:
-            entry['group_title'] = group_match.group(1)
-        
-        # Extract title (usually after the last comma)
-        title_match = re.search(r',(.+)$', line)
-        if title_match:
-            entry['title'] = title_match.group(1).strip()
-        
-        # Determine entry type
-        # Default to live, will be refined based on URL in parse_content
-        entry['entry_type'] = 'live'
-        
-        return entry
 
 
 def parse_m3u_url(url: str) -> List[Dict]:
@@ -130,3 +243,13 @@ def parse_m3u_file(file_path: str) -> List[Dict]:
     """Helper function to parse M3U from file"""
     parser = M3UParser()
     return parser.parse_from_file(file_path)
+
+
+def iter_m3u_url(url: str) -> Iterator[Dict]:
+    """Helper function to stream M3U entries from URL"""
+    return M3UParser().iter_from_url(url)
+
+
+def iter_m3u_file(file_path: str, encoding: str = 'utf-8', errors: str = 'strict') -> Iterator[Dict]:
+    """Helper function to stream M3U entries from file"""
+    return M3UParser().iter_from_file(file_path, encoding=encoding, errors=errors)
@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import AsyncIterable, NamedTuple, Optional
+import aiofiles
+import aiofiles.os
+from app.services.m3u_fetch import DownloadBudgetExceeded, PlaylistDecoder
+
+logger = logging.getLogger(__name__)
+
+# Extensions accepted for uploaded playlists, plain or gzip-compressed
+UPLOAD_EXTENSIONS = ('.m3u', '.m3u8', '.m3u.gz', '.m3u8.gz')
+
+_ENTRY_MARKER = b'\n#EXTINF'
+
+
+class UploadResult(NamedTuple):
+    path: str
+    sha256: str  # of the decompressed playlist, as hash_file would compute it
+    size: int  # decompressed bytes
+    entries: int  # EXTINF lines
+
+
+class PlaylistUpload:
+    """Receive an uploaded playlist chunk by chunk without blocking the event loop.
+
+    Chunks are decompressed (gzip/xz, recognised by magic number), hashed,
+    scanned for EXTINF lines and written to a temporary file next to the
+    target. `commit` moves it over the target in one rename, so a sync that
+    already opened the previous file keeps reading that one.
+    """
+
+    def __init__(self, target: str, max_bytes: int, content_encoding: Optional[str] = None):
+        self.target = target
+        self.max_bytes = max_bytes
+        self.decoder = PlaylistDecoder(content_encoding)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.entries = 0
+        self._tail = b'\n'  # end of the previous chunk, a file start counts as a line start
+        self.temp_path: Optional[str] = None
+        self._file = None
+
+    async def __aenter__(self) -> "PlaylistUpload":
+        # Created here rather than in __init__ so a failure to open it is cleaned up too
+        directory = os.path.dirname(self.target) or '.'
+        fd, self.temp_path = tempfile.mkstemp(prefix='.upload-', suffix='.m3u', dir=directory)
+        os.close(fd)
+        try:
+            self._file = await aiofiles.open(self.temp_path, 'wb')
+        except BaseException:
+            await self.abort()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if not self._file.closed:
+            await self._file.close()
+        if exc_type is not None:
+            await self.abort()
+
+    async def write(self, chunk: bytes):
+        await self._write(self.decoder.feed(chunk))
+
+    async def _write(self, data: bytes):
+        if not data:
+            return
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise DownloadBudgetExceeded(f"Playlist exceeds {self.max_bytes} bytes")
+        self.digest.update(data)
+        # A marker split across chunks is found through the previous chunk's tail
+        scanned = self._tail + data
+        self.entries += scanned.count(_ENTRY_MARKER)
+        self._tail = scanned[-(len(_ENTRY_MARKER) - 1):]
+        await self._file.write(data)
+
+    async def write_all(self, chunks: AsyncIterable[bytes]):
+        async for chunk in chunks:
+            await self.write(chunk)
+
+    async def commit(self) -> UploadResult:
+        """Flush the upload to disk and atomically replace the target with it"""
+        await self._write(self.decoder.finish())
+        await self._file.flush()
+        await asyncio.to_thread(os.fsync, self._file.fileno())
+        await self._file.close()
+        await aiofiles.os.replace(self.temp_path, self.target)
+        logger.info(f"Stored uploaded playlist {self.target}: {self.size} bytes, {self.entries} entries")
+        return UploadResult(self.target, self.digest.hexdigest(), self.size, self.entries)
+
+    async def abort(self):
+        if self.temp_path is None:
+            return
+        try:
+            await aiofiles.os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
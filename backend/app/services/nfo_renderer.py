@@ -0,0 +1,367 @@
+import re
+from typing import Callable, Dict, List, Optional
+from app.services.title_normalizer import TitleNormalizer, TitleSettings
+
+_GENRE_SPLIT_RE = re.compile(r'[,/]')
+
+_INVALID_IDS = frozenset(['null', 'none', '0', ''])
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n'
+
+
+def escape_xml(text) -> str:
+    """Escape XML special characters"""
+    if not text:
+        return ''
+    # '&' must go first so entities produced below are not escaped again
+    return (str(text)
+            .replace('&', '&amp;')
+            .replace('<', '&lt;')
+            .replace('>', '&gt;')
+            .replace('"', '&quot;')
+            .replace("'", '&apos;'))
+
+
+def is_valid_tmdb_id(tmdb_id) -> bool:
+    """True if TMDB ID is a positive integer (not empty, null, none or 0)"""
+    if not tmdb_id:
+        return False
+    tmdb_str = str(tmdb_id).strip()
+    if tmdb_str.lower() in _INVALID_IDS:
+        return False
+    try:
+        return int(tmdb_str) > 0
+    except (ValueError, TypeError):
+        return False
+
+
+def is_valid_imdb_id(imdb_id) -> bool:
+    """True if IMDB ID is present (not empty, null, none or 0)"""
+    if not imdb_id:
+        return False
+    return str(imdb_id).strip().lower() not in _INVALID_IDS
+
+
+def parse_runtime_minutes(duration) -> Optional[int]:
+    """Parse "HH:MM:SS" or plain minutes into minutes, None if unparseable"""
+    try:
+        duration_str = str(duration)
+        if ':' in duration_str:
+            parts = duration_str.split(':')
+            return int(parts[0]) * 60 + int(parts[1])
+        return int(duration)
+    except (ValueError, TypeError, IndexError):
+        return None
+
+
+class NfoBuilder:
+    """Accumulates NFO lines in a list and joins them once on render"""
+
+    __slots__ = ('root', 'parts')
+
+    def __init__(self, root: str):
+        self.root = root
+        self.parts: List[str] = [XML_HEADER, f'<{root}>\n']
+
+    def element(self, tag: str, text, indent: str = '  '):
+        """Append an escaped text element"""
+        self.parts.append(f'{indent}<{tag}>{escape_xml(text)}</{tag}>\n')
+
+    def raw(self, line: str):
+        """Append a pre-formatted line as-is"""
+        self.parts.append(line)
+
+    def render(self) -> str:
+        self.parts.append(f'</{self.root}>')
+        return ''.join(self.parts)
+
+
+# A template receives the provider data, a title normalizer and optional
+# template-specific context, and returns the complete NFO document.
+NfoTemplate = Callable[..., str]
+
+
+def _add_common_metadata(b: NfoBuilder, data: dict, tmdb_id, imdb_id, rating, mpaa,
+                         plot_outline: bool):
+    plot = data.get('plot') or data.get('description', '')
+    if plot:
+        b.element('plot', plot)
+        if plot_outline:
+            b.element('outline', plot[:200])
+
+    # User rating (on 10 scale)
+    if rating:
+        try:
+            b.raw(f'  <userrating>{int(round(float(rating)))}</userrating>\n')
+        except (ValueError, TypeError):
+            pass
+
+    # MPAA content rating
+    if mpaa:
+        b.element('mpaa', mpaa)
+
+    # Unique IDs - TMDB first (default), then IMDB
+    if is_valid_tmdb_id(tmdb_id):
+        b.raw(f'  <uniqueid type="tmdb" default="true">{tmdb_id}</uniqueid>\n')
+    if is_valid_imdb_id(imdb_id):
+        b.raw(f'  <uniqueid type="imdb">{imdb_id}</uniqueid>\n')
+
+
+def _add_genres(b: NfoBuilder, genre):
+    # Genre - handle both comma and slash separators
+    if genre:
+        for g in _GENRE_SPLIT_RE.split(str(genre)):
+            g = g.strip()
+            if g:
+                b.element('genre', g)
+
+
+def _add_cast(b: NfoBuilder, cast_list):
+    if cast_list:
+        for actor in str(cast_list).split(','):
+            actor_name = actor.strip()
+            if actor_name:
+                b.raw(f'  <actor><name>{escape_xml(actor_name)}</name></actor>\n')
+
+
+def _add_artwork(b: NfoBuilder, data: dict, cover):
+    # Handle backdrop/fanart
+    backdrop_path = data.get('backdrop_path', [])
+    fanart = backdrop_path[0] if isinstance(backdrop_path, list) and backdrop_path else ''
+
+    if cover:
+        b.raw(f'  <thumb>{cover}</thumb>\n')
+
+    if fanart:
+        b.raw(f'  <fanart><thumb>{fanart}</thumb></fanart>\n')
+    elif cover:
+        b.raw(f'  <fanart><thumb>{cover}</thumb></fanart>\n')
+
+
+def _five_based_rating(data: dict, rating):
+    # Convert rating from 5-based to 10-based if needed
+    if rating and str(rating_5based := data.get('rating_5based')):
+        try:
+            rating = float(rating_5based) * 2
+        except (ValueError, TypeError):
+            pass
+    return rating
+
+
+def _add_stream_details(b: NfoBuilder, video, audio, duration_secs, bitrate,
+                        prefer_video_bitrate: bool):
+    """Add fileinfo/streamdetails if video or audio info available"""
+    if not (video or audio):
+        return
+
+    b.raw('  <fileinfo>\n    <streamdetails>\n')
+
+    if video:
+        b.raw('      <video>\n')
+        if video.get('codec_name'):
+            b.element('codec', video["codec_name"], '        ')
+        if video.get('width') and video.get('height'):
+            b.raw(f'        <width>{video["width"]}</width>\n')
+            b.raw(f'        <height>{video["height"]}</height>\n')
+        if video.get('display_aspect_ratio'):
+            b.element('aspect', video["display_aspect_ratio"], '        ')
+        if duration_secs:
+            try:
+                b.raw(f'        <durationinseconds>{int(float(duration_secs))}</durationinseconds>\n')
+            except (ValueError, TypeError):
+                pass
+        # Movies prefer the video stream bit_rate (bps), falling back to overall bitrate (kbps)
+        video_bitrate = video.get('bit_rate') if prefer_video_bitrate else None
+        if video_bitrate:
+            try:
+                b.raw(f'        <bitrate>{int(int(video_bitrate) / 1000)}</bitrate>\n')
+            except (ValueError, TypeError):
+                pass
+        elif bitrate:
+            try:
+                b.raw(f'        <bitrate>{int(bitrate)}</bitrate>\n')
+            except (ValueError, TypeError):
+                pass
+        b.raw('      </video>\n')
+
+    if audio:
+        b.raw('      <audio>\n')
+        if audio.get('codec_name'):
+            b.element('codec', audio["codec_name"], '        ')
+        if audio.get('channels'):
+            b.raw(f'        <channels>{audio["channels"]}</channels>\n')
+        if audio.get('sample_rate'):
+            b.raw(f'        <samplerate>{audio["sample_rate"]}</samplerate>\n')
+        if audio.get('channel_layout'):
+            b.element('layout', audio["channel_layout"], '        ')
+        # Try to get language from tags
+        audio_tags = audio.get('tags', {})
+        if audio_tags.get('language'):
+            b.element('language', audio_tags["language"], '        ')
+        b.raw('      </audio>\n')
+
+    b.raw('    </streamdetails>\n  </fileinfo>\n')
+
+
+def movie_template(data: dict, normalize: Callable[[str], str]) -> str:
+    """Render <movie> NFO with all available Xtream metadata"""
+    tmdb_id = data.get('tmdb', '')  # Xtream API uses 'tmdb' not 'tmdb_id'
+    imdb_id = data.get('imdb_id') or data.get('imdb', '')
+
+    # Use o_name as title if available, otherwise name
+    title = normalize(data.get('o_name') or data.get('name', 'Unknown'))
+
+    year = data.get('year') or data.get('releasedate', '')
+    rating = _five_based_rating(data, data.get('rating') or data.get('rating_5based', ''))
+    duration = data.get('duration') or data.get('episode_run_time', '')
+    trailer = data.get('youtube_trailer', '')
+    cover = data.get('movie_image') or data.get('cover_big') or data.get('stream_icon') or data.get('backdrop_path_original', '')
+    mpaa = data.get('mpaa') or data.get('content_rating') or data.get('certification') or data.get('age_rating', '')
+
+    b = NfoBuilder('movie')
+    b.element('title', title)
+    _add_common_metadata(b, data, tmdb_id, imdb_id, rating, mpaa, plot_outline=True)
+
+    if year:
+        # Extract year if it's a full date
+        b.raw(f'  <year>{str(year)[:4]}</year>\n')
+
+    _add_genres(b, data.get('genre', ''))
+
+    director = data.get('director', '')
+    if director:
+        b.element('director', director)
+
+    _add_cast(b, data.get('cast') or data.get('actors', ''))
+
+    # Duration (in minutes)
+    if duration:
+        total_mins = parse_runtime_minutes(duration)
+        if total_mins is not None:
+            b.raw(f'  <runtime>{total_mins}</runtime>\n')
+
+    if trailer:
+        b.raw(f'  <trailer>plugin://plugin.video.youtube/?action=play_video&amp;videoid={trailer}</trailer>\n')
+
+    _add_artwork(b, data, cover)
+    _add_stream_details(b, data.get('video', {}), data.get('audio', {}),
+                        data.get('duration_secs'), data.get('bitrate'), prefer_video_bitrate=True)
+    return b.render()
+
+
+def show_template(data: dict, normalize: Callable[[str], str]) -> str:
+    """Render <tvshow> NFO with all available Xtream metadata"""
+    tmdb_id = data.get('tmdb', '')  # Xtream API uses 'tmdb' not 'tmdb_id'
+    imdb_id = data.get('imdb_id') or data.get('imdb', '')
+
+    title = normalize(data.get('o_name') or data.get('name', 'Unknown'))
+
+    year = data.get('year') or data.get('releaseDate', '')
+    rating = _five_based_rating(data, data.get('rating') or data.get('rating_5based', ''))
+    cover = data.get('cover') or data.get('cover_big') or data.get('stream_icon') or data.get('backdrop_path_original', '')
+    mpaa = data.get('mpaa') or data.get('content_rating') or data.get('certification') or data.get('age_rating', '')
+
+    b = NfoBuilder('tvshow')
+    b.element('title', title)
+    _add_common_metadata(b, data, tmdb_id, imdb_id, rating, mpaa, plot_outline=False)
+
+    if year:
+        year_str = str(year)[:4]
+        b.raw(f'  <year>{year_str}</year>\n')
+        b.raw(f'  <premiered>{year_str}</premiered>\n')
+
+    _add_genres(b, data.get('genre', ''))
+
+    director = data.get('director', '')
+    if director:
+        b.element('director', director)
+
+    _add_cast(b, data.get('cast') or data.get('actors', ''))
+    _add_artwork(b, data, cover)
+    return b.render()
+
+
+def episode_template(data, normalize: Callable[[str], str], series_name: str = '',
+                     season: int = 0, episode: int = 0) -> str:
+    """Render <episodedetails> NFO with runtime and technical details"""
+    # Handle case where ep_data might be a list or other non-dict type
+    if isinstance(data, list):
+        data = data[0] if data else {}
+    if not isinstance(data, dict):
+        data = {}
+
+    # Episode info dict (contains duration, video, audio details)
+    info = data.get('info', {})
+    if isinstance(info, list):
+        info = info[0] if info else {}
+    if not isinstance(info, dict):
+        info = {}
+
+    title = data.get('title', f'Episode {episode}')
+
+    # Remove redundant series name prefix if present
+    if title.lower().startswith(series_name.lower()):
+        title = title[len(series_name):].strip(' -:')
+    if not title:
+        title = f'Episode {episode}'
+
+    title = normalize(title)
+
+    # Parse runtime from duration_secs or duration
+    runtime = 0
+    duration_secs = info.get('duration_secs')
+    if duration_secs:
+        try:
+            runtime = int(float(duration_secs)) // 60
+        except (ValueError, TypeError):
+            pass
+    if not runtime:
+        duration = info.get('duration', '')
+        if duration:
+            runtime = parse_runtime_minutes(duration) or 0
+
+    b = NfoBuilder('episodedetails')
+    b.element('title', title)
+    b.element('showtitle', series_name)
+    b.raw(f'  <season>{season}</season>\n')
+    b.raw(f'  <episode>{episode}</episode>\n')
+
+    if runtime > 0:
+        b.raw(f'  <runtime>{runtime}</runtime>\n')
+
+    _add_stream_details(b, info.get('video', {}), info.get('audio', {}),
+                        duration_secs, info.get('bitrate'), prefer_video_bitrate=False)
+    return b.render()
+
+
+class NfoRenderer:
+    """Renders NFO documents from registered templates"""
+
+    def __init__(self, templates: Optional[Dict[str, NfoTemplate]] = None):
+        self.templates: Dict[str, NfoTemplate] = dict(templates or DEFAULT_TEMPLATES)
+
+    def register(self, kind: str, template: NfoTemplate):
+        """Register or replace the template used for an NFO kind"""
+        self.templates[kind] = template
+
+    def render(self, kind: str, data, prefix_regex: Optional[str] = None,
+               format_date: bool = False, clean_name: bool = False,
+               normalizer: Optional[TitleNormalizer] = None, **context) -> str:
+        """Render an NFO; title options come from `normalizer` when given"""
+        template = self.templates.get(kind)
+        if template is None:
+            raise KeyError(f"No NFO template registered for '{kind}'")
+
+        if normalizer is None:
+            normalizer = TitleNormalizer(TitleSettings(prefix_regex or None, format_date, clean_name))
+
+        return template(data, normalizer.display_title, **context)
+
+
+DEFAULT_TEMPLATES: Dict[str, NfoTemplate] = {
+    'movie': movie_template,
+    'tvshow': show_template,
+    'episode': episode_template,
+}
+
+renderer = NfoRenderer()
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.models.output_file import OutputFile
+from app.services.db_writer import DBWriter
+
+logger = logging.getLogger(__name__)
+
+OWNER_XTREAM = "xtream"
+OWNER_M3U = "m3u"
+
+# Manifest rows fetched per round trip while loading or purging a root
+FETCH_SIZE = 1000
+
+
+def content_hash(content: str) -> str:
+    """SHA-1 of the UTF-8 encoded file content"""
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def prune_empty_dirs(path: str, root: str):
+    """Remove empty directories from path up to (not including) root"""
+    root = os.path.normpath(root)
+    path = os.path.normpath(path)
+    while path != root and path.startswith(root + os.sep):
+        try:
+            os.rmdir(path)
+        except OSError:
+            break  # Directory not empty or already gone
+        path = os.path.dirname(path)
+
+
+class OutputManifest:
+    """Index of the STRM/NFO files generated under one output root.
+
+    Every row in `output_files` below `root` is loaded once, so existence
+    checks and deletions never have to touch the filesystem tree. Rows are
+    added to the session as files are written; the caller commits. With a
+    `writer` the rows are detached from the session instead and every
+    change goes through the writer's short transactions.
+    """
+
+    def __init__(self, db: Session, root: str, owner_type: Optional[str], owner_id: Optional[int],
+                 writer: Optional[DBWriter] = None):
+        self.db = db
+        self.writer = writer
+        self.root = os.path.normpath(root)
+        self.owner_type = owner_type
+        self.owner_id = owner_id
+        self.files: Dict[str, OutputFile] = {}
+        self._by_source: Dict[str, Set[str]] = defaultdict(set)
+        # Streamed in batches; the index itself keeps every row
+        for row in db.query(OutputFile).filter(OutputFile.root == self.root).yield_per(FETCH_SIZE):
+            if writer is not None:
+                db.expunge(row)
+            self._index(row)
+
+    def _index(self, row: OutputFile):
+        self.files[row.rel_path] = row
+        if row.owner_type == self.owner_type and row.owner_id == self.owner_id:
+            self._by_source[row.source_key].add(row.rel_path)
+
+    def _unindex(self, row: OutputFile):
+        self.files.pop(row.rel_path, None)
+        paths = self._by_source.get(row.source_key)
+        if paths is not None:
+            paths.discard(row.rel_path)
+            if not paths:
+                del self._by_source[row.source_key]
+
+    def _drop(self, row: OutputFile):
+        if self.writer is not None:
+            self.writer.delete(OutputFile.__table__, [{"root": self.root, "rel_path": row.rel_path}])
+        elif row in self.db.new:
+            self.db.expunge(row)  # Written and removed within the same unit of work
+        else:
+            self.db.delete(row)
+
+    def rel(self, path: str) -> str:
+        return os.path.relpath(os.path.normpath(path), self.root)
+
+    def abs(self, rel_path: str) -> str:
+        return os.path.join(self.root, rel_path)
+
+    def exists(self, path: str) -> bool:
+        return self.rel(path) in self.files
+
+    def is_current(self, path: str, content: str) -> bool:
+        """True if the file is recorded with exactly this content"""
+        row = self.files.get(self.rel(path))
+        return row is not None and row.content_hash == content_hash(content)
+
+    def has_owned_files(self) -> bool:
+        return bool(self._by_source)
+
+    def has_source(self, source_key: str) -> bool:
+        return source_key in self._by_source
+
+    def paths_for(self, source_key: str) -> List[str]:
+        """Absolute paths recorded for a source item owned by this manifest"""
+        return [self.abs(p) for p in self._by_source.get(source_key, ())]
+
+    def owned_paths(self) -> Iterable[Tuple[str, str]]:
+        """(source_key, rel_path) for every file owned by this manifest"""
+        for source_key, paths in list(self._by_source.items()):
+            for rel_path in list(paths):
+                yield source_key, rel_path
+
+    def record(self, path: str, content: str, source_key: str):
+        """Record a file that was just written"""
+        rel_path = self.rel(path)
+        digest = content_hash(content)
+        size = len(content.encode("utf-8"))
+        row = self.files.get(rel_path)
+        if row is None:
+            row = OutputFile(root=self.root, rel_path=rel_path)
+            if self.writer is None:
+                self.db.add(row)
+        else:
+            self._unindex(row)
+        row.owner_type = self.owner_type
+        row.owner_id = self.owner_id
+        row.source_key = source_key
+        row.size = size
+        row.content_hash = digest
+        self._index(row)
+        if self.writer is not None:
+            self.writer.upsert(OutputFile.__table__, [{
+                "root": self.root, "rel_path": rel_path, "owner_type": self.owner_type,
+                "owner_id": self.owner_id, "source_key": source_key, "size": size,
+                "content_hash": digest, "updated_at": datetime.utcnow(),
+            }], ["root", "rel_path"], ["owner_type", "owner_id", "source_key", "size", "content_hash", "updated_at"])
+
+    def forget(self, path: str):
+        """Drop the record for a file that was removed"""
+        row = self.files.get(self.rel(path))
+        if row is not None:
+            self._unindex(row)
+            self._drop(row)
+
+    def delete_paths(self, rel_paths: Iterable[str]) -> int:
+        """Delete recorded files from disk and manifest, pruning emptied directories"""
+        deleted = 0
+        parents = set()
+        for rel_path in list(rel_paths):
+            row = self.files.get(rel_path)
+            if row is None:
+                continue
+            path = self.abs(rel_path)
+            try:
+                os.remove(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete {path}: {e}")
+                continue
+            parents.add(os.path.dirname(path))
+            self._unindex(row)
+            self._drop(row)
+
+        # Deepest directories first so parents can become empty
+        for parent in sorted(parents, key=len, reverse=True):
+            prune_empty_dirs(parent, self.root)
+        return deleted
+
+    def delete_source(self, source_key: str, keep: Iterable[str] = ()) -> int:
+        """Delete every file recorded for a source item except the `keep` paths"""
+        keep_rel = {self.rel(p) for p in keep}
+        stale = [p for p in self._by_source.get(source_key, ()) if p not in keep_rel]
+        return self.delete_paths(stale)
+
+    def delete_where(self, predicate: Callable[[str, str], bool]) -> int:
+        """Delete owned files for which predicate(source_key, rel_path) is true"""
+        return self.delete_paths([rel for key, rel in self.owned_paths() if predicate(key, rel)])
+
+
+def purge_root(db: Session, root: str, owner_type: Optional[str] = None,
+               owner_id: Optional[int] = None) -> Tuple[int, bool]:
+    """Delete manifest-tracked files under root (optionally for one owner only).
+
+    Only the paths are read, a batch at a time. Rows of files that could
+    not be deleted are kept; the caller commits. Returns (files_deleted,
+    tracked). `tracked` is False when the manifest has no rows for the
+    root, i.e. the tree predates the manifest.
+    """
+    root = os.path.normpath(root)
+    scope = [OutputFile.root == root]
+    if owner_type is not None:
+        scope += [OutputFile.owner_type == owner_type, OutputFile.owner_id == owner_id]
+
+    tracked = False
+    deleted = 0
+    kept_ids = []
+    parents = set()
+    for row_id, rel_path in db.query(OutputFile.id, OutputFile.rel_path).filter(*scope).yield_per(FETCH_SIZE):
+        tracked = True
+        path = os.path.join(root, rel_path)
+        try:
+            os.remove(path)
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not delete {path}: {e}")
+            kept_ids.append(row_id)
+            continue
+        parents.add(os.path.dirname(path))
+    if not tracked:
+        return 0, False
+
+    db.query(OutputFile).filter(*scope, OutputFile.id.notin_(kept_ids)).delete(synchronize_session=False)
+    # Deepest directories first so parents can become empty
+    for parent in sorted(parents, key=len, reverse=True):
+        prune_empty_dirs(parent, root)
+    return deleted, True
+
+
+def purge_legacy_tree(path: str):
+    """Fallback for output trees written before the manifest existed"""
+    if os.path.exists(path):
+        shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
@@ -0,0 +1,266 @@
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.models.cache import MovieCache, SeriesCache
+from app.models.m3u_source import M3USource
+from app.models.output_file import OutputFile
+from app.models.subscription import Subscription
+from app.services.content_stats import refresh_stats
+from app.services.output_manifest import OWNER_M3U, OWNER_XTREAM, prune_empty_dirs
+
+logger = logging.getLogger(__name__)
+
+# Only files the syncs generate are ever considered orphans
+MANAGED_EXTENSIONS = (".strm", ".nfo")
+
+# Files younger than this are left alone, a sync may not have committed them yet
+ORPHAN_GRACE_SECONDS = 600
+
+# Manifest rows deleted per statement
+DELETE_BATCH_SIZE = 500
+
+# Manifest rows fetched per round trip while loading a chunk's expected files
+LOAD_BATCH_SIZE = 1000
+
+Parts = Tuple[str, ...]
+
+
+class DirListing(NamedTuple):
+    parts: Parts  # directory relative to the root, as path components
+    files: Set[str]  # managed file names
+    subdirs: Set[str]
+
+
+class WalkChunk(NamedTuple):
+    dirs: List[DirListing]
+    cursor: Optional[Parts]  # last directory audited, None once the pass is complete
+    entries: int  # directory entries read, the unit of the I/O budget
+    done: bool
+
+
+class ManifestRow(NamedTuple):
+    id: int
+    rel_path: str
+    owner_type: str
+    owner_id: int
+    source_key: str
+
+
+def output_roots(db: Session) -> Dict[str, Set[Tuple[str, int]]]:
+    """Configured output directories mapped to the (owner_type, owner_id) pairs writing into them"""
+    roots: Dict[str, Set[Tuple[str, int]]] = defaultdict(set)
+    for sub in db.query(Subscription).all():
+        for directory in (sub.movies_dir, sub.series_dir):
+            if directory:
+                roots[os.path.normpath(directory)].add((OWNER_XTREAM, sub.id))
+    for source in db.query(M3USource).all():
+        for directory in (
+            source.movies_dir or f"{source.output_dir}/movies",
+            source.series_dir or f"{source.output_dir}/series",
+        ):
+            if directory:
+                roots[os.path.normpath(directory)].add((OWNER_M3U, source.id))
+    return dict(roots)
+
+
+def encode_cursor(parts: Optional[Parts]) -> Optional[str]:
+    return os.sep.join(parts) if parts is not None else None
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Parts]:
+    if cursor is None:
+        return None
+    return tuple(cursor.split(os.sep)) if cursor else ()
+
+
+def _scan(path: str) -> Tuple[Set[str], Set[str], int]:
+    files, subdirs, entries = set(), set(), 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                entries += 1
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(entry.name)
+                elif entry.name.endswith(MANAGED_EXTENSIONS):
+                    files.add(entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return files, subdirs, entries
+
+
+def walk_tree(root: str, cursor: Optional[Parts], budget: int) -> WalkChunk:
+    """Walk root depth-first in sorted order, resuming after `cursor`.
+
+    Pre-order traversal with sorted children visits directories in tuple
+    order of their path components, so everything <= cursor was audited by a
+    previous run. Stops once `budget` directory entries have been read.
+    """
+    dirs: List[DirListing] = []
+    entries = 0
+    stack: List[Parts] = [()]
+
+    while stack:
+        parts = stack.pop()
+        resumed = cursor is not None and parts <= cursor
+        if resumed and cursor[:len(parts)] != parts:
+            continue  # Whole subtree sorts before the cursor
+
+        files, subdirs, count = _scan(os.path.join(root, *parts))
+        entries += count
+        stack.extend(parts + (name,) for name in sorted(subdirs, reverse=True))
+
+        if resumed:
+            continue  # Ancestor of the cursor: only listed to find the remaining children
+
+        dirs.append(DirListing(parts, files, subdirs))
+        if entries >= budget and stack:
+            return WalkChunk(dirs, parts, entries, False)
+
+    return WalkChunk(dirs, None, entries, True)
+
+
+class ExpectedTree:
+    """Manifest rows of one output root indexed by directory"""
+
+    def __init__(self, rows: Iterable[ManifestRow]):
+        self.files: Dict[Parts, Dict[str, ManifestRow]] = defaultdict(dict)
+        self.children: Dict[Parts, Set[str]] = defaultdict(set)
+        for row in rows:
+            parts = tuple(row.rel_path.split(os.sep))
+            directory = parts[:-1]
+            self.files[directory][parts[-1]] = row
+            for depth in range(len(directory)):
+                self.children[directory[:depth]].add(directory[depth])
+
+    @classmethod
+    def load(cls, db: Session, root: str, chunk: Optional[WalkChunk] = None) -> "ExpectedTree":
+        """Manifest rows of root, or with `chunk` only those needed to reconcile it"""
+        query = db.query(
+            OutputFile.id, OutputFile.rel_path, OutputFile.owner_type,
+            OutputFile.owner_id, OutputFile.source_key
+        ).filter(OutputFile.root == root)
+        if chunk is None:
+            return cls(ManifestRow(*row) for row in query)
+        return cls(_chunk_rows(query, chunk))
+
+    def _subtree(self, parts: Parts) -> List[ManifestRow]:
+        rows = list(self.files.get(parts, {}).values())
+        for child in self.children.get(parts, ()):
+            rows.extend(self._subtree(parts + (child,)))
+        return rows
+
+    def orphans(self, listing: DirListing) -> Set[str]:
+        """Managed files on disk that the manifest does not know about"""
+        return listing.files - self.files.get(listing.parts, {}).keys()
+
+    def missing(self, listing: DirListing) -> List[ManifestRow]:
+        """Manifest rows whose file (or a whole directory of them) is gone"""
+        expected = self.files.get(listing.parts, {})
+        rows = [row for name, row in expected.items() if name not in listing.files]
+        for child in self.children.get(listing.parts, set()) - listing.subdirs:
+            rows.extend(self._subtree(listing.parts + (child,)))
+        return rows
+
+
+def _chunk_rows(query, chunk: WalkChunk) -> Iterable[ManifestRow]:
+    """Rows of the files in the chunk's directories and under their subdirectories gone from disk.
+
+    Only the subtrees of the topmost walked directories are read, a batch at
+    a time (a prefix range on the root/rel_path index); rows under
+    subdirectories that are still on disk belong to the chunks walking them.
+    """
+    walked = {listing.parts: listing.subdirs for listing in chunk.dirs}
+    tops = [parts for parts in walked if not any(parts[:depth] in walked for depth in range(len(parts)))]
+    for top in tops:
+        ranged = query
+        if top:
+            prefix = os.sep.join(top) + os.sep
+            ranged = query.filter(OutputFile.rel_path >= prefix,
+                                  OutputFile.rel_path < prefix[:-1] + chr(ord(os.sep) + 1))
+        for row in ranged.yield_per(LOAD_BATCH_SIZE):
+            directory = tuple(row.rel_path.split(os.sep))[:-1]
+            if directory in walked:
+                yield ManifestRow(*row)
+                continue
+            # Deepest walked ancestor; the row is needed if its branch is gone from disk
+            depth = len(directory) - 1
+            while directory[:depth] not in walked:
+                depth -= 1
+            if directory[depth] not in walked[directory[:depth]]:
+                yield ManifestRow(*row)
+
+
+def remove_orphans(root: str, listing: DirListing, names: Iterable[str]) -> int:
+    """Delete orphaned files of one directory, pruning it if it ends up empty"""
+    directory = os.path.join(root, *listing.parts)
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    removed = 0
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if os.stat(path).st_mtime > cutoff:
+                continue
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove orphan {path}: {e}")
+    if removed:
+        prune_empty_dirs(directory, root)
+    return removed
+
+
+def invalidate_missing(db: Session, rows: List[ManifestRow]) -> int:
+    """Forget missing files so the next sync writes them again.
+
+    Xtream items are only rewritten when they are not cached, so their cache
+    row is dropped; M3U entries are regenerated on every sync.
+    """
+    ids = [row.id for row in rows]
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        batch = ids[start:start + DELETE_BATCH_SIZE]
+        db.query(OutputFile).filter(OutputFile.id.in_(batch)).delete(synchronize_session=False)
+
+    sources = {(row.owner_type, row.owner_id, row.source_key) for row in rows}
+    subscription_ids = set()
+    for owner_type, owner_id, source_key in sources:
+        if owner_type != OWNER_XTREAM:
+            continue
+        subscription_ids.add(owner_id)
+        kind, _, item_id = source_key.partition(":")
+        if kind == "movie":
+            db.query(MovieCache).filter(
+                MovieCache.subscription_id == owner_id,
+                MovieCache.stream_id == int(item_id)
+            ).delete(synchronize_session=False)
+        elif kind == "series":
+            db.query(SeriesCache).filter(
+                SeriesCache.subscription_id == owner_id,
+                SeriesCache.series_id == int(item_id)
+            ).delete(synchronize_session=False)
+    refresh_stats(db, subscription_ids=subscription_ids)
+    return len(sources)
+
+
+def reconcile_chunk(db: Session, root: str, chunk: WalkChunk, expected: ExpectedTree,
+                    remove: bool) -> Tuple[int, int]:
+    """Apply one walked chunk: remove orphans (if allowed) and invalidate missing files.
+
+    Returns (orphans_removed, missing_files). The caller commits.
+    """
+    orphans_removed = 0
+    missing: List[ManifestRow] = []
+    for listing in chunk.dirs:
+        if remove:
+            orphans = expected.orphans(listing)
+            if orphans:
+                orphans_removed += remove_orphans(root, listing, sorted(orphans))
+        missing.extend(expected.missing(listing))
+
+    if missing:
+        invalidate_missing(db, missing)
+    return orphans_removed, len(missing)
@@ -0,0 +1,129 @@
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Hashable, List, NamedTuple, Tuple
+
+# POSIX NAME_MAX and PATH_MAX, both in bytes
+MAX_COMPONENT_BYTES = 255
+MAX_PATH_BYTES = 4096
+
+# Room kept for the longest extension the writers append (".strm")
+EXTENSION_BYTES = len(".strm")
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def truncate_bytes(name: str, max_bytes: int) -> str:
+    """Cut name to at most max_bytes of UTF-8 without splitting a character"""
+    encoded = name.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return name
+    return encoded[:max(max_bytes, 0)].decode("utf-8", "ignore").rstrip()
+
+
+@lru_cache(maxsize=65536)
+def fit_component(name: str, max_bytes: int = MAX_COMPONENT_BYTES) -> str:
+    """NFC-normalize a sanitized file or directory name and fit it to max_bytes"""
+    return truncate_bytes(unicodedata.normalize("NFC", name), max_bytes)
+
+
+class PlannedPath(NamedTuple):
+    directory: str  # directory holding the item's files
+    stem: str  # file name without extension
+
+    def file(self, extension: str) -> str:
+        return f"{self.directory}/{self.stem}{extension}"
+
+
+class _Claim(NamedTuple):
+    parent: str  # fitted parent directory relative to the root ("" for the root itself)
+    name: str  # fitted, un-disambiguated name
+    tag: str  # deterministic disambiguator, e.g. the provider id
+    folder: bool  # name is used for a folder and the files inside it
+
+
+class PathPlanner:
+    """Assign every item of a sync a unique output path before anything is written.
+
+    Items are added with the sanitized name they would like, then resolved
+    in one pass. Names are NFC-normalized and truncated on UTF-8 byte length
+    so the component and the whole path stay within filesystem limits.
+    Items whose names collide (case-insensitively, in the same directory)
+    are disambiguated deterministically: the smallest tag keeps the plain
+    name, the others get a " [tag]" suffix. Adding the same key twice is a
+    no-op, so duplicate provider listings are written once.
+    """
+
+    def __init__(self, root: str, max_component_bytes: int = MAX_COMPONENT_BYTES,
+                 max_path_bytes: int = MAX_PATH_BYTES):
+        self.root = root.rstrip("/") or "/"
+        self.max_component_bytes = max_component_bytes
+        self.max_path_bytes = max_path_bytes
+        self.duplicates = 0
+        self.collisions = 0
+        self._claims: Dict[Hashable, _Claim] = {}
+
+    def __len__(self) -> int:
+        return len(self._claims)
+
+    def directory(self, parent: str) -> str:
+        """Absolute directory for a fitted parent path"""
+        return f"{self.root}/{parent}" if parent else self.root
+
+    def fit_parent(self, parent: str) -> str:
+        return "/".join(fit_component(p, self.max_component_bytes) for p in parent.split("/") if p)
+
+    def add(self, key: Hashable, parent: str, name: str, tag, folder: bool = False) -> bool:
+        """Claim a path for key; False if the key was already planned"""
+        if key in self._claims:
+            self.duplicates += 1
+            return False
+        parent = self.fit_parent(parent)
+        self._claims[key] = _Claim(parent, self._fit_name(parent, name, 0, folder), str(tag), folder)
+        return True
+
+    def _name_budget(self, parent: str, reserve: int, folder: bool) -> int:
+        budget = self.max_component_bytes - EXTENSION_BYTES
+        # Bytes left once the directory, separators and extension are accounted for
+        path_left = self.max_path_bytes - _utf8_len(self.directory(parent)) - 1 - EXTENSION_BYTES
+        if folder:
+            path_left = (path_left - 1) // 2  # name appears as folder and file stem
+        return min(budget, path_left) - reserve
+
+    def _fit_name(self, parent: str, name: str, reserve: int, folder: bool) -> str:
+        return fit_component(name, self._name_budget(parent, reserve, folder))
+
+    def _suffixed(self, claim: _Claim, suffix: str) -> str:
+        suffix = f" [{suffix}]"
+        base = self._fit_name(claim.parent, claim.name, _utf8_len(suffix), claim.folder)
+        return f"{base}{suffix}"
+
+    def resolve(self) -> Dict[Hashable, PlannedPath]:
+        """Final path of every planned key"""
+        groups: Dict[Tuple[str, str], List[Tuple[Hashable, _Claim]]] = defaultdict(list)
+        for key, claim in self._claims.items():
+            groups[(claim.parent.casefold(), claim.name.casefold())].append((key, claim))
+
+        taken = set(groups)
+        plan: Dict[Hashable, PlannedPath] = {}
+        for group in sorted(groups):
+            # Numeric-looking tags sort numerically, so the oldest provider id wins
+            members = sorted(groups[group], key=lambda kc: (len(kc[1].tag), kc[1].tag))
+            for index, (key, claim) in enumerate(members):
+                name = claim.name
+                if index:
+                    self.collisions += 1
+                    name = self._suffixed(claim, claim.tag)
+                    attempt = 2
+                    while (claim.parent.casefold(), name.casefold()) in taken:
+                        name = self._suffixed(claim, f"{claim.tag}-{attempt}")
+                        attempt += 1
+                    taken.add((claim.parent.casefold(), name.casefold()))
+
+                directory = self.directory(claim.parent)
+                if claim.folder:
+                    directory = f"{directory}/{name}"
+                plan[key] = PlannedPath(directory, name)
+        return plan
@@ -0,0 +1,114 @@
+import logging
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence
+from sqlalchemy import and_, delete, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.schema import Table
+from app.models.selection_change import SelectionChange
+
+logger = logging.getLogger(__name__)
+
+
+class SelectionDiff(NamedTuple):
+    """Keys of the rows a selection save inserted and deleted"""
+    added: List[tuple]
+    removed: List[tuple]
+
+
+class PendingChange(NamedTuple):
+    """Net effect of the selection edits a sync has not handled yet"""
+    added: FrozenSet[str]
+    removed: FrozenSet[str]
+    last_id: Optional[int]  # newest change covered, acknowledged after the sync
+
+    @property
+    def additions_only(self) -> bool:
+        return bool(self.added) and not self.removed
+
+
+def apply_selection(db: Session, table: Table, scope: Dict[str, object], key_columns: Sequence[str],
+                    wanted: Iterable[Dict]) -> SelectionDiff:
+    """Make the selection rows in scope exactly `wanted`, writing only the difference.
+
+    Rows are matched on `key_columns`; wanted rows that are not stored yet
+    are inserted with one statement, stored rows that are no longer wanted
+    (and repeated rows of a key) deleted with another. The caller commits.
+    """
+    where = and_(*(table.c[column] == value for column, value in scope.items()))
+    stored = {}
+    duplicate_ids = []
+    for row in db.execute(select(table.c.id, *(table.c[c] for c in key_columns)).where(where)):
+        key = tuple(row[1:])
+        if key in stored:
+            duplicate_ids.append(row.id)
+        else:
+            stored[key] = row.id
+
+    inserts = {}
+    listed = set()
+    for values in wanted:
+        key = tuple(values[c] for c in key_columns)
+        listed.add(key)
+        if key not in stored:
+            inserts.setdefault(key, {**scope, **values})
+    removed = [key for key in stored if key not in listed]
+
+    if inserts:
+        db.execute(insert(table), list(inserts.values()))
+    stale_ids = duplicate_ids + [stored[key] for key in removed]
+    if stale_ids:
+        db.execute(delete(table).where(table.c.id.in_(stale_ids)))
+    return SelectionDiff(list(inserts), removed)
+
+
+def record_selection_change(db: Session, source_type: str, source_id: int, content_type: str,
+                            added: Iterable[str], removed: Iterable[str]) -> Optional[SelectionChange]:
+    """Log a selection edit for the next sync, nothing if the selection did not change; the caller commits"""
+    added, removed = sorted(added), sorted(removed)
+    if not added and not removed:
+        return None
+    change = SelectionChange(source_type=source_type, source_id=source_id, content_type=content_type,
+                             added=added, removed=removed)
+    db.add(change)
+    logger.info(f"Selection of {source_type} {source_id} ({content_type}) changed: "
+                f"{len(added)} added, {len(removed)} removed")
+    return change
+
+
+def _scope(source_type: str, source_id: int, content_type: str):
+    return and_(SelectionChange.source_type == source_type, SelectionChange.source_id == source_id,
+                SelectionChange.content_type == content_type)
+
+
+def pending_selection_change(db: Session, source_type: str, source_id: int, content_type: str) -> PendingChange:
+    """Edits since the last sync merged into one: a key added and removed again cancels out"""
+    added, removed = set(), set()
+    last_id = None
+    for row in db.query(SelectionChange.id, SelectionChange.added, SelectionChange.removed).filter(
+        _scope(source_type, source_id, content_type)
+    ).order_by(SelectionChange.id):
+        for key in row.added:
+            if key in removed:
+                removed.discard(key)
+            else:
+                added.add(key)
+        for key in row.removed:
+            if key in added:
+                added.discard(key)
+            else:
+                removed.add(key)
+        last_id = row.id
+    return PendingChange(frozenset(added), frozenset(removed), last_id)
+
+
+def acknowledge_selection_changes(db: Session, source_type: str, source_id: int, content_type: str,
+                                  last_id: Optional[int]):
+    """Forget the edits a finished sync handled; later edits stay pending. The caller commits."""
+    if last_id is not None:
+        db.execute(delete(SelectionChange).where(_scope(source_type, source_id, content_type),
+                                                 SelectionChange.id <= last_id))
+
+
+def clear_selection_changes(db: Session, source_type: str, source_id: int):
+    """Forget the pending edits of a deleted source"""
+    db.execute(delete(SelectionChange).where(SelectionChange.source_type == source_type,
+                                             SelectionChange.source_id == source_id))
@@ -0,0 +1,127 @@
+import re
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Pattern
+
+# Default language prefix pattern (e.g. "FR - ", "TN - ", "ARA - ", "EN_")
+DEFAULT_PREFIX_REGEX = r'^(?:[A-Za-z0-9.-]+_|[A-Za-z]{2,}\s*-\s*)'
+
+_DEFAULT_PREFIX_RE = re.compile(DEFAULT_PREFIX_REGEX)
+_DATE_SUFFIX_RE = re.compile(r'[_\s](\d{4})$')
+_EPISODE_CODE_RE = re.compile(r'^S\d{1,2}E\d{1,2}\s*[-:.]?\s*', re.IGNORECASE)
+_EPISODE_X_CODE_RE = re.compile(r'^\d{1,2}x\d{1,2}\s*[-:.]?\s*', re.IGNORECASE)
+_INVALID_PATH_CHARS_RE = re.compile(r'[\\/:*?"<>|]')
+
+# Truncate path components to 200 characters so the full path stays under 255
+# (leaving room for directory path, extension, etc.)
+MAX_NAME_LENGTH = 200
+
+# Category, series and episode names repeat thousands of times per sync
+CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=64)
+def compile_prefix_regex(prefix_regex: Optional[str]) -> Pattern:
+    """Compile a user supplied prefix regex, falling back to the default if invalid"""
+    if not prefix_regex:
+        return _DEFAULT_PREFIX_RE
+    try:
+        return re.compile(prefix_regex)
+    except re.error:
+        return _DEFAULT_PREFIX_RE
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def sanitize_path_component(name: str) -> str:
+    """Replace characters invalid on common filesystems and cap the length"""
+    return _INVALID_PATH_CHARS_RE.sub('_', name)[:MAX_NAME_LENGTH]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def sanitize_m3u_name(name: str) -> str:
+    """Keep only alphanumerics, spaces, dashes and underscores (M3U output naming)"""
+    return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
+
+
+class TitleSettings(NamedTuple):
+    """Title-related settings; doubles as the settings version in cache keys"""
+    prefix_regex: Optional[str] = None
+    format_date: bool = False
+    clean_name: bool = False
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Optional[str]]) -> "TitleSettings":
+        """Build from SettingsModel key/value pairs"""
+        return cls(
+            prefix_regex=settings.get("PREFIX_REGEX") or None,
+            format_date=settings.get("FORMAT_DATE_IN_TITLE") == "true",
+            clean_name=settings.get("CLEAN_NAME") == "true",
+        )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _display_title(settings: TitleSettings, title: str) -> str:
+    title = compile_prefix_regex(settings.prefix_regex).sub('', title)
+
+    # Format date at end: "Name_2024" -> "Name (2024)"
+    if settings.format_date:
+        title = _DATE_SUFFIX_RE.sub(r' (\1)', title)
+
+    # Clean name: replace underscores with spaces
+    if settings.clean_name:
+        title = title.replace('_', ' ')
+
+    return title
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _episode_title(title: str, series_name: str) -> str:
+    # Remove series name prefix (case-insensitive)
+    if title.lower().startswith(series_name.lower()):
+        title = title[len(series_name):].strip(' -:')
+    # Remove episode code patterns like "S01E01 -", "S01E01" or "1x01"
+    title = _EPISODE_CODE_RE.sub('', title)
+    title = _EPISODE_X_CODE_RE.sub('', title)
+    return title.strip(' -:')
+
+
+class TitleNormalizer:
+    """Title cleaning rules shared by the NFO generators and the sync tasks.
+
+    Built once per sync from SettingsModel values. Results are memoised in
+    bounded LRU caches keyed on (settings, raw title).
+    """
+
+    def __init__(self, settings: Optional[TitleSettings] = None):
+        self.settings = settings or TitleSettings()
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Optional[str]]) -> "TitleNormalizer":
+        return cls(TitleSettings.from_settings(settings))
+
+    def display_title(self, title: str) -> str:
+        """Title shown in NFOs: prefix stripped, optional year formatting and underscore cleaning"""
+        return _display_title(self.settings, title)
+
+    def episode_title(self, title: str, series_name: str) -> str:
+        """Episode title for filenames, without the series name or a leading episode code"""
+        if not title:
+            return title
+        return _episode_title(title, series_name)
+
+    def path_component(self, name: str) -> str:
+        """Xtream output file/folder name"""
+        return sanitize_path_component(name)
+
+    def m3u_component(self, name: str) -> str:
+        """M3U output file/folder name"""
+        return sanitize_m3u_name(name)
+
+
+def cache_info() -> Dict[str, object]:
+    """Hit/miss statistics of the normalization caches"""
+    return {
+        "display_title": _display_title.cache_info(),
+        "episode_title": _episode_title.cache_info(),
+        "path_component": sanitize_path_component.cache_info(),
+        "m3u_component": sanitize_m3u_name.cache_info(),
+    }
@@ -0,0 +1,163 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, literal, literal_column, select, text, tuple_, union_all
+from sqlalchemy.orm import Session
+from app.models.cache import EpisodeCache, MovieCache, SeriesCache
+from app.models.m3u_entry import M3UEntry
+from app.models.m3u_source import M3USource
+from app.models.output_file import OutputFile
+from app.models.subscription import Subscription
+from app.services.content_stats import SOURCE_M3U, SOURCE_XTREAM
+from app.services.output_manifest import OWNER_M3U, OWNER_XTREAM
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Kinds of indexed rows; on SQLite they are part of the index rowids
+# (`id * 4 + kind`, see migration 0006) and must not change
+KIND_MOVIE = 0
+KIND_SERIES = 1
+KIND_EPISODE = 2
+KIND_M3U = 3
+KIND_NAMES = {KIND_MOVIE: "movie", KIND_SERIES: "series", KIND_EPISODE: "episode", KIND_M3U: "m3u"}
+
+# (kind, title column, id column) of every indexed table
+INDEXED = (
+    (KIND_MOVIE, MovieCache.name, MovieCache.id),
+    (KIND_SERIES, SeriesCache.name, SeriesCache.id),
+    (KIND_EPISODE, EpisodeCache.title, EpisodeCache.id),
+    (KIND_M3U, M3UEntry.title, M3UEntry.id),
+)
+
+
+def search_terms(query: str) -> List[str]:
+    """Words of a user query; punctuation is not searchable and is dropped"""
+    return re.findall(r"\w+", query)
+
+
+def _match_sqlite(db: Session, terms: List[str], limit: int) -> List[Tuple[int, int, float]]:
+    # Every word must appear; the last one may still be being typed: "star wa" finds "Star Wars"
+    match = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+    rows = db.execute(
+        text("SELECT rowid, bm25(title_search) FROM title_search WHERE title_search MATCH :match "
+             "ORDER BY bm25(title_search) LIMIT :limit"),
+        {"match": match, "limit": limit},
+    )
+    # bm25 is lower for better matches
+    return [(rowid % 4, rowid // 4, -score) for rowid, score in rows]
+
+
+def _match_postgresql(db: Session, terms: List[str], limit: int) -> List[Tuple[int, int, float]]:
+    tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(terms[:-1] + [f"{terms[-1]}:*"]))
+    selects = []
+    for kind, title, row_id in INDEXED:
+        # Same expression as the GIN index of migration 0006
+        vector = func.to_tsvector(literal_column("'simple'"), func.coalesce(title, literal_column("''")))
+        selects.append(
+            select(literal(kind).label("kind"), row_id.label("id"), func.ts_rank(vector, tsquery).label("score"))
+            .where(vector.op("@@")(tsquery))
+        )
+    matches = union_all(*selects).subquery()
+    rows = db.execute(select(matches).order_by(matches.c.score.desc(), matches.c.id).limit(limit))
+    return [(kind, row_id, score) for kind, row_id, score in rows]
+
+
+def _describe(db: Session, ids: Dict[int, List[int]]) -> Dict[Tuple[int, int], Dict]:
+    """Details of the matched rows, one query per kind of row matched"""
+    found = {}
+    if ids.get(KIND_MOVIE):
+        for row in db.query(MovieCache.id, MovieCache.subscription_id, MovieCache.stream_id, MovieCache.name,
+                            MovieCache.category_id).filter(MovieCache.id.in_(ids[KIND_MOVIE])):
+            found[KIND_MOVIE, row.id] = {
+                "source_type": SOURCE_XTREAM, "source_id": row.subscription_id, "title": row.name,
+                "entry_type": "movie", "group": row.category_id,
+                "files": (OWNER_XTREAM, row.subscription_id, f"movie:{row.stream_id}"),
+            }
+    if ids.get(KIND_SERIES):
+        for row in db.query(SeriesCache.id, SeriesCache.subscription_id, SeriesCache.series_id, SeriesCache.name,
+                            SeriesCache.category_id).filter(SeriesCache.id.in_(ids[KIND_SERIES])):
+            found[KIND_SERIES, row.id] = {
+                "source_type": SOURCE_XTREAM, "source_id": row.subscription_id, "title": row.name,
+                "entry_type": "series", "group": row.category_id,
+                "files": (OWNER_XTREAM, row.subscription_id, f"series:{row.series_id}"),
+            }
+    if ids.get(KIND_EPISODE):
+        for row in db.query(EpisodeCache.id, EpisodeCache.subscription_id, EpisodeCache.series_id,
+                            EpisodeCache.title).filter(EpisodeCache.id.in_(ids[KIND_EPISODE])):
+            # Episode files belong to their series
+            found[KIND_EPISODE, row.id] = {
+                "source_type": SOURCE_XTREAM, "source_id": row.subscription_id, "title": row.title,
+                "entry_type": "episode", "group": None,
+                "files": (OWNER_XTREAM, row.subscription_id, f"series:{row.series_id}"),
+            }
+    if ids.get(KIND_M3U):
+        for row in db.query(M3UEntry.id, M3UEntry.m3u_source_id, M3UEntry.title, M3UEntry.url,
+                            M3UEntry.group_title, M3UEntry.entry_type).filter(M3UEntry.id.in_(ids[KIND_M3U])):
+            found[KIND_M3U, row.id] = {
+                "source_type": SOURCE_M3U, "source_id": row.m3u_source_id, "title": row.title,
+                "entry_type": row.entry_type.value, "group": row.group_title,
+                "files": (OWNER_M3U, row.m3u_source_id, f"entry:{row.url}"),
+            }
+    return found
+
+
+def _strm_paths(db: Session, keys: List[Tuple[str, int, str]]) -> Dict[Tuple[str, int, str], str]:
+    """A written STRM file of each (owner type, owner id, source key): the movie's, or a series' first episode"""
+    if not keys:
+        return {}
+    rows = (
+        db.query(OutputFile.owner_type, OutputFile.owner_id, OutputFile.source_key, OutputFile.root,
+                 func.min(OutputFile.rel_path))
+        .filter(tuple_(OutputFile.owner_type, OutputFile.owner_id, OutputFile.source_key).in_(keys),
+                OutputFile.rel_path.like("%.strm"))
+        .group_by(OutputFile.owner_type, OutputFile.owner_id, OutputFile.source_key, OutputFile.root)
+    )
+    return {(owner_type, owner_id, source_key): os.path.join(root, rel_path)
+            for owner_type, owner_id, source_key, root, rel_path in rows}
+
+
+def _source_names(db: Session, hits: List[Dict]) -> Dict[Tuple[str, int], str]:
+    names = {}
+    for source_type, model in ((SOURCE_XTREAM, Subscription), (SOURCE_M3U, M3USource)):
+        source_ids = {hit["source_id"] for hit in hits if hit["source_type"] == source_type}
+        if source_ids:
+            for source_id, name in db.query(model.id, model.name).filter(model.id.in_(source_ids)):
+                names[source_type, source_id] = name
+    return names
+
+
+def search_titles(db: Session, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+    """Cached titles of every source matching all words of query, best match first.
+
+    Every hit names the source it comes from and, once a sync wrote it, the
+    path of its STRM file. The matching itself is a lookup in the full-text
+    index (FTS5 on SQLite, GIN on PostgreSQL); the details of the `limit`
+    hits are then read with a fixed number of queries.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        matches = _match_postgresql(db, terms, limit)
+    else:
+        matches = _match_sqlite(db, terms, limit)
+
+    ids: Dict[int, List[int]] = {}
+    for kind, row_id, _ in matches:
+        ids.setdefault(kind, []).append(row_id)
+    found = _describe(db, ids)
+
+    hits = []
+    for kind, row_id, score in matches:
+        details: Optional[Dict] = found.get((kind, row_id))
+        if details is None:
+            continue  # deleted since it was matched
+        hits.append(dict(details, kind=KIND_NAMES[kind], id=row_id, score=score))
+
+    paths = _strm_paths(db, list({hit["files"] for hit in hits}))
+    names = _source_names(db, hits)
+    for hit in hits:
+        hit["source_name"] = names.get((hit["source_type"], hit["source_id"]))
+        hit["strm_path"] = paths.get(hit.pop("files"))
+    return hits
@@ -0,0 +1,43 @@
+from app.core.celery_app import celery_app
+from app.db.session import SessionLocal
+from app.models.subscription import Subscription
+from app.services.categories import CATEGORY_MOVIE, store_categories
+from app.services.xtream import XtreamClient
+from datetime import datetime
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Celery state of a refresh between start and finish; meta carries the phase
+STATE_PROGRESS = "PROGRESS"
+
+
+@celery_app.task(bind=True)
+def refresh_categories_task(self, subscription_id: int, category_type: str):
+    """Refresh a subscription's movie or series categories from the provider.
+
+    Only the category list is downloaded; item counts are left to the next
+    sync, which fetches the whole catalogue anyway. Progress is reported
+    through the task state, see GET /selection/refresh/{task_id}.
+    """
+    db = SessionLocal()
+    try:
+        sub = db.query(Subscription).filter(Subscription.id == subscription_id).first()
+        if not sub:
+            raise ValueError(f"Subscription {subscription_id} not found")
+
+        self.update_state(state=STATE_PROGRESS, meta={"phase": "Fetching categories"})
+        xc = XtreamClient(sub.xtream_url, sub.username, sub.password)
+        if category_type == CATEGORY_MOVIE:
+            categories = asyncio.run(xc.get_vod_categories())
+        else:
+            categories = asyncio.run(xc.get_series_categories())
+
+        self.update_state(state=STATE_PROGRESS, meta={"phase": "Saving categories"})
+        synced = store_categories(db, subscription_id, category_type, categories)
+        db.commit()
+        logger.info(f"Refreshed {synced} {category_type} categories for {sub.name}")
+        return {"categories_synced": synced, "timestamp": datetime.utcnow().isoformat()}
+    finally:
+        db.close()
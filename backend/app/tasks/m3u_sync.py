@@ -1,17 +1,30 @@
 from app.core.celery_app import celery_app
+from app.core.database import sync_lock
+from sqlalchemy import bindparam, delete, insert, select, update
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.models.m3u_source import M3USource, SourceType
 from app.models.m3u_entry import M3UEntry, EntryType
 from app.models.m3u_selection import M3USelection, SelectionType
 from app.models.m3u_sync_state import M3USyncState
+from app.models.m3u_group_hash import M3UGroupHash
 from app.models.settings import SettingsModel
-from app.services.m3u_parser import parse_m3u_url, parse_m3u_file
+from app.services.m3u_parser import iter_m3u_file
+from app.services.m3u_fetch import PlaylistSnapshot, fetch_playlist, snapshot_file
 from app.services.file_manager import FileManager
+from app.services.title_normalizer import TitleNormalizer, sanitize_m3u_name
+from app.services.output_manifest import OutputManifest, OWNER_M3U
+from app.services.db_writer import DBWriter
+from app.services.content_stats import SOURCE_M3U, refresh_m3u_stats
+from app.services.path_planner import PathPlanner, PlannedPath, fit_component
+from app.services.selection_changes import acknowledge_selection_changes, pending_selection_change
 import logging
-from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from datetime import datetime
 from pathlib import Path
-from typing import Set, Optional, Tuple
+from typing import Callable, Iterable, List, NamedTuple, Set, Optional, Tuple
+from asyncio import Semaphore
+from concurrent.futures import ThreadPoolExecutor
 import shutil
 import hashlib
 import asyncio
@@ -23,6 +36,27 @@ CONTENT_TYPE_MOVIES = "movies"
 CONTENT_TYPE_SERIES = "series"
 STRM_EXTENSION = ".strm"
 
+# Cached entry rows written per statement (and transaction) while streaming a playlist
+ENTRY_BATCH_SIZE = 1000
+
+# Files written at once during generation, sized for network-backed output
+FILE_WRITE_CONCURRENCY = 32
+
+# Cached entries fetched per round trip while planning output paths
+PLAN_FETCH_SIZE = 1000
+
+# Part of every group fingerprint; bump when the generated STRM/NFO format changes
+GENERATION_VERSION = "1"
+
+# Entry columns compared to decide whether a cached entry changed
+ENTRY_FIELDS = ("title", "url", "group_title", "logo", "tvg_id", "tvg_name", "entry_type")
+
+# Parsed entry types that are cached; live channels are not
+ENTRY_TYPES = {"movie": EntryType.MOVIE, "series": EntryType.SERIES}
+
+# Selection type of the groups generated for each content type
+SELECTION_TYPES = {CONTENT_TYPE_MOVIES: SelectionType.MOVIE, CONTENT_TYPE_SERIES: SelectionType.SERIES}
+
 
 # ============================================================================
 # Helper Functions
@@ -30,73 +64,269 @@ STRM_EXTENSION = ".strm"
 
 def sanitize_name(name: str) -> str:
     """Sanitize name for filesystem compatibility"""
-    return "".join(c for c in name if c.isalnum() or c in (' ', '-', '_')).strip()
+    return sanitize_m3u_name(name)
 
 
-def calculate_file_hash(file_path: str) -> Optional[str]:
-    """Calculate MD5 hash of file for change detection"""
-    try:
-        with open(file_path, 'rb') as f:
-            return hashlib.md5(f.read()).hexdigest()
-    except Exception as e:
-        logger.warning(f"Could not calculate hash for {file_path}: {e}")
-        return None
+def entry_identity(tvg_id: Optional[str], title: str, url: str) -> str:
+    """Stable identity of a playlist entry: tvg-id plus title when it has a tvg-id, its URL otherwise"""
+    if tvg_id:
+        return f"tvg:{tvg_id}/{title}"
+    return f"url:{url}"
+
+
+class EntryDiff(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+    @property
+    def total(self) -> int:
+        """Entries cached for the source once the diff is applied"""
+        return self.inserted + self.updated + self.unchanged
+
+
+def sync_cached_entries(db: Session, source_id: int, entries: Iterable[dict]) -> EntryDiff:
+    """Bring the source's cached entries in line with the VOD entries of a parsed playlist.
+
+    Entries are matched to cached rows by `entry_identity`, so only new,
+    changed and vanished entries are written, with batched Core statements.
+    Every batch is committed on its own to keep write transactions short,
+    and rows are only deleted once the whole playlist was read. If parsing
+    fails half-way, the cache holds a mix of old and new entries and the
+    next sync (the content hash is not stored) finishes the job.
+    """
+    table = M3UEntry.__table__
+    columns = [table.c[field] for field in ENTRY_FIELDS]
+
+    cached = {}  # entry_key -> (id, values)
+    stale_ids = []
+    for row in db.execute(
+        select(table.c.id, table.c.entry_key, *columns).where(table.c.m3u_source_id == source_id)
+    ):
+        if row.entry_key is None or row.entry_key in cached:
+            stale_ids.append(row.id)  # Cached before entries had an identity
+        else:
+            cached[row.entry_key] = (row.id, tuple(row[2:]))
+
+    insert_stmt = insert(table)
+    update_stmt = update(table).where(table.c.id == bindparam("_id")).values(
+        {field: bindparam(f"_{field}") for field in ENTRY_FIELDS}
+    )
+
+    inserted = updated = unchanged = 0
+    occurrences = {}
+    inserts, updates = [], []
+
+    def flush():
+        if inserts:
+            db.execute(insert_stmt, inserts)
+            inserts.clear()
+        if updates:
+            db.execute(update_stmt, updates)
+            updates.clear()
+        db.commit()
+
+    for entry_data in entries:
+        entry_type = ENTRY_TYPES.get(entry_data.get('entry_type'))
+        if entry_type is None:
+            # Skip LIVE entries entirely
+            continue
+
+        values = (
+            entry_data.get('title', 'Unknown'),
+            entry_data['url'],
+            entry_data.get('group_title'),
+            entry_data.get('logo'),
+            entry_data.get('tvg_id'),
+            entry_data.get('tvg_name'),
+            entry_type,
+        )
+        key = entry_identity(values[4], values[0], values[1])
+        # Repeated identities are told apart by their order in the playlist
+        occurrence = occurrences.get(key, 0) + 1
+        occurrences[key] = occurrence
+        if occurrence > 1:
+            key = f"{key}#{occurrence}"
+
+        row = cached.pop(key, None)
+        if row is None:
+            inserts.append({"m3u_source_id": source_id, "entry_key": key, **dict(zip(ENTRY_FIELDS, values))})
+            inserted += 1
+        elif row[1] != values:
+            updates.append({"_id": row[0], **{f"_{f}": v for f, v in zip(ENTRY_FIELDS, values)}})
+            updated += 1
+        else:
+            unchanged += 1
+
+        if len(inserts) + len(updates) >= ENTRY_BATCH_SIZE:
+            flush()
+
+    flush()
+
+    # Whatever was not matched is gone from the playlist
+    stale_ids.extend(row_id for row_id, _ in cached.values())
+    for start in range(0, len(stale_ids), ENTRY_BATCH_SIZE):
+        batch = stale_ids[start:start + ENTRY_BATCH_SIZE]
+        db.execute(delete(table).where(table.c.id.in_(batch)))
+        db.commit()
+
+    return EntryDiff(inserted, updated, len(stale_ids), unchanged)
+
 
+def fetch_changed_playlist(source: M3USource, existing_count: int,
+                           force: bool = False) -> Optional[PlaylistSnapshot]:
+    """Snapshot of the playlist to parse, or None when it is unchanged since the last parse.
 
-def should_reparse_m3u(source: M3USource, existing_count: int, force: bool = False) -> bool:
-    """Determine if M3U needs to be reparsed"""
-    # Force update requested
+    URL sources are fetched conditionally with the stored ETag/Last-Modified
+    and hashed while they download; FILE sources are hashed in place. A
+    playlist whose SHA-256 matches `source.m3u_hash` is not parsed again.
+    New validators are copied onto the source; the caller commits.
+    """
+    # Without a cache (or when forced) the playlist is parsed regardless of its hash
+    must_parse = force or existing_count == 0 or not source.m3u_hash
     if force:
         logger.info(f"Force update requested for {source.name}, will reparse")
-        return True
 
-    # No cache exists, must parse
-    if existing_count == 0:
-        return True
-    
-    # For FILE sources, check hash if available
-    if source.source_type == SourceType.FILE:
-        current_hash = calculate_file_hash(source.file_path)
-        if current_hash and hasattr(source, 'm3u_hash') and source.m3u_hash:
-            if current_hash != source.m3u_hash:
-                logger.info(f"M3U file hash changed for {source.name}, will reparse")
-                return True
-            else:
-                logger.info(f"M3U file unchanged for {source.name}, using cache")
-                return False
-    
-    # For URL sources, reparse if it's been > 1 hour since last sync
-    if source.last_sync:
-        time_since_sync = datetime.utcnow() - source.last_sync
-        if time_since_sync < timedelta(hours=1):
-            logger.info(f"M3U URL recently synced for {source.name}, using cache")
-            return False
-    
-    return True
+    if source.source_type == SourceType.URL:
+        if must_parse:
+            snapshot = fetch_playlist(source.url)
+        else:
+            snapshot = fetch_playlist(source.url, source.http_etag, source.http_last_modified)
+        if snapshot.not_modified:
+            logger.info(f"M3U URL not modified for {source.name}, using cache")
+            return None
+    else:  # FILE
+        snapshot = snapshot_file(source.file_path)
+
+    if not must_parse and snapshot.sha256 == source.m3u_hash:
+        logger.info(f"M3U content unchanged for {source.name}, using cache")
+        snapshot.discard()
+        # The server may have sent new validators for identical content
+        source.http_etag = snapshot.etag
+        source.http_last_modified = snapshot.last_modified
+        return None
+
+    return snapshot
+
+
+def group_fingerprint(settings_key: str, items: Iterable[Tuple[str, M3UEntry]]) -> str:
+    """Hash of everything a group's generated files depend on: (STRM path, entry) pairs and title settings"""
+    digest = hashlib.sha1(f"{GENERATION_VERSION}\n{settings_key}\n".encode("utf-8"))
+    for path, entry in sorted(items, key=lambda item: item[0]):
+        fields = (path, entry.url, entry.title, entry.logo or "", entry.entry_type.value)
+        digest.update("\x1f".join(fields).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def remove_stale_entries(manifest: OutputManifest, content_type: str, expected: Set[str]) -> int:
+    """Delete files of entries that left their (still selected) group, counting STRM files"""
+    stale = [
+        rel_path for _, rel_path in manifest.owned_paths()
+        if Path(rel_path).parts[0] == content_type and rel_path not in expected
+    ]
+    deleted_count = sum(1 for p in stale if p.endswith(STRM_EXTENSION))
+    manifest.delete_paths(stale)
+    if deleted_count:
+        logger.info(f"Removed {deleted_count} stale {content_type} files")
+    return deleted_count
+
+
+async def write_group_files(
+    fm: FileManager,
+    members: List[Tuple[PlannedPath, M3UEntry]],
+    render_nfo: Callable[[M3UEntry], str],
+    semaphore: Semaphore
+) -> Tuple[Counter, bool]:
+    """Write the changed STRM/NFO files of one group directory concurrently.
+
+    Files are rendered on the event loop and compared with the manifest
+    first, the directory is created once, and the writes run in parallel
+    bounded by `semaphore`. Returns per-entry counts (created, updated,
+    unchanged) and whether every entry was written successfully.
+    """
+    counts = Counter()
+    writes = []  # (entry index, write method, path, content, source_key)
+    statuses = []
+    directories = set()
+    for index, (planned, entry) in enumerate(members):
+        try:
+            strm_path = planned.file(STRM_EXTENSION)
+            nfo_path = planned.file(".nfo")
+            source_key = f"entry:{entry.url}"
+            is_new = not fm.file_exists(strm_path)
+            pending = [
+                (index, write, path, content, source_key)
+                for path, content, write in (
+                    (strm_path, entry.url, fm.write_strm),
+                    (nfo_path, render_nfo(entry), fm.write_nfo),
+                )
+                if not fm.is_current(path, content)
+            ]
+        except Exception as e:
+            logger.error(f"Error processing entry {entry.title}: {e}")
+            statuses.append(None)
+            continue
+        statuses.append("created" if is_new else "updated" if pending else "unchanged")
+        if pending:
+            writes.extend(pending)
+            directories.add(planned.directory)
+
+    for directory in directories:
+        await asyncio.to_thread(fm.ensure_directory, directory)
+
+    async def write_one(write, path, content, source_key):
+        async with semaphore:
+            await write(path, content, source_key)
+
+    results = await asyncio.gather(*(write_one(*w[1:]) for w in writes), return_exceptions=True)
+    for (index, *_), result in zip(writes, results):
+        if isinstance(result, Exception) and statuses[index] is not None:
+            logger.error(f"Error processing entry {members[index][1].title}: {result}")
+            statuses[index] = None
+
+    for status in statuses:
+        if status is not None:
+            counts[status] += 1
+    return counts, None not in statuses
 
 
 def cleanup_deselected_groups(
     base_dir: str,
     selected_groups: Set[str],
     content_type: str,
-    sync_types: Optional[list]
+    sync_types: Optional[list],
+    manifest: Optional[OutputManifest] = None
 ) -> int:
-    """Remove directories for deselected groups and count deleted files"""
+    """Remove files of deselected groups and count deleted STRM files"""
     if sync_types and content_type not in sync_types:
         return 0
     
+    # Group directories as the path planner names them
+    selected_dirs = {fit_component(sanitize_name(g)) for g in selected_groups}
+
+    if manifest is not None and manifest.has_owned_files():
+        # Paths are recorded as "<content_type>/<group>/<title>.ext" below base_dir
+        stale = []
+        for _, rel_path in manifest.owned_paths():
+            parts = Path(rel_path).parts
+            if len(parts) == 3 and parts[0] == content_type and parts[1] not in selected_dirs:
+                stale.append(rel_path)
+        deleted_count = sum(1 for p in stale if p.endswith(STRM_EXTENSION))
+        manifest.delete_paths(stale)
+        if deleted_count:
+            logger.info(f"Removed {deleted_count} deselected {content_type} files")
+        return deleted_count
+
+    # Tree written before the manifest existed: fall back to scanning directories
     deleted_count = 0
     content_dir = Path(base_dir) / content_type
     
     if content_dir.exists():
         for group_dir in content_dir.iterdir():
             if group_dir.is_dir():
-                is_selected = any(
-                    sanitize_name(g) == group_dir.name 
-                    for g in selected_groups
-                )
-                
-                if not is_selected:
+                if group_dir.name not in selected_dirs:
                     file_count = sum(1 for f in group_dir.glob(f'*{STRM_EXTENSION}'))
                     deleted_count += file_count
                     shutil.rmtree(group_dir)
@@ -116,6 +346,21 @@ def cleanup_deselected_groups(
 def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool = False):
     """Sync M3U source - parse and generate STRM files"""
     db = SessionLocal()
+    try:
+        # One sync per source at a time, across all workers
+        with sync_lock(db.get_bind(), f"m3u:{source_id}") as acquired:
+            if not acquired:
+                logger.info(f"M3U sync for source {source_id} is already running, skipping")
+                return {"source_id": source_id, "status": "skipped", "message": "Sync already running"}
+            return run_m3u_sync(db, source_id, sync_types, force)
+    finally:
+        db.close()
+
+
+def run_m3u_sync(db: Session, source_id: int, sync_types: list = None, force: bool = False):
+    """Parse the source's playlist and generate its STRM files; the caller holds the sync lock"""
+    # Manifest and group hash changes, written in short transactions while files are generated
+    writer = DBWriter(db.get_bind())
     try:
         # Get M3U source
         source = db.query(M3USource).filter(M3USource.id == source_id).first()
@@ -125,9 +370,7 @@ def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool =
         
         # Get settings
         settings = {s.key: s.value for s in db.query(SettingsModel).all()}
-        prefix_regex = settings.get("PREFIX_REGEX")
-        format_date = settings.get("FORMAT_DATE_IN_TITLE") == "true"
-        clean_name = settings.get("CLEAN_NAME") == "true"
+        titles = TitleNormalizer.from_settings(settings)
         
         logger.info(f"Starting M3U sync for source: {source.name}")
         
@@ -138,6 +381,14 @@ def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool =
         selected_groups = db.query(M3USelection).filter(
             M3USelection.m3u_source_id == source_id
         ).all()
+
+        # Selection edits this sync covers. Generation already redoes only the
+        # groups whose fingerprint changed, so they just need acknowledging
+        covered_changes = {
+            content_type: pending_selection_change(db, SOURCE_M3U, source_id, selection_type.value).last_id
+            for content_type, selection_type in SELECTION_TYPES.items()
+            if not sync_types or content_type in sync_types
+        }
         
         # Get existing cached entries count
         existing_entries_count = db.query(M3UEntry).filter(
@@ -184,76 +435,53 @@ def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool =
                 "message": "No groups selected, skipped sync"
             }
         
-        # OPTIMIZATION: Check if we need to reparse M3U
-        needs_reparse = should_reparse_m3u(source, existing_entries_count, force)
-        
+        # Only parse and diff the cache when the playlist content changed
         added_count = 0
-        if needs_reparse:
-            # Parse M3U content
-            try:
+        snapshot = None
+        try:
+            snapshot = fetch_changed_playlist(source, existing_entries_count, force)
+            if snapshot is not None:
                 if source.source_type == SourceType.URL:
-                    entries = parse_m3u_url(source.url)
+                    # Decode like the streaming parser: server charset, bad bytes replaced
+                    entries = iter_m3u_file(snapshot.path, encoding=snapshot.encoding, errors='replace')
                 else:  # FILE
-                    entries = parse_m3u_file(source.file_path)
-            except Exception as e:
-                logger.error(f"Error parsing M3U source {source.name}: {e}")
-                source.sync_status = "error"
-                
-                for state in sync_states:
-                    state.status = "failed"
-                    state.error_message = str(e)
-                    state.task_id = None
-                    
-                db.commit()
-                return {"error": str(e)}
-            
-            logger.info(f"Parsed {len(entries)} entries from {source.name}")
+                    entries = iter_m3u_file(snapshot.path)
+
+                diff = sync_cached_entries(db, source_id, entries)
+                added_count = diff.total
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error parsing M3U source {source.name}: {e}")
+            source.sync_status = "error"
             
-            # Clear existing entries
-            db.query(M3UEntry).filter(M3UEntry.m3u_source_id == source_id).delete()
+            for state in sync_states:
+                state.status = "failed"
+                state.error_message = str(e)
+                state.task_id = None
+
+            # Batches cached before the failure are committed
+            refresh_m3u_stats(db, source_id)
             db.commit()
+            return {"error": str(e)}
+        finally:
+            if snapshot is not None:
+                snapshot.discard()
+
+        if snapshot is not None:
+            logger.info(
+                f"Cached {added_count} VOD entries from {source.name}: {diff.inserted} new, "
+                f"{diff.updated} changed, {diff.deleted} removed"
+            )
             
             # Create output directory
             Path(source.output_dir).mkdir(parents=True, exist_ok=True)
             
-            # Process and cache entries
-            for entry_data in entries:
-                try:
-                    # Determine entry type
-                    entry_type_str = entry_data.get('entry_type', 'live')
-                    if entry_type_str == 'movie':
-                        entry_type = EntryType.MOVIE
-                    elif entry_type_str == 'series':
-                        entry_type = EntryType.SERIES
-                    else:
-                        # Skip LIVE entries entirely
-                        continue
-                    
-                    # Save to database
-                    db_entry = M3UEntry(
-                        m3u_source_id=source_id,
-                        title=entry_data.get('title', 'Unknown'),
-                        url=entry_data['url'],
-                        group_title=entry_data.get('group_title'),
-                        logo=entry_data.get('logo'),
-                        tvg_id=entry_data.get('tvg_id'),
-                        tvg_name=entry_data.get('tvg_name'),
-                        entry_type=entry_type
-                    )
-                    db.add(db_entry)
-                    added_count += 1
-                        
-                except Exception as e:
-                    logger.error(f"Error caching entry {entry_data.get('title')}: {e}")
-                    continue
-            
-            # Commit cached entries
+            # Remember what was parsed, only once the cache holds it
+            source.m3u_hash = snapshot.sha256
+            source.http_etag = snapshot.etag
+            source.http_last_modified = snapshot.last_modified
+            refresh_m3u_stats(db, source_id)
             db.commit()
-            
-            # Update hash if applicable
-            if source.source_type == SourceType.FILE and hasattr(source, 'm3u_hash'):
-                source.m3u_hash = calculate_file_hash(source.file_path)
-                db.commit()
         else:
             logger.info(f"Using cached entries for {source.name}")
             added_count = existing_entries_count
@@ -294,88 +522,159 @@ def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool =
         series_base = source.series_dir or f"{source.output_dir}/series"
         
         # CLEANUP PHASE: Remove directories for deselected groups
+        movies_fm = FileManager(movies_base, OutputManifest(db, movies_base, OWNER_M3U, source_id, writer=writer))
+        series_fm = FileManager(series_base, OutputManifest(db, series_base, OWNER_M3U, source_id, writer=writer))
+
         movies_deleted = cleanup_deselected_groups(
-            movies_base, selected_movie_groups, CONTENT_TYPE_MOVIES, sync_types
+            movies_base, selected_movie_groups, CONTENT_TYPE_MOVIES, sync_types, movies_fm.manifest
         )
         series_deleted = cleanup_deselected_groups(
-            series_base, selected_series_groups, CONTENT_TYPE_SERIES, sync_types
+            series_base, selected_series_groups, CONTENT_TYPE_SERIES, sync_types, series_fm.manifest
         )
+        writer.flush()
         
-        # FILE GENERATION PHASE
-        movies_files_created = 0
-        series_files_created = 0
-        
-        # Process entries for file generation
-        # We need an event loop for async FileManager methods
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        for entry in db.query(M3UEntry).filter(M3UEntry.m3u_source_id == source_id).all():
-            try:
-                # Filter by sync_types if provided
-                if sync_types:
-                    if entry.entry_type == EntryType.MOVIE and CONTENT_TYPE_MOVIES not in sync_types:
-                        continue
-                    if entry.entry_type == EntryType.SERIES and CONTENT_TYPE_SERIES not in sync_types:
-                        continue
+        # PATH PLANNING PHASE: one target per (group, url), colliding titles
+        # within a group are disambiguated by a short hash of the stream URL
+        planners = {
+            CONTENT_TYPE_MOVIES: PathPlanner(movies_base),
+            CONTENT_TYPE_SERIES: PathPlanner(series_base),
+        }
+        planned_entries = []
+        # Only the columns generation needs, fetched in batches. Entries of groups
+        # that are not selected are dropped as they stream by; the selected ones
+        # are all kept, since the planner needs the whole set before resolving
+        entry_rows = db.query(
+            M3UEntry.title, M3UEntry.url, M3UEntry.group_title, M3UEntry.logo, M3UEntry.entry_type
+        ).filter(M3UEntry.m3u_source_id == source_id).yield_per(PLAN_FETCH_SIZE)
+        for entry in entry_rows:
+            # Filter by sync_types if provided
+            if sync_types:
+                if entry.entry_type == EntryType.MOVIE and CONTENT_TYPE_MOVIES not in sync_types:
+                    continue
+                if entry.entry_type == EntryType.SERIES and CONTENT_TYPE_SERIES not in sync_types:
+                    continue
 
-                group = entry.group_title or "Uncategorized"
-                
-                # Check if this group is selected and determine base directory
-                if entry.entry_type == EntryType.MOVIE:
-                    if group not in selected_movie_groups:
-                        continue
-                    base_dir = movies_base
-                    content_type = CONTENT_TYPE_MOVIES
-                elif entry.entry_type == EntryType.SERIES:
-                    if group not in selected_series_groups:
-                        continue
-                    base_dir = series_base
-                    content_type = CONTENT_TYPE_SERIES
-                else:
+            group = entry.group_title or "Uncategorized"
+
+            # Check if this group is selected and determine content type
+            if entry.entry_type == EntryType.MOVIE:
+                if group not in selected_movie_groups:
                     continue
-                
-                # Prepare data for NFO generation
-                safe_group = sanitize_name(group)
-                safe_title = sanitize_name(entry.title)
-                
-                group_dir = Path(base_dir) / content_type / safe_group
-                group_dir.mkdir(parents=True, exist_ok=True)
-                
-                strm_path = group_dir / f"{safe_title}{STRM_EXTENSION}"
-                nfo_path = group_dir / f"{safe_title}.nfo"
-                
-                # Check if STRM exists to count as new
-                is_new = not strm_path.exists()
-                
-                # Create STRM file
-                loop.run_until_complete(fm.write_strm(str(strm_path), entry.url))
-                
-                # Create NFO file
-                data = {
-                    "name": entry.title,
-                    "cover": entry.logo,
-                    # Add other fields if available in M3U entry
-                }
-                
-                if entry.entry_type == EntryType.MOVIE:
-                    nfo_content = fm.generate_movie_nfo(data, prefix_regex, format_date, clean_name)
-                    if is_new:
-                        movies_files_created += 1
-                else:
-                    nfo_content = fm.generate_show_nfo(data, prefix_regex, format_date, clean_name)
-                    if is_new:
-                        series_files_created += 1
-                
-                loop.run_until_complete(fm.write_nfo(str(nfo_path), nfo_content))
-                        
-            except Exception as e:
-                logger.error(f"Error processing entry {entry.title}: {e}")
+                content_type = CONTENT_TYPE_MOVIES
+            elif entry.entry_type == EntryType.SERIES:
+                if group not in selected_series_groups:
+                    continue
+                content_type = CONTENT_TYPE_SERIES
+            else:
                 continue
-        
-        loop.close()
-        
+
+            key = (group, entry.url)
+            url_tag = hashlib.sha1(entry.url.encode("utf-8")).hexdigest()[:8]
+            if planners[content_type].add(key, f"{content_type}/{sanitize_name(group)}",
+                                          sanitize_name(entry.title), url_tag):
+                planned_entries.append((entry, content_type, key))
+
+        paths = {content_type: planner.resolve() for content_type, planner in planners.items()}
+        for content_type, planner in planners.items():
+            if planner.duplicates or planner.collisions:
+                logger.info(f"Path plan ({content_type}): {planner.duplicates} duplicate entries skipped, "
+                            f"{planner.collisions} name collisions disambiguated")
+
+        # FILE GENERATION PHASE: groups whose fingerprint is unchanged (and whose
+        # files are all still recorded) are skipped wholesale; in the others
+        # only files whose content hash differs from the manifest are written,
+        # concurrently across groups
+        fms = {CONTENT_TYPE_MOVIES: movies_fm, CONTENT_TYPE_SERIES: series_fm}
+        counts = {content_type: Counter() for content_type in fms}
+        groups = defaultdict(list)
+        for entry, content_type, key in planned_entries:
+            groups[(content_type, key[0])].append((paths[content_type][key], entry))
+
+        stored_hashes = {
+            (row.content_type, row.group_title): row
+            for row in db.query(M3UGroupHash).filter(M3UGroupHash.m3u_source_id == source_id)
+        }
+        settings_key = repr(titles.settings)
+        expected = {content_type: set() for content_type in fms}
+        changed_groups = []
+
+        for (content_type, group), members in groups.items():
+            target_fm = fms[content_type]
+            for planned, _ in members:
+                expected[content_type].add(target_fm.manifest.rel(planned.file(STRM_EXTENSION)))
+                expected[content_type].add(target_fm.manifest.rel(planned.file(".nfo")))
+
+            fingerprint = group_fingerprint(settings_key, [(p.file(STRM_EXTENSION), e) for p, e in members])
+            stored = stored_hashes.pop((content_type, group), None)
+            if stored is not None and stored.content_hash == fingerprint and all(
+                target_fm.file_exists(p.file(STRM_EXTENSION)) and target_fm.file_exists(p.file(".nfo"))
+                for p, _ in members
+            ):
+                counts[content_type]["unchanged"] += len(members)
+                continue
+            changed_groups.append((content_type, group, members, fingerprint, stored))
+
+        def render_nfo(entry) -> str:
+            data = {
+                "name": entry.title,
+                "cover": entry.logo,
+                # Add other fields if available in M3U entry
+            }
+            if entry.entry_type == EntryType.MOVIE:
+                return fm.generate_movie_nfo(data, normalizer=titles)
+            return fm.generate_show_nfo(data, normalizer=titles)
+
+        async def write_changed_groups():
+            semaphore = Semaphore(FILE_WRITE_CONCURRENCY)
+            return await asyncio.gather(*(
+                write_group_files(fms[content_type], members, render_nfo, semaphore)
+                for content_type, _, members, _, _ in changed_groups
+            ))
+
+        # We need an event loop for async FileManager methods; aiofiles runs
+        # the blocking writes in the loop's default executor
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        executor = ThreadPoolExecutor(max_workers=FILE_WRITE_CONCURRENCY)
+        loop.set_default_executor(executor)
+        try:
+            results = loop.run_until_complete(write_changed_groups())
+        finally:
+            loop.close()
+            executor.shutdown()
+
+        hash_table = M3UGroupHash.__table__
+        now = datetime.utcnow()
+        for (content_type, group, _, fingerprint, stored), (group_counts, complete) in zip(changed_groups, results):
+            counts[content_type].update(group_counts)
+            if not complete:
+                # Leave the group unhashed so the next sync retries it
+                if stored is not None:
+                    writer.delete(hash_table, [{"id": stored.id}])
+            else:
+                writer.upsert(hash_table, [{"m3u_source_id": source_id, "content_type": content_type,
+                                            "group_title": group, "content_hash": fingerprint, "updated_at": now}],
+                              ["m3u_source_id", "content_type", "group_title"], ["content_hash", "updated_at"])
+
+        # Groups that were not generated this time are forgotten, unless their
+        # content type was not part of this sync
+        for (content_type, _), row in stored_hashes.items():
+            if not sync_types or content_type in sync_types:
+                writer.delete(hash_table, [{"id": row.id}])
+
+        # Entries that left a selected group (or whose path changed)
+        if not sync_types or CONTENT_TYPE_MOVIES in sync_types:
+            movies_deleted += remove_stale_entries(movies_fm.manifest, CONTENT_TYPE_MOVIES, expected[CONTENT_TYPE_MOVIES])
+        if not sync_types or CONTENT_TYPE_SERIES in sync_types:
+            series_deleted += remove_stale_entries(series_fm.manifest, CONTENT_TYPE_SERIES, expected[CONTENT_TYPE_SERIES])
+
+        writer.flush()
+
+        movies_files_created = counts[CONTENT_TYPE_MOVIES]["created"]
+        series_files_created = counts[CONTENT_TYPE_SERIES]["created"]
         files_created = movies_files_created + series_files_created
+        files_updated = sum(c["updated"] for c in counts.values())
+        files_unchanged = sum(c["unchanged"] for c in counts.values())
         
         # Update source last_sync
         source.last_sync = datetime.utcnow()
@@ -392,13 +691,16 @@ def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool =
                 state.items_added = series_files_created
                 state.items_deleted = series_deleted
             state.task_id = None
+
+        for content_type, last_id in covered_changes.items():
+            acknowledge_selection_changes(db, SOURCE_M3U, source_id, SELECTION_TYPES[content_type].value, last_id)
             
         db.commit()
         
         logger.info(
             f"M3U sync completed for {source.name}: "
-            f"{added_count} entries cached, {files_created} files created, "
-            f"{movies_deleted + series_deleted} files deleted"
+            f"{added_count} entries cached, {files_created} files created, {files_updated} updated, "
+            f"{files_unchanged} unchanged, {movies_deleted + series_deleted} files deleted"
         )
         
         return {
@@ -406,11 +708,20 @@ def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool =
             "source_name": source.name,
             "items_cached": added_count,
             "items_processed": files_created,
+            "files_created": files_created,
+            "files_updated": files_updated,
+            "files_unchanged": files_unchanged,
+            "files_deleted": movies_deleted + series_deleted,
             "status": "success"
         }
         
     except Exception as e:
         logger.error(f"Error in M3U sync task for source {source_id}: {e}")
+        try:
+            # Files already written stay recorded so the next sync skips them
+            writer.flush()
+        except Exception:
+            logger.exception(f"Could not record generated files for source {source_id}")
         try:
             if 'source' in locals() and source:
                 source.sync_status = "error"
@@ -430,5 +741,3 @@ def sync_m3u_source_task(source_id: int, sync_types: list = None, force: bool =
         except:
             pass
         return {"error": str(e)}
-    finally:
-        db.close()
@@ -0,0 +1,126 @@
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from sqlalchemy.orm import Session
+from app.db.session import SessionLocal
+from app.models.m3u_source import M3USource
+from app.models.output_file import OutputFile
+from app.models.reconcile_state import ReconcileState
+from app.models.sync_state import SyncState, SyncStatus
+from app.services.output_manifest import OWNER_M3U, OWNER_XTREAM
+from app.services.output_reconciler import (
+    ExpectedTree, WalkChunk, decode_cursor, encode_cursor, output_roots, reconcile_chunk, walk_tree
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def busy_owners(db: Session) -> Set[Tuple[str, int]]:
+    """Owners with a sync in progress; their files may not be in the manifest yet"""
+    busy = {
+        (OWNER_XTREAM, subscription_id) for (subscription_id,) in
+        db.query(SyncState.subscription_id).filter(SyncState.status == SyncStatus.RUNNING)
+    }
+    busy.update(
+        (OWNER_M3U, source_id) for (source_id,) in
+        db.query(M3USource.id).filter(M3USource.sync_status == "syncing")
+    )
+    return busy
+
+
+def get_reconcile_state(db: Session, root: str) -> ReconcileState:
+    state = db.query(ReconcileState).filter(ReconcileState.root == root).first()
+    if not state:
+        state = ReconcileState(root=root)
+        db.add(state)
+        db.flush()
+    return state
+
+
+def apply_chunk(db: Session, state: ReconcileState, chunk: WalkChunk, remove: bool):
+    """Reconcile one walked chunk of a root and advance its cursor"""
+    now = datetime.utcnow()
+    if state.cursor is None:
+        # Starting a new pass over the tree
+        state.pass_started_at = now
+        state.dirs_scanned = 0
+        state.entries_scanned = 0
+        state.orphans_removed = 0
+        state.missing_found = 0
+
+    expected = ExpectedTree.load(db, state.root, chunk)
+    removed, missing = reconcile_chunk(db, state.root, chunk, expected, remove)
+
+    state.dirs_scanned += len(chunk.dirs)
+    state.entries_scanned += chunk.entries
+    state.orphans_removed += removed
+    state.missing_found += missing
+    state.cursor = encode_cursor(chunk.cursor)
+    state.last_run = now
+    state.error_message = None
+    if chunk.done:
+        state.last_completed = now
+        logger.info(
+            f"Reconciled {state.root}: {state.dirs_scanned} directories, "
+            f"{state.orphans_removed} orphans removed, {state.missing_found} missing files queued for resync"
+        )
+    db.commit()
+
+
+@celery_app.task
+def reconcile_outputs_task():
+    """Audit a budgeted slice of every output tree against the manifest"""
+    db = SessionLocal()
+    try:
+        roots = output_roots(db)
+        busy = busy_owners(db)
+
+        # Only trees the manifest knows about can be audited; a tree written
+        # before the manifest existed would look like one big orphan.
+        tracked: Dict[str, Set[Tuple[str, int]]] = {}
+        for (root,) in db.query(OutputFile.root).distinct():
+            tracked[root] = set()
+        for root, owner_type, owner_id in db.query(
+            OutputFile.root, OutputFile.owner_type, OutputFile.owner_id
+        ).distinct():
+            tracked[root].add((owner_type, owner_id))
+
+        eligible = {}
+        for root, owners in roots.items():
+            if root not in tracked or owners & busy:
+                continue
+            # Orphans are only removed once every owner writing into the root
+            # has synced with the manifest, otherwise their files would be lost
+            eligible[root] = owners <= tracked[root]
+
+        if not eligible:
+            return "Nothing to reconcile"
+
+        states = {root: get_reconcile_state(db, root) for root in eligible}
+        db.commit()
+        budget = max(settings.RECONCILE_IO_BUDGET // len(eligible), 1)
+
+        with ThreadPoolExecutor(max_workers=settings.RECONCILE_WORKERS) as pool:
+            futures = {
+                pool.submit(walk_tree, root, decode_cursor(states[root].cursor), budget): root
+                for root in sorted(eligible)
+            }
+            # Walks run in the pool, database work stays on this thread
+            for future in as_completed(futures):
+                root = futures[future]
+                state = states[root]
+                try:
+                    apply_chunk(db, state, future.result(), eligible[root])
+                except Exception as e:
+                    logger.exception(f"Error reconciling {root}")
+                    db.rollback()
+                    state.error_message = str(e)
+                    state.last_run = datetime.utcnow()
+                    db.commit()
+
+        return f"Reconciled {len(eligible)} output directories"
+    finally:
+        db.close()
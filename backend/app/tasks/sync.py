@@ -1,9 +1,9 @@
 import asyncio
 import os
-import re
 import shutil
 from asyncio import Semaphore
 from app.core.celery_app import celery_app
+from app.core.database import sync_lock
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.models.subscription import Subscription
@@ -14,8 +14,16 @@ from app.models.schedule import Schedule, SyncType as ScheduleSyncType
 from app.models.schedule_execution import ScheduleExecution, ExecutionStatus
 from app.services.xtream import XtreamClient
 from app.services.file_manager import FileManager
+from app.services.title_normalizer import TitleNormalizer
+from app.services.output_manifest import OutputManifest, OWNER_XTREAM
+from app.services.db_writer import DBWriter
+from app.services.content_stats import SOURCE_XTREAM, refresh_xtream_stats
+from app.services.categories import CATEGORY_MOVIE, CATEGORY_SERIES, count_by_category, store_categories
+from app.services.path_planner import PathPlanner
+from app.services.selection_changes import PendingChange, acknowledge_selection_changes, pending_selection_change
 import logging
 from datetime import datetime
+from typing import FrozenSet, Iterable, Optional, Set
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +41,49 @@ def update_sync_progress(db: Session, subscription_id: int, sync_type: str, curr
         db.commit()
 
 
+def targeted_categories(change: PendingChange, selected_ids: Set[str], previous_status: Optional[SyncStatus],
+                        has_cache: bool) -> Optional[FrozenSet[str]]:
+    """Categories a sync can limit itself to, None when it needs a full pass.
+
+    Only categories added to a selection that was already synced qualify:
+    a removal needs the deletion pass, and adding to an empty selection
+    (which means "everything") narrows it.
+    """
+    if not change.additions_only or previous_status != SyncStatus.SUCCESS or not has_cache:
+        return None
+    if not selected_ids - change.added:
+        return None
+    return change.added
+
+
+def shares_directory(fm: FileManager, cat_map: dict, targeted: Iterable[str],
+                     cached_category_ids: Iterable[str]) -> bool:
+    """True if a targeted category's folder already holds files of this sync.
+
+    A targeted pass plans only the new items, so in a shared folder they
+    could claim the paths of files already written; only a full plan
+    disambiguates them against those.
+    """
+    planner = PathPlanner(fm.output_dir)
+
+    def folder(category_id) -> str:
+        return planner.fit_parent(fm.sanitize_name(cat_map.get(category_id, "Uncategorized"))).casefold()
+
+    in_use = {folder(category_id) for category_id in cached_category_ids}
+    if fm.manifest is not None:
+        in_use.update(rel_path.split("/", 1)[0].casefold() for _, rel_path in fm.manifest.owned_paths())
+    return any(folder(category_id) in in_use for category_id in targeted)
+
+
+def flush_after_error(db: Session, writer: DBWriter, subscription_id: int):
+    """Record what a failed sync already wrote to disk, the next sync relies on it"""
+    try:
+        writer.flush()
+        refresh_xtream_stats(db, subscription_id)
+    except Exception:
+        logger.exception("Could not write the changes of the failed sync")
+
+
 async def fetch_vod_details_batch(xc: XtreamClient, movies: list, batch_size: int = 10,
                                    db: Session = None, subscription_id: int = None):
     """Fetch VOD details for multiple movies in parallel with concurrency limit"""
@@ -84,13 +135,16 @@ async def fetch_vod_details_batch(xc: XtreamClient, movies: list, batch_size: in
     tasks = [fetch_one(movie) for movie in movies]
     return await asyncio.gather(*tasks)
 
-async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscription_id: int):
+async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscription_id: int,
+                         writer: Optional[DBWriter] = None):
+    # Cache rows are written through the writer in short transactions; pass
+    # the manifest's writer so both share the same ordered queue
+    writer = writer or DBWriter(db.get_bind())
+
     # Get settings
     from app.models.settings import SettingsModel
     settings = {s.key: s.value for s in db.query(SettingsModel).all()}
-    prefix_regex = settings.get("PREFIX_REGEX")
-    format_date = settings.get("FORMAT_DATE_IN_TITLE") == "true"
-    clean_name = settings.get("CLEAN_NAME") == "true"
+    titles = TitleNormalizer.from_settings(settings)
 
     # Update status
     sync_state = db.query(SyncState).filter(
@@ -102,36 +156,77 @@ async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscri
         sync_state = SyncState(subscription_id=subscription_id, type=SyncType.MOVIES)
         db.add(sync_state)
     
+    previous_status = sync_state.status
     sync_state.status = SyncStatus.RUNNING
     sync_state.last_sync = datetime.utcnow()
     db.commit()
 
     try:
+        selected_ids = {s.category_id for s in db.query(SelectedCategory.category_id).filter(
+            SelectedCategory.subscription_id == subscription_id,
+            SelectedCategory.type == "movie"
+        )}
+        change = pending_selection_change(db, SOURCE_XTREAM, subscription_id, CATEGORY_MOVIE)
+        has_cache = db.query(MovieCache.id).filter(MovieCache.subscription_id == subscription_id).first() is not None
+        targeted = targeted_categories(change, selected_ids, previous_status, has_cache)
+
         # Fetch Categories
         categories = await xc.get_vod_categories()
         cat_map = {c['category_id']: c['category_name'] for c in categories}
 
-        # Fetch All Movies
-        all_movies = await xc.get_vod_streams()
+        if targeted:
+            cached_category_ids = [row.category_id for row in db.query(MovieCache.category_id).filter(
+                MovieCache.subscription_id == subscription_id).distinct()]
+            if shares_directory(fm, cat_map, targeted, cached_category_ids):
+                logger.info("Newly selected movie categories share a folder with synced ones, planning a full pass")
+                targeted = None
+
+        if targeted:
+            # Only categories were added since the last sync: list just those
+            logger.info(f"Syncing {len(targeted)} newly selected movie categories")
+            all_movies = []
+            for category_id in sorted(targeted):
+                all_movies.extend(await xc.get_vod_streams(category_id))
+        else:
+            # Fetch All Movies
+            all_movies = await xc.get_vod_streams()
+
+            # The full list is at hand: refresh the selection page's categories and counts
+            store_categories(db, subscription_id, CATEGORY_MOVIE, categories, count_by_category(all_movies))
+            db.commit()
 
         # Filter by selected categories if any
-        selected_cats = db.query(SelectedCategory).filter(
-            SelectedCategory.subscription_id == subscription_id,
-            SelectedCategory.type == "movie"
-        ).all()
-        
-        if selected_cats:
-            selected_ids = {s.category_id for s in selected_cats}
+        if selected_ids:
             all_movies = [m for m in all_movies if m['category_id'] in selected_ids]
         
         # Current Cache
         cached_movies = {m.stream_id: m for m in db.query(MovieCache).filter(MovieCache.subscription_id == subscription_id).all()}
+        if targeted:
+            # Movies also listed in a category synced before are written already
+            all_movies = [m for m in all_movies if int(m['stream_id']) not in cached_movies]
         
         to_add_update = []
         to_delete = []
         
         current_ids = set()
 
+        # Plan every target path up front so colliding names are disambiguated
+        # and a movie listed in several categories is written only once
+        planner = PathPlanner(fm.output_dir)
+        listed = []
+        for movie in all_movies:
+            stream_id = int(movie['stream_id'])
+            cat_name = cat_map.get(movie['category_id'], "Uncategorized")
+            tmdb_suffix = fm.format_tmdb_suffix(movie.get('tmdb'))
+            if planner.add(stream_id, fm.sanitize_name(cat_name), f"{fm.sanitize_name(movie['name'])}{tmdb_suffix}",
+                           stream_id, folder=bool(tmdb_suffix)):
+                listed.append(movie)
+        all_movies = listed
+        paths = planner.resolve()
+        if planner.duplicates or planner.collisions:
+            logger.info(f"Path plan: {planner.duplicates} duplicate listings skipped, "
+                        f"{planner.collisions} name collisions disambiguated")
+
         for movie in all_movies:
             stream_id = int(movie['stream_id'])
             current_ids.add(stream_id)
@@ -145,14 +240,26 @@ async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscri
                         cached.container_extension != movie['container_extension'] or
                         cached.tmdb_id != str(movie.get('tmdb', '') or '')):
                     to_add_update.append(movie)
+                elif fm.tracks(f"movie:{stream_id}") and not fm.file_exists(paths[stream_id].file(".strm")):
+                    # Unchanged, but its planned path moved (e.g. a new name collision)
+                    to_add_update.append(movie)
 
-        # Detect deletions
-        for stream_id, cached in cached_movies.items():
-            if stream_id not in current_ids:
-                to_delete.append(cached)
+        # Detect deletions; a targeted pass only listed part of the selection
+        if not targeted:
+            for stream_id, cached in cached_movies.items():
+                if stream_id not in current_ids:
+                    to_delete.append(cached)
 
         # Process Deletions
         for movie in to_delete:
+            source_key = f"movie:{movie.stream_id}"
+            if fm.tracks(source_key):
+                # Manifest knows exactly what was written, even if the category is gone
+                await fm.delete_source_files(source_key)
+                writer.delete(MovieCache.__table__, [{"id": movie.id}])
+                continue
+
+            # Files written before the manifest existed: recompute the paths
             cat_name = cat_map.get(movie.category_id, "Uncategorized")
             safe_cat = fm.sanitize_name(cat_name)
             safe_name = fm.sanitize_name(movie.name)
@@ -169,7 +276,7 @@ async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscri
                 await fm.delete_file(f"{fm.output_dir}/{safe_cat}/{safe_name}.nfo")
 
             await fm.delete_directory_if_empty(f"{fm.output_dir}/{safe_cat}")
-            db.delete(movie)
+            writer.delete(MovieCache.__table__, [{"id": movie.id}])
         
         # Fetch VOD details in parallel (10 concurrent requests)
         if to_add_update:
@@ -191,33 +298,30 @@ async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscri
             cat_name = cat_map.get(cat_id, "Uncategorized")
             safe_cat = fm.sanitize_name(cat_name)
             safe_name = fm.sanitize_name(name)
-            tmdb_suffix = fm.format_tmdb_suffix(tmdb_id)
 
-            cat_dir = f"{fm.output_dir}/{safe_cat}"
-            fm.ensure_directory(cat_dir)
+            source_key = f"movie:{stream_id}"
+            tracked = fm.tracks(source_key)
 
-            if tmdb_suffix:
-                # Per-movie folder with TMDB ID
-                movie_dir = f"{cat_dir}/{safe_name}{tmdb_suffix}"
-                fm.ensure_directory(movie_dir)
-                display_name = f"{safe_name}{tmdb_suffix}"
-                strm_path = f"{movie_dir}/{display_name}.strm"
-                nfo_path = f"{movie_dir}/{display_name}.nfo"
-            else:
-                # Flat structure (no valid TMDB)
-                strm_path = f"{cat_dir}/{safe_name}.strm"
-                nfo_path = f"{cat_dir}/{safe_name}.nfo"
+            # Per-movie folder "{name} {tmdb-XXX}/" when the TMDB ID is valid,
+            # flat "{cat}/{name}.strm" otherwise
+            planned = paths[stream_id]
+            cat_dir = f"{fm.output_dir}/{safe_cat}"
+            fm.ensure_directory(planned.directory)
+            strm_path = planned.file(".strm")
+            nfo_path = planned.file(".nfo")
 
             url = xc.get_stream_url("movie", str(stream_id), ext)
-            await fm.write_strm(strm_path, url)
+            await fm.write_strm(strm_path, url, source_key)
 
             # Always create NFO file with all available metadata
-            nfo_content = fm.generate_movie_nfo(movie, prefix_regex, format_date, clean_name)
-            await fm.write_nfo(nfo_path, nfo_content)
+            nfo_content = fm.generate_movie_nfo(movie, normalizer=titles)
+            await fm.write_nfo(nfo_path, nfo_content, source_key)
 
-            # Clean up old path if TMDB ID changed
+            # Clean up old paths (TMDB ID, name or category changed)
             cached = cached_movies.get(stream_id)
-            if cached and cached.tmdb_id != (str(tmdb_id) if tmdb_id else None):
+            if tracked:
+                await fm.delete_source_files(source_key, keep=(strm_path, nfo_path))
+            elif cached and cached.tmdb_id != (str(tmdb_id) if tmdb_id else None):
                 old_suffix = fm.format_tmdb_suffix(cached.tmdb_id)
                 if old_suffix:
                     old_path = f"{cat_dir}/{safe_name}{old_suffix}"
@@ -228,49 +332,49 @@ async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscri
                     await fm.delete_file(f"{cat_dir}/{safe_name}.nfo")
 
             # Update Cache
-            cached = cached_movies.get(stream_id)
-            if not cached:
-                cached = MovieCache(subscription_id=subscription_id, stream_id=stream_id)
-                db.add(cached)
-            
-            cached.name = name
-            cached.category_id = cat_id
-            cached.container_extension = ext
-            cached.tmdb_id = str(tmdb_id) if tmdb_id else None
+            writer.upsert(MovieCache.__table__, [{
+                "subscription_id": subscription_id,
+                "stream_id": stream_id,
+                "name": name,
+                "category_id": cat_id,
+                "container_extension": ext,
+                "tmdb_id": str(tmdb_id) if tmdb_id else None,
+            }], ["subscription_id", "stream_id"], ["name", "category_id", "container_extension", "tmdb_id"])
 
         # Check for missing NFO files
         logger.info(f"Checking for missing NFO files across {len(all_movies)} movies...")
         nfo_created_count = 0
         for movie in all_movies:
             stream_id = int(movie['stream_id'])
-            name = movie['name']
-            cat_id = movie['category_id']
-            tmdb_id = movie.get('tmdb')
-
-            cat_name = cat_map.get(cat_id, "Uncategorized")
-            safe_cat = fm.sanitize_name(cat_name)
-            safe_name = fm.sanitize_name(name)
-            tmdb_suffix = fm.format_tmdb_suffix(tmdb_id)
+            planned = paths[stream_id]
+            nfo_path = planned.file(".nfo")
 
-            if tmdb_suffix:
-                nfo_path = f"{fm.output_dir}/{safe_cat}/{safe_name}{tmdb_suffix}/{safe_name}{tmdb_suffix}.nfo"
+            source_key = f"movie:{stream_id}"
+            tracked = fm.tracks(source_key)
+            if tracked:
+                missing = not fm.file_exists(nfo_path)
             else:
-                nfo_path = f"{fm.output_dir}/{safe_cat}/{safe_name}.nfo"
-
-            if not os.path.exists(nfo_path):
-                if tmdb_suffix:
-                    fm.ensure_directory(f"{fm.output_dir}/{safe_cat}/{safe_name}{tmdb_suffix}")
-                else:
-                    fm.ensure_directory(f"{fm.output_dir}/{safe_cat}")
-                nfo_content = fm.generate_movie_nfo(movie, prefix_regex, format_date, clean_name)
-                await fm.write_nfo(nfo_path, nfo_content)
+                missing = not os.path.exists(nfo_path)
+
+            if missing:
+                fm.ensure_directory(planned.directory)
+                if not tracked:
+                    # Record the STRM along with the NFO: once the movie is tracked,
+                    # deletions go by the manifest and would leave an unrecorded STRM behind
+                    url = xc.get_stream_url("movie", str(stream_id), movie['container_extension'])
+                    await fm.write_strm(planned.file(".strm"), url, source_key)
+                nfo_content = fm.generate_movie_nfo(movie, normalizer=titles)
+                await fm.write_nfo(nfo_path, nfo_content, source_key)
                 nfo_created_count += 1
         
         if nfo_created_count > 0:
             logger.info(f"Created {nfo_created_count} missing NFO files")
 
+        writer.flush()
+        refresh_xtream_stats(db, subscription_id)
         sync_state.items_added = len(to_add_update)
         sync_state.items_deleted = len(to_delete)
+        acknowledge_selection_changes(db, SOURCE_XTREAM, subscription_id, CATEGORY_MOVIE, change.last_id)
         sync_state.status = SyncStatus.SUCCESS
         sync_state.progress_current = 0
         sync_state.progress_total = 0
@@ -279,6 +383,7 @@ async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscri
 
     except Exception as e:
         logger.exception("Error syncing movies")
+        flush_after_error(db, writer, subscription_id)
         sync_state.status = SyncStatus.FAILED
         sync_state.error_message = str(e)
         sync_state.progress_current = 0
@@ -287,13 +392,14 @@ async def process_movies(db: Session, xc: XtreamClient, fm: FileManager, subscri
         db.commit()
         raise
 
-async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscription_id: int):
+async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscription_id: int,
+                         writer: Optional[DBWriter] = None):
+    writer = writer or DBWriter(db.get_bind())
+
     # Get settings
     from app.models.settings import SettingsModel
     settings = {s.key: s.value for s in db.query(SettingsModel).all()}
-    prefix_regex = settings.get("PREFIX_REGEX")
-    format_date = settings.get("FORMAT_DATE_IN_TITLE") == "true"
-    clean_name = settings.get("CLEAN_NAME") == "true"
+    titles = TitleNormalizer.from_settings(settings)
     # Series format settings (defaults: season folders=true, series name in filename=false)
     use_season_folders = settings.get("SERIES_USE_SEASON_FOLDERS", "true") != "false"
     include_series_name = settings.get("SERIES_INCLUDE_NAME_IN_FILENAME", "false") == "true"
@@ -308,32 +414,69 @@ async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscri
         sync_state = SyncState(subscription_id=subscription_id, type=SyncType.SERIES)
         db.add(sync_state)
     
+    previous_status = sync_state.status
     sync_state.status = SyncStatus.RUNNING
     sync_state.last_sync = datetime.utcnow()
     db.commit()
 
     try:
+        selected_ids = {s.category_id for s in db.query(SelectedCategory.category_id).filter(
+            SelectedCategory.subscription_id == subscription_id,
+            SelectedCategory.type == "series"
+        )}
+        change = pending_selection_change(db, SOURCE_XTREAM, subscription_id, CATEGORY_SERIES)
+        has_cache = db.query(SeriesCache.id).filter(SeriesCache.subscription_id == subscription_id).first() is not None
+        targeted = targeted_categories(change, selected_ids, previous_status, has_cache)
+
         categories = await xc.get_series_categories()
         cat_map = {c['category_id']: c['category_name'] for c in categories}
 
-        all_series = await xc.get_series()
+        if targeted:
+            cached_category_ids = [row.category_id for row in db.query(SeriesCache.category_id).filter(
+                SeriesCache.subscription_id == subscription_id).distinct()]
+            if shares_directory(fm, cat_map, targeted, cached_category_ids):
+                logger.info("Newly selected series categories share a folder with synced ones, planning a full pass")
+                targeted = None
+
+        if targeted:
+            logger.info(f"Syncing {len(targeted)} newly selected series categories")
+            all_series = []
+            for category_id in sorted(targeted):
+                all_series.extend(await xc.get_series(category_id))
+        else:
+            all_series = await xc.get_series()
+
+            store_categories(db, subscription_id, CATEGORY_SERIES, categories, count_by_category(all_series))
+            db.commit()
 
         # Filter by selected categories if any
-        selected_cats = db.query(SelectedCategory).filter(
-            SelectedCategory.subscription_id == subscription_id,
-            SelectedCategory.type == "series"
-        ).all()
-        
-        if selected_cats:
-            selected_ids = {s.category_id for s in selected_cats}
+        if selected_ids:
             all_series = [s for s in all_series if s['category_id'] in selected_ids]
         
         cached_series = {s.series_id: s for s in db.query(SeriesCache).filter(SeriesCache.subscription_id == subscription_id).all()}
+        if targeted:
+            all_series = [s for s in all_series if int(s['series_id']) not in cached_series]
         
         to_add_update = []
         to_delete = []
         current_ids = set()
 
+        # Plan series folders up front so colliding names are disambiguated
+        planner = PathPlanner(fm.output_dir)
+        listed = []
+        for series in all_series:
+            series_id = int(series['series_id'])
+            cat_name = cat_map.get(series['category_id'], "Uncategorized")
+            tmdb_suffix = fm.format_tmdb_suffix(series.get('tmdb'))
+            if planner.add(series_id, fm.sanitize_name(cat_name), f"{fm.sanitize_name(series['name'])}{tmdb_suffix}",
+                           series_id, folder=True):
+                listed.append(series)
+        all_series = listed
+        paths = planner.resolve()
+        if planner.duplicates or planner.collisions:
+            logger.info(f"Path plan: {planner.duplicates} duplicate listings skipped, "
+                        f"{planner.collisions} name collisions disambiguated")
+
         for series in all_series:
             series_id = int(series['series_id'])
             current_ids.add(series_id)
@@ -345,13 +488,24 @@ async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscri
                 if (cached.name != series['name'] or
                         cached.tmdb_id != str(series.get('tmdb', '') or '')):
                     to_add_update.append(series)
+                elif (fm.tracks(f"series:{series_id}") and
+                        not fm.file_exists(f"{paths[series_id].directory}/tvshow.nfo")):
+                    # Unchanged, but its planned folder moved (e.g. a new name collision)
+                    to_add_update.append(series)
 
-        for series_id, cached in cached_series.items():
-            if series_id not in current_ids:
-                to_delete.append(cached)
+        if not targeted:
+            for series_id, cached in cached_series.items():
+                if series_id not in current_ids:
+                    to_delete.append(cached)
 
         # Deletions
         for series in to_delete:
+            source_key = f"series:{series.series_id}"
+            if fm.tracks(source_key):
+                await fm.delete_source_files(source_key)
+                writer.delete(SeriesCache.__table__, [{"id": series.id}])
+                continue
+
             cat_name = cat_map.get(series.category_id, "Uncategorized")
             safe_cat = fm.sanitize_name(cat_name)
             safe_name = fm.sanitize_name(series.name)
@@ -362,7 +516,7 @@ async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscri
                 shutil.rmtree(path)
 
             await fm.delete_directory_if_empty(f"{fm.output_dir}/{safe_cat}")
-            db.delete(series)
+            writer.delete(SeriesCache.__table__, [{"id": series.id}])
 
         # Additions/Updates
         total_series = len(to_add_update)
@@ -379,12 +533,16 @@ async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscri
             safe_name = fm.sanitize_name(name)
             tmdb_suffix = fm.format_tmdb_suffix(tmdb_id)
 
-            series_dir = f"{fm.output_dir}/{safe_cat}/{safe_name}{tmdb_suffix}"
+            source_key = f"series:{series_id}"
+            tracked = fm.tracks(source_key)
+
+            series_dir = paths[series_id].directory
             fm.ensure_directory(series_dir)
 
-            # Clean up old folder if TMDB ID changed
+            # Clean up old folder if TMDB ID changed (untracked trees only,
+            # tracked series are pruned from the manifest once written)
             cached = cached_series.get(series_id)
-            if cached and cached.tmdb_id != (str(tmdb_id) if tmdb_id else None):
+            if not tracked and cached and cached.tmdb_id != (str(tmdb_id) if tmdb_id else None):
                 old_suffix = fm.format_tmdb_suffix(cached.tmdb_id)
                 old_name = fm.sanitize_name(cached.name)
                 old_path = f"{fm.output_dir}/{safe_cat}/{old_name}{old_suffix}"
@@ -408,39 +566,32 @@ async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscri
 
             # Always create tvshow.nfo
             nfo_path = f"{series_dir}/tvshow.nfo"
-            await fm.write_nfo(nfo_path, fm.generate_show_nfo(series, prefix_regex, format_date, clean_name))
-            
+            await fm.write_nfo(nfo_path, fm.generate_show_nfo(series, normalizer=titles), source_key)
+            written = [nfo_path]
+
+            # Plan episode files first: an episode listed twice is written once
+            # and episodes resolving to the same filename are disambiguated
+            episode_planner = PathPlanner(series_dir)
+            planned_episodes = []
             for season_key, episodes in episodes_data.items():
                 season_num = int(season_key)
 
                 # Determine episode directory based on settings
                 if use_season_folders:
                     # Use zero-padded season numbers for Jellyfin compatibility (Season 01, not Season 1)
-                    episode_dir = f"{series_dir}/Season {season_num:02d}"
-                    fm.ensure_directory(episode_dir)
+                    season_dir = f"Season {season_num:02d}"
                 else:
-                    episode_dir = series_dir
+                    season_dir = ""
 
                 for ep in episodes:
                     ep_num = int(ep['episode_num'])
-                    ep_id = ep['id']
-                    container = ep['container_extension']
                     title = ep.get('title', '')
 
                     # Build filename based on settings
                     formatted_ep = f"S{season_num:02d}E{ep_num:02d}"
 
                     # Clean title: remove series name prefix and episode code if present
-                    clean_title = title
-                    if clean_title:
-                        # Remove series name prefix (case-insensitive)
-                        if clean_title.lower().startswith(name.lower()):
-                            clean_title = clean_title[len(name):].strip(' -:')
-                        # Remove episode code patterns like "S01E01 -" or "S01E01"
-                        clean_title = re.sub(r'^S\d{1,2}E\d{1,2}\s*[-:.]?\s*', '', clean_title, flags=re.IGNORECASE)
-                        # Also handle "1x01" format
-                        clean_title = re.sub(r'^\d{1,2}x\d{1,2}\s*[-:.]?\s*', '', clean_title, flags=re.IGNORECASE)
-                        clean_title = clean_title.strip(' -:')
+                    clean_title = titles.episode_title(title, name)
 
                     if include_series_name:
                         # Jellyfin format: Show Name - S01E01 - Episode Title.strm
@@ -457,52 +608,73 @@ async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscri
                         else:
                             filename = formatted_ep
 
-                    strm_path = f"{episode_dir}/{filename}.strm"
-                    url = xc.get_stream_url("series", str(ep_id), container)
-                    await fm.write_strm(strm_path, url)
-
-                    # Generate episode NFO
-                    nfo_path = f"{episode_dir}/{filename}.nfo"
-                    await fm.write_nfo(nfo_path, fm.generate_episode_nfo(
-                        ep, name, season_num, ep_num, prefix_regex, format_date, clean_name
-                    ))
+                    if episode_planner.add(str(ep['id']), season_dir, filename, ep['id']):
+                        planned_episodes.append((ep, season_num, ep_num))
+
+            episode_paths = episode_planner.resolve()
+            episode_dirs = set()
+            for ep, season_num, ep_num in planned_episodes:
+                planned = episode_paths[str(ep['id'])]
+                if planned.directory not in episode_dirs:
+                    fm.ensure_directory(planned.directory)
+                    episode_dirs.add(planned.directory)
+
+                strm_path = planned.file(".strm")
+                url = xc.get_stream_url("series", str(ep['id']), ep['container_extension'])
+                await fm.write_strm(strm_path, url, source_key)
+
+                # Generate episode NFO
+                nfo_path = planned.file(".nfo")
+                await fm.write_nfo(nfo_path, fm.generate_episode_nfo(
+                    ep, name, season_num, ep_num, normalizer=titles
+                ), source_key)
+                written.extend((strm_path, nfo_path))
+
+            # Remove files from a previous layout (TMDB ID, name, category or
+            # season folder setting changed). Skip when the provider returned
+            # no episodes so a transient API glitch doesn't wipe the series.
+            if tracked and episodes_data:
+                await fm.delete_source_files(source_key, keep=written)
 
             # Update Cache
-            cached = cached_series.get(series_id)
-            if not cached:
-                cached = SeriesCache(subscription_id=subscription_id, series_id=series_id)
-                db.add(cached)
-            
-            cached.name = name
-            cached.category_id = cat_id
-            cached.tmdb_id = str(tmdb_id) if tmdb_id else None
+            writer.upsert(SeriesCache.__table__, [{
+                "subscription_id": subscription_id,
+                "series_id": series_id,
+                "name": name,
+                "category_id": cat_id,
+                "tmdb_id": str(tmdb_id) if tmdb_id else None,
+            }], ["subscription_id", "series_id"], ["name", "category_id", "tmdb_id"])
 
         # Check for missing NFO files
         logger.info(f"Checking for missing series NFO files across {len(all_series)} series...")
         nfo_created_count = 0
         for series in all_series:
             series_id = int(series['series_id'])
-            name = series['name']
-            cat_id = series['category_id']
-            
-            cat_name = cat_map.get(cat_id, "Uncategorized")
-            safe_cat = fm.sanitize_name(cat_name)
-            safe_name = fm.sanitize_name(name)
-            tmdb_id = series.get('tmdb')
-            tmdb_suffix = fm.format_tmdb_suffix(tmdb_id)
-
-            series_dir = f"{fm.output_dir}/{safe_cat}/{safe_name}{tmdb_suffix}"
+            series_dir = paths[series_id].directory
             tvshow_nfo_path = f"{series_dir}/tvshow.nfo"
 
-            if os.path.exists(series_dir) and not os.path.exists(tvshow_nfo_path):
-                await fm.write_nfo(tvshow_nfo_path, fm.generate_show_nfo(series, prefix_regex, format_date, clean_name))
+            source_key = f"series:{series_id}"
+            if fm.tracks(source_key):
+                missing = not fm.file_exists(tvshow_nfo_path)
+            else:
+                missing = os.path.exists(series_dir) and not os.path.exists(tvshow_nfo_path)
+
+            if missing:
+                fm.ensure_directory(series_dir)
+                if not fm.tracks(source_key):
+                    # Adopt the episodes already on disk so they are deleted with the NFO
+                    fm.adopt_files(series_dir, source_key)
+                await fm.write_nfo(tvshow_nfo_path, fm.generate_show_nfo(series, normalizer=titles), source_key)
                 nfo_created_count += 1
         
         if nfo_created_count > 0:
             logger.info(f"Created {nfo_created_count} missing series NFO files")
 
+        writer.flush()
+        refresh_xtream_stats(db, subscription_id)
         sync_state.items_added = len(to_add_update)
         sync_state.items_deleted = len(to_delete)
+        acknowledge_selection_changes(db, SOURCE_XTREAM, subscription_id, CATEGORY_SERIES, change.last_id)
         sync_state.status = SyncStatus.SUCCESS
         sync_state.progress_current = 0
         sync_state.progress_total = 0
@@ -511,6 +683,7 @@ async def process_series(db: Session, xc: XtreamClient, fm: FileManager, subscri
 
     except Exception as e:
         logger.exception("Error syncing series")
+        flush_after_error(db, writer, subscription_id)
         sync_state.status = SyncStatus.FAILED
         sync_state.error_message = str(e)
         sync_state.progress_current = 0
@@ -532,10 +705,16 @@ def sync_movies_task(subscription_id: int):
             logger.info(f"Subscription {sub.name} is inactive")
             return "Subscription inactive"
 
-        xc = XtreamClient(sub.xtream_url, sub.username, sub.password)
-        fm = FileManager(sub.movies_dir)
-        
-        asyncio.run(process_movies(db, xc, fm, subscription_id))
+        with sync_lock(db.get_bind(), f"xtream:{subscription_id}:movies") as acquired:
+            if not acquired:
+                logger.info(f"Movies sync for {sub.name} is already running, skipping")
+                return "Sync already running"
+
+            xc = XtreamClient(sub.xtream_url, sub.username, sub.password)
+            writer = DBWriter(db.get_bind())
+            fm = FileManager(sub.movies_dir, OutputManifest(db, sub.movies_dir, OWNER_XTREAM, sub.id, writer=writer))
+
+            asyncio.run(process_movies(db, xc, fm, subscription_id, writer))
         return f"Movies synced successfully for {sub.name}"
     finally:
         db.close()
@@ -553,10 +732,16 @@ def sync_series_task(subscription_id: int):
             logger.info(f"Subscription {sub.name} is inactive")
             return "Subscription inactive"
 
-        xc = XtreamClient(sub.xtream_url, sub.username, sub.password)
-        fm = FileManager(sub.series_dir)
-        
-        asyncio.run(process_series(db, xc, fm, subscription_id))
+        with sync_lock(db.get_bind(), f"xtream:{subscription_id}:series") as acquired:
+            if not acquired:
+                logger.info(f"Series sync for {sub.name} is already running, skipping")
+                return "Sync already running"
+
+            xc = XtreamClient(sub.xtream_url, sub.username, sub.password)
+            writer = DBWriter(db.get_bind())
+            fm = FileManager(sub.series_dir, OutputManifest(db, sub.series_dir, OWNER_XTREAM, sub.id, writer=writer))
+
+            asyncio.run(process_series(db, xc, fm, subscription_id, writer))
         return f"Series synced successfully for {sub.name}"
     finally:
         db.close()
@@ -0,0 +1,108 @@
+"""Benchmark for concurrent writers: SQLite versus PostgreSQL.
+
+Several processes, like Celery worker processes, each run short write
+transactions (a cache upsert) interleaved with reads, and the throughput,
+commit latency and failed transactions are reported per backend. SQLite is
+always measured on a temporary file; pass --postgres with the URL of a
+scratch database to compare.
+
+Usage: python benchmarks/bench_db_concurrency.py [--postgres URL] [--workers N]
+                                                 [--transactions N] [--rows N]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.core.database import ROLE_WORKER, create_db_engine, upsert
+from app.core.schema import upgrade_database
+from app.models.cache import MovieCache
+
+# Subscription ids used by the benchmark, cleaned up afterwards
+FIRST_SUBSCRIPTION = 1_000_000
+
+
+def worker(url, index, transactions, rows, results):
+    engine = create_db_engine(url, role=ROLE_WORKER)
+    subscription_id = FIRST_SUBSCRIPTION + index
+    latencies, failures = [], 0
+    with Session(engine) as db:
+        for tx in range(transactions):
+            batch = [{"subscription_id": subscription_id, "stream_id": i, "name": f"Movie {i} v{tx}",
+                      "category_id": str(i % 20), "container_extension": "mkv", "tmdb_id": None}
+                     for i in range(rows)]
+            start = time.perf_counter()
+            try:
+                upsert(db, MovieCache.__table__, batch, ["subscription_id", "stream_id"],
+                       ["name", "category_id", "container_extension", "tmdb_id"])
+                db.commit()
+                db.execute(select(func.count()).select_from(MovieCache)).scalar()
+                db.commit()
+            except OperationalError:
+                db.rollback()
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+    engine.dispose()
+    results.put((latencies, failures))
+
+
+def bench(label, url, args):
+    engine = create_db_engine(url)
+    upgrade_database(engine)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(url, i, args.transactions, args.rows, results))
+                 for i in range(args.workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for worker_latencies, _ in collected for latency in worker_latencies)
+    failures = sum(f for _, f in collected)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+    print(f"{label:<12} {len(latencies) / elapsed:>8,.1f} tx/sec  "
+          f"p50 {statistics.median(latencies) * 1000 if latencies else 0:>7.1f} ms  "
+          f"p95 {p95 * 1000:>7.1f} ms  failed {failures}")
+
+    with engine.begin() as conn:
+        conn.execute(delete(MovieCache).where(MovieCache.subscription_id >= FIRST_SUBSCRIPTION))
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--postgres", help="URL of a scratch PostgreSQL database")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--transactions", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{args.workers} workers x {args.transactions} transactions of {args.rows} upserted rows")
+    directory = tempfile.mkdtemp()
+    try:
+        bench("sqlite", f"sqlite:///{os.path.join(directory, 'bench.db')}", args)
+    finally:
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+    if args.postgres:
+        bench("postgresql", args.postgres, args)
+
+
+if __name__ == "__main__":
+    main()
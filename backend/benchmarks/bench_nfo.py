@@ -0,0 +1,59 @@
+"""Micro-benchmark for NFO rendering throughput (NFOs/sec).
+
+Usage: python benchmarks/bench_nfo.py [--count N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.file_manager import FileManager
+
+MOVIE = {
+    "name": "EN - Big_Movie_2024", "tmdb": "12345", "imdb": "tt0001234",
+    "plot": "A story about <things> & \"people\". " * 8, "year": "2024-05-01",
+    "rating": "4.1", "rating_5based": 4.1, "genre": "Action, Drama / Sci-Fi",
+    "director": "Jane Doe", "cast": "Actor One, Actor Two, Actor Three",
+    "duration": "01:45:10", "youtube_trailer": "abc123", "movie_image": "http://img/cover.jpg",
+    "backdrop_path": ["http://img/backdrop.jpg"], "mpaa": "PG-13",
+    "video": {"codec_name": "hevc", "width": 3840, "height": 2160, "display_aspect_ratio": "16:9", "bit_rate": "12500000"},
+    "audio": {"codec_name": "eac3", "channels": 6, "sample_rate": "48000", "channel_layout": "5.1", "tags": {"language": "eng"}},
+    "duration_secs": "7260",
+}
+SHOW = {
+    "name": "FR - Some_Show_2010", "tmdb": "777", "imdb_id": "tt777", "plot": "Plot & more",
+    "releaseDate": "2010-01-01", "rating": "8", "rating_5based": "4", "genre": "Drama/Crime",
+    "cast": "X, Y", "director": "D", "cover": "http://img/show.jpg", "backdrop_path": ["http://img/f.jpg"],
+}
+EPISODE = {
+    "title": "Some Show - S01E01 - Pilot",
+    "info": {"duration_secs": "2700", "bitrate": "4000",
+             "video": {"codec_name": "h264", "width": 1920, "height": 1080},
+             "audio": {"codec_name": "aac", "channels": 2}},
+}
+
+
+def bench(label, fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {count / elapsed:>12,.0f} NFOs/sec  ({elapsed * 1000:.1f} ms for {count})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=50000)
+    args = parser.parse_args()
+
+    fm = FileManager("/tmp")
+    opts = dict(prefix_regex=None, format_date=True, clean_name=True)
+    bench("movie", lambda: fm.generate_movie_nfo(MOVIE, **opts), args.count)
+    bench("tvshow", lambda: fm.generate_show_nfo(SHOW, **opts), args.count)
+    bench("episode", lambda: fm.generate_episode_nfo(EPISODE, "Some Show", 1, 1, **opts), args.count)
+
+
+if __name__ == "__main__":
+    main()
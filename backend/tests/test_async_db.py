@@ -0,0 +1,120 @@
+import unittest
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from unittest.mock import patch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.api import deps
+from app.api.endpoints import m3u_sources, scheduler, selection
+from app.core.database import async_url, create_async_db_engine, create_db_engine
+from app.core.schema import upgrade_database
+from app.models.m3u_source import M3USource
+from app.models.schedule import Schedule
+from app.models.subscription import Subscription
+
+
+class TestAsyncEngine(unittest.TestCase):
+    def test_async_driver_for_each_backend(self):
+        self.assertEqual(async_url("sqlite:////db/xtream.db").drivername, "sqlite+aiosqlite")
+        self.assertEqual(async_url("postgresql+psycopg2://u:p@h/db").drivername, "postgresql+asyncpg")
+
+    def test_read_only_sessions_refuse_writes(self):
+        directory = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(directory, 'xtream.db')}"
+        upgrade_database(create_db_engine(url))
+
+        async def run():
+            engine = create_async_db_engine(url, read_only=True)
+            try:
+                async with engine.connect() as conn:
+                    self.assertEqual((await conn.execute(text("PRAGMA journal_mode"))).scalar(), "wal")
+                    with self.assertRaises(OperationalError):
+                        await conn.execute(text("DELETE FROM subscriptions"))
+            finally:
+                await engine.dispose()
+        try:
+            asyncio.run(run())
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestAsyncEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(self.dir, 'xtream.db')}"
+        self.engine = create_db_engine(url)
+        upgrade_database(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        with self.Session() as db:
+            db.add(Subscription(id=1, name="sub", xtream_url="http://h", username="u", password="p",
+                                movies_dir="/m", series_dir="/s"))
+            db.commit()
+
+        app = FastAPI()
+        app.include_router(selection.router, prefix="/selection")
+        app.include_router(scheduler.router, prefix="/scheduler")
+        app.include_router(m3u_sources.router, prefix="/m3u-sources")
+
+        # Created inside the app's event loop, on first use
+        self.async_engine = None
+
+        async def get_async_db():
+            if self.async_engine is None:
+                self.async_engine = create_async_db_engine(url)
+            async with async_sessionmaker(self.async_engine, expire_on_commit=False)() as db:
+                yield db
+        app.dependency_overrides[deps.get_async_db] = get_async_db
+        app.dependency_overrides[deps.get_async_read_db] = get_async_db
+        self.client = TestClient(app)
+        self.client.__enter__()
+
+    def tearDown(self):
+        if self.async_engine is not None:
+            self.client.portal.call(self.async_engine.dispose)
+        self.client.__exit__(None, None, None)
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_schedule_config(self):
+        schedules = self.client.get("/scheduler/config/1").json()
+        self.assertEqual(sorted(s["type"] for s in schedules), ["movies", "series"])
+
+        updated = self.client.put("/scheduler/config/1/movies", json={"enabled": True, "frequency": "hourly"})
+        self.assertEqual(updated.status_code, 200)
+        self.assertIsNotNone(updated.json()["next_run"])
+        self.assertEqual(self.client.get("/scheduler/history/1").json(), [])
+        with self.Session() as db:
+            self.assertEqual(db.query(Schedule).filter_by(enabled=True).count(), 1)
+
+    @patch("app.api.endpoints.selection.refresh_categories_task")
+    def test_category_refresh_is_queued(self, task):
+        task.delay.return_value.id = "task-1"
+        response = self.client.post("/selection/series/sync/1")
+        self.assertEqual(response.json()["task_id"], "task-1")
+        task.delay.assert_called_once_with(1, "series")
+        self.assertEqual(self.client.post("/selection/movies/sync/9").status_code, 404)
+
+    def test_upload_stream(self):
+        with patch.object(m3u_sources, "UPLOAD_DIR", m3u_sources.Path(self.dir)):
+            body = b"#EXTM3U\n#EXTINF:-1 group-title=\"Films\",Heat\nhttp://h/movie/1.mkv\n"
+            created = self.client.post("/m3u-sources/upload/stream", params={"name": "list"}, content=body)
+            self.assertEqual(created.status_code, 200)
+            self.assertEqual(created.json()["name"], "list")
+            again = self.client.post("/m3u-sources/upload/stream", params={"name": "list"}, content=body)
+            self.assertEqual(again.status_code, 400)
+        with self.Session() as db:
+            source = db.query(M3USource).one()
+        self.assertEqual(source.file_path, os.path.join(self.dir, "list.m3u"))
+
+
+if __name__ == '__main__':
+    unittest.main()
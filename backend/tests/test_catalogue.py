@@ -0,0 +1,123 @@
+import unittest
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from app.api import deps
+from app.api.endpoints import m3u_sources, subscriptions
+from app.core.database import create_db_engine
+from app.core.schema import upgrade_database
+from app.models.cache import MovieCache
+from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.m3u_source import M3USource, SourceType
+from app.models.subscription import Subscription
+from app.services.catalogue import M3U_ENTRIES, XTREAM_MOVIES, browse_query
+
+
+class TestCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_db_engine(f"sqlite:///{os.path.join(self.dir, 'xtream.db')}")
+        upgrade_database(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+        with self.Session() as db:
+            db.add(Subscription(id=1, name="sub", xtream_url="http://h", username="u", password="p",
+                                movies_dir="/m", series_dir="/s"))
+            db.add(M3USource(id=1, name="src", source_type=SourceType.FILE, output_dir="/o"))
+            db.add(M3USource(id=2, name="other", source_type=SourceType.FILE, output_dir="/o2"))
+            # Duplicate titles so pages have to break ties on id
+            for i in range(25):
+                db.add(M3UEntry(m3u_source_id=1, title=f"Title {i % 10}", url=f"http://h/{i}",
+                                group_title="Films" if i % 2 else "Shows",
+                                entry_type=EntryType.MOVIE if i % 2 else EntryType.SERIES))
+            db.add(M3UEntry(m3u_source_id=2, title="Title 0", url="http://h/other", entry_type=EntryType.MOVIE))
+            db.add_all([MovieCache(subscription_id=1, stream_id=i, name=f"Movie {i:02d}", category_id=str(i % 3))
+                        for i in range(12)])
+            db.commit()
+
+        app = FastAPI()
+        app.include_router(m3u_sources.router, prefix="/m3u-sources")
+        app.include_router(subscriptions.router, prefix="/subscriptions")
+
+        def get_read_db():
+            db = self.Session()
+            try:
+                yield db
+            finally:
+                db.close()
+        app.dependency_overrides[deps.get_read_db] = get_read_db
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def walk(self, path, **params):
+        items, cursor = [], None
+        while True:
+            page = self.client.get(path, params=dict(params, cursor=cursor) if cursor else params).json()
+            items.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return items
+
+    def test_pages_cover_every_row_once_in_order(self):
+        items = self.walk("/m3u-sources/1/entries", limit=4)
+        with self.Session() as db:
+            expected = [(e.title, e.id) for e in
+                        db.query(M3UEntry).filter_by(m3u_source_id=1).order_by(M3UEntry.title, M3UEntry.id)]
+        self.assertEqual([(i["title"], i["id"]) for i in items], expected)
+
+    def test_filters(self):
+        films = self.walk("/m3u-sources/1/entries", group="Films", limit=5)
+        self.assertEqual(len(films), 12)
+        self.assertTrue(all(i["group_title"] == "Films" for i in films))
+
+        series = self.walk("/m3u-sources/1/entries", type="series", prefix="Title 2")
+        self.assertEqual([(i["title"], i["entry_type"]) for i in series],
+                         [("Title 2", "series")] * 3)
+
+        movies = self.walk("/subscriptions/1/movies", category_id="1", prefix="Movie 1", limit=1)
+        self.assertEqual([m["name"] for m in movies], ["Movie 10"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/m3u-sources/1/entries", params={"cursor": "not a cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_streams_ndjson(self):
+        plain = self.client.get("/subscriptions/1/movies/export", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(plain.headers["content-type"], "application/x-ndjson")
+        names = [json.loads(line)["name"] for line in plain.text.splitlines()]
+        self.assertEqual(names, [f"Movie {i:02d}" for i in range(12)])
+
+        # The raw body is a single gzip stream of the same NDJSON lines
+        with self.client.stream("GET", "/m3u-sources/1/entries/export", params={"group": "Shows"},
+                                headers={"Accept-Encoding": "gzip"}) as compressed:
+            self.assertEqual(compressed.headers["content-encoding"], "gzip")
+            raw = b"".join(compressed.iter_raw())
+        entries = [json.loads(line) for line in gzip.decompress(raw).decode("utf-8").splitlines()]
+        self.assertEqual(len(entries), 13)
+        self.assertEqual({entry["group_title"] for entry in entries}, {"Shows"})
+
+    def test_pages_seek_an_index(self):
+        with self.Session() as db:
+            for catalogue, group in ((M3U_ENTRIES, "Films"), (XTREAM_MOVIES, "1")):
+                query = browse_query(db, catalogue, 1, group=group)
+                statement = query.order_by(catalogue.title, catalogue.id).limit(3).statement
+                compiled = statement.compile(self.engine, compile_kwargs={"literal_binds": True})
+                plan = " ".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+                self.assertIn("USING INDEX", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+from unittest.mock import AsyncMock, MagicMock, patch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from app.api.endpoints import selection
+from app.core.database import create_db_engine
+from app.core.schema import upgrade_database
+from app.models.category import Category
+from app.models.subscription import Subscription
+from app.services.categories import count_by_category, store_categories
+from app.tasks.categories import STATE_PROGRESS, refresh_categories_task
+
+
+class TestCategories(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_db_engine(f"sqlite:///{os.path.join(self.dir, 'xtream.db')}")
+        upgrade_database(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def stored(self, db):
+        rows = db.query(Category).filter_by(subscription_id=1, type="movie").order_by(Category.category_id)
+        return [(c.id, c.category_id, c.category_name, c.item_count) for c in rows]
+
+    def test_diff_keeps_rows_and_counts(self):
+        streams = [{"category_id": 1}, {"category_id": "1"}, {"category_id": 2}]
+        with self.Session() as db:
+            store_categories(db, 1, "movie", [{"category_id": 1, "category_name": "Action"},
+                                              {"category_id": 2, "category_name": "Drama"}],
+                             count_by_category(streams))
+            db.commit()
+            self.assertEqual(self.stored(db), [(1, "1", "Action", 2), (2, "2", "Drama", 1)])
+
+            # Without counts (a category-only refresh) the synced counts survive
+            synced = store_categories(db, 1, "movie", [{"category_id": 1, "category_name": "Action!"},
+                                                       {"category_id": 3, "category_name": "Horror"}])
+            db.commit()
+            self.assertEqual(synced, 2)
+            self.assertEqual(self.stored(db), [(1, "1", "Action!", 2), (3, "3", "Horror", 0)])
+
+    @patch("app.tasks.categories.XtreamClient")
+    def test_refresh_fetches_only_categories(self, client_cls):
+        client = client_cls.return_value
+        client.get_vod_categories = AsyncMock(return_value=[{"category_id": 7, "category_name": "Docs"}])
+        with self.Session() as db:
+            db.add(Subscription(id=1, name="sub", xtream_url="http://h", username="u", password="p",
+                                movies_dir="/m", series_dir="/s"))
+            db.commit()
+
+        with patch("app.tasks.categories.SessionLocal", self.Session), \
+                patch.object(refresh_categories_task, "update_state") as update_state:
+            result = refresh_categories_task.apply(args=(1, "movie")).get()
+
+        self.assertEqual(result["categories_synced"], 1)
+        self.assertEqual([c.kwargs["meta"]["phase"] for c in update_state.call_args_list],
+                         ["Fetching categories", "Saving categories"])
+        client.get_vod_streams.assert_not_called()
+        with self.Session() as db:
+            self.assertEqual([c[1:] for c in self.stored(db)], [("7", "Docs", 0)])
+
+
+class TestCategoryRefreshStatus(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(selection.router, prefix="/selection")
+        self.client = TestClient(app)
+
+    def status(self, **result):
+        with patch("app.api.endpoints.selection.AsyncResult", return_value=MagicMock(**result)):
+            return self.client.get("/selection/refresh/t1").json()
+
+    def test_states(self):
+        running = self.status(state=STATE_PROGRESS, info={"phase": "Fetching categories"})
+        self.assertEqual((running["state"], running["phase"]), (STATE_PROGRESS, "Fetching categories"))
+
+        done = self.status(state="SUCCESS", result={"categories_synced": 4, "timestamp": "2026-10-19T12:00:00"},
+                           **{"successful.return_value": True})
+        self.assertEqual((done["categories_synced"], done["timestamp"]), (4, "2026-10-19T12:00:00"))
+
+        failed = self.status(state="FAILURE", result=ValueError("Subscription 1 not found"),
+                             **{"successful.return_value": False, "failed.return_value": True})
+        self.assertEqual(failed["error"], "Subscription 1 not found")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import datetime
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app.api import deps
+from app.api.endpoints import dashboard, m3u_sync, sync
+from app.core.database import create_db_engine
+from app.core.schema import upgrade_database
+from app.models.cache import MovieCache, SeriesCache
+from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.m3u_source import M3USource, SourceType
+from app.models.m3u_sync_state import M3USyncState
+from app.models.schedule import Schedule, SyncType
+from app.models.subscription import Subscription
+from app.models.sync_state import SyncState
+from app.services.content_stats import refresh_stats
+
+
+@contextlib.contextmanager
+def count_queries(engine):
+    """Collect the SQL statements executed on engine inside the block"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+class APITestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_db_engine(f"sqlite:///{os.path.join(self.dir, 'xtream.db')}")
+        upgrade_database(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+        app = FastAPI()
+        app.include_router(dashboard.router, prefix="/dashboard")
+        app.include_router(sync.router, prefix="/sync")
+        app.include_router(m3u_sync.router, prefix="/m3u-sync")
+
+        def get_read_db():
+            db = self.Session()
+            try:
+                yield db
+            finally:
+                db.close()
+        app.dependency_overrides[deps.get_read_db] = get_read_db
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class TestDashboardStats(APITestCase):
+    def setUp(self):
+        super().setUp()
+        with self.Session() as db:
+            db.add(Subscription(id=1, name="sub", xtream_url="http://h", username="u", password="p",
+                                movies_dir="/m", series_dir="/s"))
+            db.add(M3USource(id=1, name="src", source_type=SourceType.FILE, output_dir="/o"))
+            db.add_all([MovieCache(subscription_id=1, stream_id=i) for i in range(3)])
+            db.add(SeriesCache(subscription_id=1, series_id=1))
+            db.add(M3UEntry(m3u_source_id=1, title="A", url="http://h/1", entry_type=EntryType.MOVIE))
+            db.commit()
+
+    def refresh(self):
+        with self.Session() as db:
+            refresh_stats(db, subscription_ids=[1], m3u_source_ids=[1])
+            db.commit()
+
+    def test_counts_come_from_stats(self):
+        # Nothing synced yet: the cache rows are not counted on request
+        self.assertEqual(self.client.get("/dashboard/stats").json()["total_content"]["total"], 0)
+
+        self.refresh()
+        self.assertEqual(self.client.get("/dashboard/stats").json()["total_content"],
+                         {"movies": 4, "series": 1, "total": 5})
+        by_source = self.client.get("/dashboard/content-by-source").json()
+        self.assertEqual([(s["source_type"], s["movies"], s["series"]) for s in by_source],
+                         [("xtream", 3, 1), ("m3u", 1, 0)])
+
+    def test_unchanged_poll_returns_not_modified(self):
+        self.refresh()
+        first = self.client.get("/dashboard/content-by-source")
+        etag = first.headers["ETag"]
+        again = self.client.get("/dashboard/content-by-source", headers={"If-None-Match": etag})
+        self.assertEqual((again.status_code, again.content), (304, b""))
+
+        with self.Session() as db:
+            db.add(M3UEntry(m3u_source_id=1, title="B", url="http://h/2", entry_type=EntryType.SERIES))
+            db.commit()
+        self.refresh()
+        changed = self.client.get("/dashboard/content-by-source", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+
+
+class TestQueryCounts(APITestCase):
+    """Read endpoints run a fixed number of statements, however many sources exist"""
+
+    ENDPOINTS = {
+        "/dashboard/stats": 4,
+        "/dashboard/recent-activity": 1,
+        "/dashboard/scheduled-syncs": 1,
+        "/dashboard/content-by-source": 2,
+        "/sync/status": 1,
+        "/m3u-sync/status": 1,
+    }
+
+    def add_sources(self, first, count):
+        with self.Session() as db:
+            for i in range(first, first + count):
+                db.add(Subscription(id=i, name=f"sub {i}", xtream_url="http://h", username="u",
+                                    password="p", movies_dir="/m", series_dir="/s"))
+                db.add(M3USource(id=i, name=f"src {i}", source_type=SourceType.FILE, output_dir="/o"))
+                for sync_type in (SyncType.MOVIES, SyncType.SERIES):
+                    db.add(SyncState(subscription_id=i, type=sync_type.value, status="success",
+                                     last_sync=datetime.utcnow()))
+                    db.add(Schedule(subscription_id=i, type=sync_type, enabled=True))
+                    db.add(M3USyncState(m3u_source_id=i, type=sync_type.value, status="success"))
+            db.commit()
+            refresh_stats(db, subscription_ids=range(first, first + count),
+                          m3u_source_ids=range(first, first + count))
+            db.commit()
+
+    def statements(self, path):
+        with count_queries(self.engine) as statements:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return len(statements)
+
+    def test_statement_count_does_not_grow_with_sources(self):
+        self.add_sources(1, 1)
+        few = {path: self.statements(path) for path in self.ENDPOINTS}
+        self.add_sources(2, 9)
+        many = {path: self.statements(path) for path in self.ENDPOINTS}
+        self.assertEqual(few, self.ENDPOINTS)
+        self.assertEqual(many, self.ENDPOINTS)
+
+    def test_activity_names_the_subscription(self):
+        self.add_sources(1, 2)
+        activity = self.client.get("/dashboard/recent-activity").json()
+        self.assertEqual({(a["source_name"], a["source_type"]) for a in activity},
+                         {("sub 1", "xtream"), ("sub 2", "xtream")})
+        scheduled = self.client.get("/dashboard/scheduled-syncs").json()
+        self.assertEqual(len(scheduled), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.core.database import create_db_engine
+from app.core.schema import upgrade_database
+from app.models.cache import MovieCache
+from app.models.output_file import OutputFile
+from app.services.db_writer import DBWriter
+from app.services.file_manager import FileManager
+from app.services.output_manifest import OutputManifest, OWNER_XTREAM
+
+CACHE_KEY = ["subscription_id", "stream_id"]
+CACHE_COLUMNS = ["name", "category_id", "container_extension", "tmdb_id"]
+
+
+def movie(stream_id, name):
+    return {"subscription_id": 1, "stream_id": stream_id, "name": name,
+            "category_id": "1", "container_extension": "mkv", "tmdb_id": None}
+
+
+class TestDBWriter(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.url = f"sqlite:///{os.path.join(self.dir, 'xtream.db')}"
+        self.engine = create_db_engine(self.url)
+        upgrade_database(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def cached_names(self):
+        with Session(self.engine) as db:
+            rows = db.execute(select(MovieCache.stream_id, MovieCache.name).order_by(MovieCache.stream_id))
+            return [tuple(r) for r in rows]
+
+    def test_writes_in_bounded_transactions(self):
+        writer = DBWriter(self.engine, batch_size=4)
+        for i in range(10):
+            writer.upsert(MovieCache.__table__, [movie(i, f"Movie {i}")], CACHE_KEY, CACHE_COLUMNS)
+        # Full batches are written as soon as they are queued
+        self.assertEqual((writer.transactions, writer.pending), (2, 2))
+        self.assertEqual(len(self.cached_names()), 8)
+
+        writer.flush()
+        self.assertEqual((writer.transactions, writer.pending), (3, 0))
+        self.assertEqual(len(self.cached_names()), 10)
+
+    def test_changes_apply_in_order(self):
+        writer = DBWriter(self.engine)
+        writer.upsert(MovieCache.__table__, [movie(1, "One"), movie(2, "Two")], CACHE_KEY, CACHE_COLUMNS)
+        writer.upsert(MovieCache.__table__, [movie(1, "One (2024)")], CACHE_KEY, CACHE_COLUMNS)
+        writer.delete(MovieCache.__table__, [{"subscription_id": 1, "stream_id": 2}])
+        writer.upsert(MovieCache.__table__, [movie(2, "Two again")], CACHE_KEY, CACHE_COLUMNS)
+        writer.flush()
+        self.assertEqual(self.cached_names(), [(1, "One (2024)"), (2, "Two again")])
+
+    def test_manifest_writes_through_writer(self):
+        root = os.path.join(self.dir, "out")
+        os.makedirs(root)
+        with Session(self.engine) as db:
+            db.add(OutputFile(owner_type=OWNER_XTREAM, owner_id=1, root=root, rel_path="old.strm",
+                              source_key="movie:1", size=1, content_hash="x"))
+            db.commit()
+
+            writer = DBWriter(self.engine)
+            fm = FileManager(root, OutputManifest(db, root, OWNER_XTREAM, 1, writer=writer))
+            fm.manifest.record(os.path.join(root, "new.strm"), "http://h/2", "movie:2")
+            fm.manifest.forget(os.path.join(root, "old.strm"))
+            # Nothing is left for the task's own session to commit
+            self.assertFalse(db.new or db.dirty or db.deleted)
+            writer.flush()
+
+            paths = db.execute(select(OutputFile.rel_path, OutputFile.source_key)).all()
+        self.assertEqual([tuple(p) for p in paths], [("new.strm", "movie:2")])
+
+    def test_read_only_engine(self):
+        reader = create_db_engine(self.url, read_only=True)
+        try:
+            writer = DBWriter(self.engine)
+            writer.upsert(MovieCache.__table__, [movie(1, "One")], CACHE_KEY, CACHE_COLUMNS)
+            writer.flush()
+            with reader.connect() as conn:
+                self.assertEqual(conn.execute(select(MovieCache.name)).scalar(), "One")
+                with self.assertRaises(OperationalError):
+                    conn.execute(text("DELETE FROM movie_cache"))
+        finally:
+            reader.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base_class import Base
+from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.m3u_source import M3USource
+from app.tasks.m3u_sync import sync_cached_entries
+
+
+def entry(title, url, group="Films", tvg_id=None, entry_type="movie"):
+    return {'title': title, 'url': url, 'group_title': group, 'logo': None,
+            'tvg_id': tvg_id, 'tvg_name': None, 'entry_type': entry_type}
+
+
+class TestM3UEntryDiff(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[M3USource.__table__, M3UEntry.__table__])
+        self.db = sessionmaker(bind=engine)()
+
+    def tearDown(self):
+        self.db.close()
+
+    def cached(self):
+        rows = self.db.query(M3UEntry).filter(M3UEntry.m3u_source_id == 1).order_by(M3UEntry.id)
+        return {row.entry_key: (row.id, row.title, row.url, row.group_title) for row in rows}
+
+    def test_reparse_writes_only_changes(self):
+        first = [
+            entry("Movie A", "http://h/movie/1.mp4"),
+            entry("Movie B", "http://h/movie/2.mp4"),
+            entry("Movie C", "http://h/movie/3.mp4", tvg_id="c"),
+            entry("Channel", "http://h/live/4.ts", entry_type="live"),
+        ]
+        diff = sync_cached_entries(self.db, 1, first)
+        self.assertEqual((diff.inserted, diff.updated, diff.deleted, diff.unchanged), (3, 0, 0, 0))
+        before = self.cached()
+
+        second = [
+            entry("Movie A", "http://h/movie/1.mp4"),
+            entry("Movie B", "http://h/movie/2.mp4", group="Drama"),
+            # Same tvg-id and title, the URL token rotated
+            entry("Movie C", "http://h/movie/3.mp4?token=2", tvg_id="c"),
+            entry("Movie D", "http://h/movie/5.mp4"),
+        ]
+        diff = sync_cached_entries(self.db, 1, second)
+        self.assertEqual((diff.inserted, diff.updated, diff.deleted, diff.unchanged), (1, 2, 0, 1))
+        after = self.cached()
+        # Matched rows keep their primary key
+        for key in before:
+            self.assertEqual(after[key][0], before[key][0])
+        self.assertEqual(after["url:http://h/movie/2.mp4"][3], "Drama")
+        self.assertEqual(after["tvg:c/Movie C"][2], "http://h/movie/3.mp4?token=2")
+
+        diff = sync_cached_entries(self.db, 1, second[2:])
+        self.assertEqual((diff.deleted, diff.total), (2, 2))
+        self.assertEqual(set(self.cached()), {"tvg:c/Movie C", "url:http://h/movie/5.mp4"})
+
+    def test_repeated_identities_are_kept(self):
+        entries = [entry("Movie", "http://h/movie/1.mp4", group=g) for g in ("A", "B")]
+        sync_cached_entries(self.db, 1, entries)
+        self.assertEqual(set(self.cached()), {"url:http://h/movie/1.mp4", "url:http://h/movie/1.mp4#2"})
+        diff = sync_cached_entries(self.db, 1, entries)
+        self.assertEqual(diff.unchanged, 2)
+
+    def test_rows_without_identity_are_replaced(self):
+        self.db.add(M3UEntry(m3u_source_id=1, title="Old", url="http://h/movie/1.mp4",
+                             entry_type=EntryType.MOVIE))
+        self.db.commit()
+        diff = sync_cached_entries(self.db, 1, [entry("Old", "http://h/movie/1.mp4")])
+        self.assertEqual((diff.inserted, diff.deleted), (1, 1))
+        self.assertEqual(list(self.cached()), ["url:http://h/movie/1.mp4"])
+
+
+if __name__ == '__main__':
+    unittest.main()
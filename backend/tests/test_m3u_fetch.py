@@ -0,0 +1,170 @@
+import unittest
+from unittest.mock import patch
+import functools
+import gzip
+import hashlib
+import lzma
+import tempfile
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+from app.models.m3u_source import M3USource, SourceType
+from app.services import m3u_fetch
+from app.services.m3u_fetch import DownloadBudgetExceeded, PlaylistDecoder, fetch_playlist, hash_file
+from app.tasks.m3u_sync import fetch_changed_playlist
+
+BODY = b'#EXTM3U\n' + b'#EXTINF:-1 group-title="Films",Movie\nhttp://host/movie/u/p/1.mp4\n' * 200
+BODY_HASH = hashlib.sha256(BODY).hexdigest()
+
+
+class BodyStream(httpx.AsyncByteStream):
+    """Response body as a network transport delivers it, optionally dropping the connection"""
+
+    def __init__(self, data: bytes, fail_at=None):
+        self.data = data
+        self.fail_at = fail_at
+
+    async def __aiter__(self):
+        if self.fail_at is None:
+            yield self.data
+            return
+        yield self.data[:self.fail_at]
+        raise httpx.ReadError("connection reset")
+
+
+class PlaylistServer:
+    """Mock transport serving BODY with optional compression, ranges and failures"""
+
+    def __init__(self, body=BODY, headers=None, fail_at=None, ranges=True, status=200):
+        self.body = body
+        self.headers = headers or {}
+        self.fail_at = fail_at  # byte offset of the first response's dropped connection
+        self.ranges = ranges
+        self.status = status
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.status != 200:
+            return httpx.Response(self.status)
+        headers = dict(self.headers, ETag='"v1"', **({'Accept-Ranges': 'bytes'} if self.ranges else {}))
+        status, body = 200, self.body
+        range_header = request.headers.get('range')
+        if self.ranges and range_header and request.headers.get('if-range') == '"v1"':
+            start = int(range_header[len('bytes='):-1])
+            status, body = 206, body[start:]
+            headers['Content-Range'] = f"bytes {start}-{len(self.body) - 1}/{len(self.body)}"
+        fail_at = self.fail_at if len(self.requests) == 1 else None
+        return httpx.Response(status, headers=headers, stream=BodyStream(body, fail_at))
+
+    def fetch(self, **kwargs):
+        kwargs.setdefault('retries', 2)
+        with patch.object(m3u_fetch.asyncio, 'sleep', no_sleep):
+            return fetch_playlist("http://host/list.m3u", transport=httpx.MockTransport(self), **kwargs)
+
+
+async def no_sleep(delay):
+    pass
+
+
+class TestM3UFetch(unittest.TestCase):
+    def assert_snapshot(self, snapshot):
+        try:
+            self.assertEqual(snapshot.sha256, BODY_HASH)
+            self.assertEqual(hash_file(snapshot.path), BODY_HASH)
+        finally:
+            snapshot.discard()
+        self.assertFalse(os.path.exists(snapshot.path))
+
+    def test_download_is_hashed_while_streaming(self):
+        server = PlaylistServer(headers={'Last-Modified': 'Mon', 'Content-Type': 'audio/x-mpegurl; charset=latin-1'})
+        snapshot = server.fetch()
+        self.assertEqual((snapshot.etag, snapshot.last_modified, snapshot.encoding), ('"v1"', 'Mon', 'latin-1'))
+        self.assertEqual(server.requests[0].headers['accept-encoding'], 'gzip')
+        self.assert_snapshot(snapshot)
+
+    def test_compressed_playlists(self):
+        for body, headers in (
+            (gzip.compress(BODY), {'Content-Encoding': 'gzip'}),
+            (gzip.compress(BODY), {}),  # .m3u.gz
+            (lzma.compress(BODY), {}),  # .m3u.xz
+            (gzip.compress(gzip.compress(BODY)), {'Content-Encoding': 'gzip'}),
+        ):
+            with self.subTest(headers=headers):
+                self.assert_snapshot(PlaylistServer(body, headers).fetch())
+
+    def test_truncated_compressed_playlist_fails(self):
+        decoder = PlaylistDecoder()
+        decoder.feed(gzip.compress(BODY)[:100])
+        with self.assertRaises(ValueError):
+            decoder.finish()
+
+    def test_interrupted_download_resumes(self):
+        body = gzip.compress(BODY)
+        server = PlaylistServer(body, fail_at=len(body) // 2)
+        self.assert_snapshot(server.fetch())
+        self.assertEqual(server.requests[1].headers['range'], f"bytes={len(body) // 2}-")
+
+    def test_interrupted_download_restarts_without_ranges(self):
+        server = PlaylistServer(fail_at=100, ranges=False)
+        self.assert_snapshot(server.fetch())
+        self.assertNotIn('range', server.requests[1].headers)
+
+    def test_size_budget(self):
+        with self.assertRaises(DownloadBudgetExceeded):
+            PlaylistServer(gzip.compress(BODY)).fetch(max_bytes=len(BODY) - 1)
+
+    def url_source(self, **kwargs):
+        return M3USource(name="src", source_type=SourceType.URL, url="http://host/list.m3u", **kwargs)
+
+    def fetch_changed(self, server, source, **kwargs):
+        fetch = functools.partial(fetch_playlist, transport=httpx.MockTransport(server))
+        with patch('app.tasks.m3u_sync.fetch_playlist', fetch):
+            return fetch_changed_playlist(source, **kwargs)
+
+    def test_not_modified_skips_parse(self):
+        server = PlaylistServer(status=304)
+        source = self.url_source(m3u_hash=BODY_HASH, http_etag='"v1"', http_last_modified='Mon')
+        self.assertIsNone(self.fetch_changed(server, source, existing_count=5))
+        self.assertEqual(server.requests[0].headers['if-none-match'], '"v1"')
+        self.assertEqual(server.requests[0].headers['if-modified-since'], 'Mon')
+
+    def test_same_content_skips_parse_and_refreshes_validators(self):
+        source = self.url_source(m3u_hash=BODY_HASH, http_etag='"v0"')
+        self.assertIsNone(self.fetch_changed(PlaylistServer(), source, existing_count=5))
+        self.assertEqual(source.http_etag, '"v1"')
+
+    def test_changed_content_or_force_is_parsed(self):
+        for source, force in ((self.url_source(m3u_hash="old"), False),
+                              (self.url_source(m3u_hash=BODY_HASH, http_etag='"v1"'), True)):
+            server = PlaylistServer()
+            snapshot = self.fetch_changed(server, source, existing_count=5, force=force)
+            self.assertIsNotNone(snapshot)
+            snapshot.discard()
+        # Forced syncs download unconditionally
+        self.assertNotIn('if-none-match', server.requests[0].headers)
+
+    def test_unchanged_file_source(self):
+        with tempfile.NamedTemporaryFile(suffix='.m3u', delete=False) as f:
+            f.write(BODY)
+        try:
+            source = M3USource(name="src", source_type=SourceType.FILE, file_path=f.name, m3u_hash=BODY_HASH)
+            self.assertIsNone(fetch_changed_playlist(source, existing_count=5))
+            # An empty cache is always filled
+            snapshot = fetch_changed_playlist(source, existing_count=0)
+            # Parsed from a pinned link, replacing the upload does not affect it
+            with open(f.name + ".new", 'wb') as new:
+                new.write(b'#EXTM3U\n')
+            os.replace(f.name + ".new", f.name)
+            self.assertEqual(hash_file(snapshot.path), BODY_HASH)
+            snapshot.discard()
+            self.assertFalse(os.path.exists(snapshot.path))
+            self.assertTrue(os.path.exists(f.name))
+        finally:
+            os.remove(f.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import asyncio
+import tempfile
+import shutil
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base_class import Base
+from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.output_file import OutputFile
+from app.services.file_manager import FileManager
+from app.services.output_manifest import OutputManifest, OWNER_M3U
+from app.services.path_planner import PlannedPath
+from app.tasks.m3u_sync import group_fingerprint, remove_stale_entries, write_group_files
+
+
+def entry(title, url, logo=None):
+    return M3UEntry(title=title, url=url, logo=logo, entry_type=EntryType.MOVIE)
+
+
+class TestM3UGeneration(unittest.TestCase):
+    def test_group_fingerprint(self):
+        items = [("/out/movies/G/A.strm", entry("A", "http://h/1")), ("/out/movies/G/B.strm", entry("B", "http://h/2"))]
+        fingerprint = group_fingerprint("settings", items)
+        # Order of the entries does not matter
+        self.assertEqual(group_fingerprint("settings", list(reversed(items))), fingerprint)
+        changed = [items[0], ("/out/movies/G/B.strm", entry("B", "http://h/2", logo="http://img"))]
+        self.assertNotEqual(group_fingerprint("settings", changed), fingerprint)
+        self.assertNotEqual(group_fingerprint("other settings", items), fingerprint)
+
+    def test_remove_stale_entries(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[OutputFile.__table__])
+        db = sessionmaker(bind=engine)()
+        root = tempfile.mkdtemp()
+        loop = asyncio.new_event_loop()
+        try:
+            fm = FileManager(root, OutputManifest(db, root, OWNER_M3U, 1))
+            for rel_path in ("movies/G/A.strm", "movies/G/B.strm", "series/G/C.strm"):
+                path = os.path.join(root, rel_path)
+                fm.ensure_directory(os.path.dirname(path))
+                loop.run_until_complete(fm.write_strm(path, "http://h", f"entry:{rel_path}"))
+            db.commit()
+
+            self.assertTrue(fm.is_current(os.path.join(root, "movies/G/A.strm"), "http://h"))
+            self.assertFalse(fm.is_current(os.path.join(root, "movies/G/A.strm"), "http://other"))
+
+            deleted = remove_stale_entries(fm.manifest, "movies", {"movies/G/A.strm"})
+            self.assertEqual(deleted, 1)
+            self.assertFalse(os.path.exists(os.path.join(root, "movies/G/B.strm")))
+            # Other content types are left alone
+            self.assertTrue(os.path.exists(os.path.join(root, "series/G/C.strm")))
+        finally:
+            loop.close()
+            db.close()
+            shutil.rmtree(root, ignore_errors=True)
+
+    def test_write_group_files(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[OutputFile.__table__])
+        db = sessionmaker(bind=engine)()
+        root = tempfile.mkdtemp()
+        loop = asyncio.new_event_loop()
+        try:
+            fm = FileManager(root, OutputManifest(db, root, OWNER_M3U, 1))
+            directory = os.path.join(root, "movies", "G")
+            members = [(PlannedPath(directory, f"Movie {i}"), entry(f"Movie {i}", f"http://h/{i}")) for i in range(20)]
+            render = lambda e: f"<movie>{e.title}</movie>"
+
+            def run(members):
+                return loop.run_until_complete(write_group_files(fm, members, render, asyncio.Semaphore(4)))
+
+            counts, complete = run(members)
+            self.assertTrue(complete)
+            self.assertEqual(counts["created"], 20)
+            self.assertEqual(len(os.listdir(directory)), 40)
+
+            members[3] = (members[3][0], entry("Movie 3", "http://h/3b"))
+            counts, complete = run(members)
+            self.assertEqual((counts["updated"], counts["unchanged"]), (1, 19))
+            with open(os.path.join(directory, "Movie 3.strm")) as f:
+                self.assertEqual(f.read(), "http://h/3b")
+        finally:
+            loop.close()
+            db.close()
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
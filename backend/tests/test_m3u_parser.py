@@ -0,0 +1,123 @@
+import unittest
+import tempfile
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import mmap
+from app.services.m3u_parser import M3UParser, parse_extinf_attributes, split_extinf_ranges
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="m1" tvg-logo="http://img/1.png" group-title="Films",Movie One
+http://host/movie/u/p/1.mp4
+
+#EXTINF:-1 group-title="Shows",Show S01E01
+http://host/series/u/p/2.mkv
+#EXTINF:-1 group-title="News",Channel
+http://host/live/u/p/3.ts
+#EXTINF:-1,Orphan without URL
+"""
+
+
+class TestM3UParser(unittest.TestCase):
+    def test_iter_lines_yields_entries_lazily(self):
+        entries = M3UParser().iter_lines(PLAYLIST.split('\n'))
+        first = next(entries)
+        self.assertEqual(first['title'], "Movie One")
+        self.assertEqual(first['entry_type'], "movie")
+        self.assertEqual(first['logo'], "http://img/1.png")
+        rest = list(entries)
+        self.assertEqual([e['entry_type'] for e in rest], ["series", "live"])
+
+    def test_file_matches_in_memory_parse(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.m3u', delete=False, encoding='utf-8') as f:
+            f.write(PLAYLIST.replace('\n', '\r\n'))
+        try:
+            parser = M3UParser()
+            streamed = list(parser.iter_from_file(f.name))
+            self.assertEqual(streamed, M3UParser().parse_content(PLAYLIST.replace('\n', '\r\n')))
+            self.assertEqual(parser.count, 3)
+        finally:
+            os.unlink(f.name)
+
+    def test_parallel_file_parse_matches_sequential(self):
+        # An EXTINF without URL makes the next EXTINF line its (rejected) URL,
+        # ranges must never start on such a line
+        body = PLAYLIST + "#EXTINF:-1,Swallowed\nhttp://host/movie/u/p/9.mp4\n"
+        with tempfile.NamedTemporaryFile('w', suffix='.m3u', delete=False, encoding='utf-8') as f:
+            f.write(body * 50)
+        try:
+            sequential = list(M3UParser().iter_from_file(f.name, parallel=False))
+            parser = M3UParser()
+            parallel = list(parser.iter_from_file_parallel(f.name, workers=2))
+            self.assertEqual(parallel, sequential)
+            self.assertEqual(parser.count, len(sequential))
+
+            with open(f.name, 'rb') as raw, mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                ranges = split_extinf_ranges(mm, 16)
+                self.assertGreater(len(ranges), 1)
+                self.assertEqual(ranges[0][0], 0)
+                self.assertEqual(ranges[-1][1], len(mm))
+                for start, _ in ranges[1:]:
+                    self.assertTrue(mm[start:start + 7] == b'#EXTINF')
+        finally:
+            os.unlink(f.name)
+
+
+# Messy EXTINF lines seen in real provider playlists, with the expected
+# (attributes subset, title) for each
+EXTINF_SAMPLES = [
+    ('#EXTINF:-1 tvg-id="" tvg-name="FR - Amélie (2001)" tvg-logo="http://img/a.jpg" group-title="FR | Films",FR - Amélie (2001)',
+     {'tvg-id': '', 'tvg-name': 'FR - Amélie (2001)', 'group-title': 'FR | Films'}, 'FR - Amélie (2001)'),
+    # Commas inside quoted values (logo URLs, group names) do not start the title
+    ('#EXTINF:-1 tvg-logo="http://img/w=300,h=450/p.jpg" group-title="Action, Adventure",Die Hard, Part 2',
+     {'tvg-logo': 'http://img/w=300,h=450/p.jpg', 'group-title': 'Action, Adventure'}, 'Die Hard, Part 2'),
+    # Unknown attributes are kept, keys are lower-cased
+    ('#EXTINF:0 CUID="42" tvg-country="FR" catchup="default" catchup-days="7" timeshift="2",Channel',
+     {'cuid': '42', 'tvg-country': 'FR', 'catchup': 'default', 'catchup-days': '7', 'timeshift': '2'}, 'Channel'),
+    # No separating space between attributes
+    ('#EXTINF:-1 tvg-id="a.fr"tvg-name="A"group-title="G",A',
+     {'tvg-id': 'a.fr', 'tvg-name': 'A', 'group-title': 'G'}, 'A'),
+    # Repeated attribute: first one wins
+    ('#EXTINF:-1 group-title="First" group-title="Second",Title',
+     {'group-title': 'First'}, 'Title'),
+    # Tabs, extra spaces and whitespace around the title
+    ('#EXTINF:-1\ttvg-name="Tabbed"   group-title="G" ,   Spaced Title  ',
+     {'tvg-name': 'Tabbed', 'group-title': 'G'}, 'Spaced Title'),
+    # Title only, empty title, no comma at all
+    ('#EXTINF:-1,Just A Title', {}, 'Just A Title'),
+    ('#EXTINF:-1 tvg-id="x",', {'tvg-id': 'x'}, ''),
+    ('#EXTINF:-1 tvg-id="x"', {'tvg-id': 'x'}, ''),
+    # Unterminated quote: the value is dropped, the title still found
+    ('#EXTINF:-1 tvg-name="Broken,Recovered Title', {}, 'Recovered Title'),
+    # Attribute-looking text inside the title is part of the title
+    ('#EXTINF:-1 group-title="G",Show tvg-id="fake" S01E01', {'group-title': 'G'}, 'Show tvg-id="fake" S01E01'),
+]
+
+
+class TestExtinfConformance(unittest.TestCase):
+    def test_messy_samples(self):
+        for line, expected_attributes, expected_title in EXTINF_SAMPLES:
+            with self.subTest(line=line):
+                attributes, title = parse_extinf_attributes(line)
+                self.assertEqual(title, expected_title)
+                for key, value in expected_attributes.items():
+                    self.assertEqual(attributes.get(key), value)
+                if not expected_attributes:
+                    self.assertEqual(attributes, {})
+
+    def test_entry_fields(self):
+        entry = M3UParser()._parse_extinf(
+            '#EXTINF:-1 tvg-id="i" tvg-name="n" logo="http://l" group-title="g" tvg-country="FR",T'
+        )
+        self.assertEqual(
+            {k: entry[k] for k in ('title', 'logo', 'group_title', 'tvg_id', 'tvg_name', 'entry_type')},
+            {'title': 'T', 'logo': 'http://l', 'group_title': 'g', 'tvg_id': 'i', 'tvg_name': 'n', 'entry_type': 'live'},
+        )
+        self.assertEqual(entry['attributes']['tvg-country'], 'FR')
+        # tvg-logo takes precedence over logo, even when empty
+        self.assertEqual(M3UParser()._parse_extinf('#EXTINF:-1 logo="x" tvg-logo="",T')['logo'], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.db.base_class import Base
+from app.models.m3u_source import M3USource, SourceType
+from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.m3u_selection import M3USelection, SelectionType
+from app.api.endpoints.m3u_selection import get_m3u_groups, get_selected_groups
+
+
+class TestM3UGroupCounts(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[
+            M3USource.__table__, M3UEntry.__table__, M3USelection.__table__
+        ])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(M3USource(id=1, name="src", source_type=SourceType.FILE, file_path="/tmp/x.m3u",
+                              output_dir="/tmp/out"))
+        for i, (group, entry_type) in enumerate([
+            ("Films", EntryType.MOVIE), ("Films", EntryType.MOVIE), ("Films", EntryType.SERIES),
+            (None, EntryType.MOVIE), ("Uncategorized", EntryType.MOVIE), ("Kids", EntryType.SERIES),
+        ]):
+            self.db.add(M3UEntry(m3u_source_id=1, title=f"T{i}", url=f"http://h/{i}",
+                                 group_title=group, entry_type=entry_type))
+        self.db.add(M3USelection(m3u_source_id=1, group_title="Films", selection_type=SelectionType.MOVIE))
+        self.db.add(M3USelection(m3u_source_id=1, group_title="Gone", selection_type=SelectionType.SERIES))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_groups_are_counted_per_type(self):
+        groups = {(g["group_title"], g["entry_type"]): (g["count"], g["selected"])
+                  for g in get_m3u_groups(1, self.db)}
+        self.assertEqual(groups, {
+            ("Films", "movie"): (2, True),
+            ("Films", "series"): (1, False),
+            ("Uncategorized", "movie"): (2, False),
+            ("Kids", "series"): (1, False),
+        })
+
+    def test_selected_groups(self):
+        selected = {(g["group_title"], g["entry_type"]): g["count"] for g in get_selected_groups(1, self.db)}
+        self.assertEqual(selected, {("Films", "movie"): 2, ("Gone", "series"): 0})
+
+    def test_counts_use_the_group_index(self):
+        plan = self.db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT group_title, entry_type, count(*) FROM m3u_entries "
+            "WHERE m3u_source_id = 1 GROUP BY group_title, entry_type"
+        )).fetchall()
+        detail = " ".join(row[-1] for row in plan)
+        self.assertIn("COVERING INDEX ix_m3u_entries_source_group", detail)
+        self.assertNotIn("TEMP B-TREE", detail)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import asyncio
+import gzip
+import hashlib
+import shutil
+import tempfile
+import sys
+import os
+from unittest.mock import patch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.m3u_fetch import DownloadBudgetExceeded
+from app.services.m3u_upload import PlaylistUpload
+
+BODY = b'#EXTINF:-1,First\r\nhttp://h/movie/0.mp4\r\n' + b''.join(
+    b'#EXTINF:-1 group-title="G",Movie %d\nhttp://h/movie/%d.mp4\n' % (i, i) for i in range(1, 500)
+)
+
+
+def chunked(data: bytes, size: int):
+    async def chunks():
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+    return chunks()
+
+
+class TestM3UUpload(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.target = os.path.join(self.dir, "source.m3u")
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def upload(self, data: bytes, chunk_size: int = 7, max_bytes: int = 10 ** 9):
+        async def run():
+            async with PlaylistUpload(self.target, max_bytes) as upload:
+                await upload.write_all(chunked(data, chunk_size))
+                return await upload.commit()
+        return self.loop.run_until_complete(run())
+
+    def test_counts_and_hashes_while_streaming(self):
+        for data in (BODY, gzip.compress(BODY)):
+            result = self.upload(data)
+            self.assertEqual(result.entries, 500)
+            self.assertEqual(result.size, len(BODY))
+            self.assertEqual(result.sha256, hashlib.sha256(BODY).hexdigest())
+            with open(self.target, 'rb') as f:
+                self.assertEqual(f.read(), BODY)
+
+    def test_replacement_is_atomic(self):
+        self.upload(b'#EXTM3U\nold\n')
+        with open(self.target, 'rb') as reader:
+            self.upload(BODY)
+            # A reader of the previous file is not affected
+            self.assertEqual(reader.read(), b'#EXTM3U\nold\n')
+        self.assertEqual(os.listdir(self.dir), ["source.m3u"])
+
+    def test_failed_upload_keeps_previous_file(self):
+        self.upload(b'#EXTM3U\nold\n')
+        with self.assertRaises(DownloadBudgetExceeded):
+            self.upload(BODY, max_bytes=100)
+        with self.assertRaises(ValueError):
+            self.upload(gzip.compress(BODY)[:50])
+        # The temporary file is removed even if it cannot be opened
+        with patch("app.services.m3u_upload.aiofiles.open", side_effect=OSError("disk full")), \
+                self.assertRaises(OSError):
+            self.upload(BODY)
+        with open(self.target, 'rb') as f:
+            self.assertEqual(f.read(), b'#EXTM3U\nold\n')
+        self.assertEqual(os.listdir(self.dir), ["source.m3u"])
+
+
+if __name__ == '__main__':
+    unittest.main()
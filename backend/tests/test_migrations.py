@@ -0,0 +1,126 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+from app.core.schema import Base, alembic_config, include_object, upgrade_database
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.dir, 'xtream.db')}")
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def assert_matches_models(self):
+        with self.engine.connect() as conn:
+            context = MigrationContext.configure(conn, opts={"include_object": include_object})
+            diff = compare_metadata(context, Base.metadata)
+        self.assertEqual(diff, [])
+
+    def explain(self, sql: str) -> str:
+        with self.engine.connect() as conn:
+            return " ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+    def test_new_database_matches_models(self):
+        upgrade_database(self.engine)
+        self.assert_matches_models()
+        # Running again is a no-op
+        upgrade_database(self.engine)
+
+    def test_database_created_before_migrations(self):
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE sync_state (id INTEGER NOT NULL PRIMARY KEY, subscription_id INTEGER NOT NULL, "
+                "type VARCHAR NOT NULL, last_sync DATETIME, status VARCHAR NOT NULL, "
+                "items_added INTEGER NOT NULL, items_deleted INTEGER NOT NULL, error_message VARCHAR, "
+                "task_id VARCHAR, progress_current INTEGER NOT NULL, progress_total INTEGER NOT NULL, "
+                "progress_phase VARCHAR)"
+            ))
+            conn.execute(text("CREATE INDEX ix_sync_state_id ON sync_state (id)"))
+            conn.execute(text("CREATE INDEX ix_sync_state_subscription_id ON sync_state (subscription_id)"))
+            for row_id in (1, 2, 3):
+                conn.execute(text(
+                    "INSERT INTO sync_state VALUES (:id, 1, 'movies', NULL, 'idle', 0, 0, NULL, NULL, 0, 0, NULL)"
+                ), {"id": row_id})
+            conn.execute(text(
+                "CREATE TABLE m3u_sources (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL, "
+                "source_type VARCHAR(4) NOT NULL, url VARCHAR, file_path VARCHAR, output_dir VARCHAR NOT NULL, "
+                "movies_dir VARCHAR, series_dir VARCHAR, is_active BOOLEAN, sync_status VARCHAR, "
+                "last_sync DATETIME, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+                "updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP))"
+            ))
+            conn.execute(text("CREATE INDEX ix_m3u_sources_id ON m3u_sources (id)"))
+            conn.execute(text("CREATE UNIQUE INDEX ix_m3u_sources_name ON m3u_sources (name)"))
+
+        upgrade_database(self.engine)
+        self.assert_matches_models()
+        with self.engine.connect() as conn:
+            # Duplicate sync states are merged into the oldest one
+            self.assertEqual(conn.execute(text("SELECT id FROM sync_state")).scalars().all(), [1])
+            head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+            self.assertEqual(conn.execute(text("SELECT version_num FROM alembic_version")).scalar(), head)
+        self.assertIn("m3u_hash", {c["name"] for c in inspect(self.engine).get_columns("m3u_sources")})
+
+    def test_content_stats_are_backfilled(self):
+        config = alembic_config()
+        with self.engine.begin() as conn:
+            config.attributes["connection"] = conn
+            command.upgrade(config, "0003")
+            conn.execute(text(
+                "INSERT INTO subscriptions (id, name, xtream_url, username, password, movies_dir, series_dir) "
+                "VALUES (1, 'sub', 'http://h', 'u', 'p', '/m', '/s')"
+            ))
+            conn.execute(text("INSERT INTO movie_cache (subscription_id, stream_id) VALUES (1, 1), (1, 2)"))
+            conn.execute(text("INSERT INTO series_cache (subscription_id, series_id) VALUES (1, 1)"))
+            conn.execute(text(
+                "INSERT INTO m3u_sources (id, name, source_type, output_dir) VALUES (3, 'src', 'FILE', '/o')"
+            ))
+            conn.execute(text(
+                "INSERT INTO m3u_entries (m3u_source_id, title, url, entry_type) "
+                "VALUES (3, 'A', 'http://h/1', 'MOVIE'), (3, 'B', 'http://h/2', 'SERIES'), (3, 'C', 'http://h/3', 'SERIES')"
+            ))
+
+        upgrade_database(self.engine)
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT source_type, source_id, movies, series FROM content_stats ORDER BY source_type"
+            )).all()
+        self.assertEqual([tuple(r) for r in rows], [("m3u", 3, 1, 2), ("xtream", 1, 2, 1)])
+
+    def test_hot_queries_use_composite_indexes(self):
+        upgrade_database(self.engine)
+        for sql, index in (
+            ("SELECT * FROM sync_state WHERE subscription_id = 1 AND type = 'movies'",
+             "ux_sync_state_subscription_type"),
+            ("SELECT * FROM selected_categories WHERE subscription_id = 1 AND type = 'movie'",
+             "ix_selected_categories_subscription_type"),
+            ("SELECT * FROM categories WHERE subscription_id = 1 AND type = 'series'",
+             "ix_categories_subscription_type"),
+            ("DELETE FROM movie_cache WHERE subscription_id = 1 AND stream_id = 42",
+             "ux_movie_cache_subscription_stream"),
+            ("DELETE FROM series_cache WHERE subscription_id = 1 AND series_id = 42",
+             "ux_series_cache_subscription_series"),
+            ("SELECT group_title, entry_type, count(*) FROM m3u_entries WHERE m3u_source_id = 1 "
+             "GROUP BY group_title, entry_type", "ix_m3u_entries_source_group"),
+            ("SELECT * FROM m3u_entries WHERE m3u_source_id = 1 AND entry_key = 'url:x'",
+             "ix_m3u_entries_source_key"),
+            ("SELECT * FROM schedules WHERE enabled = 1 AND next_run <= '2026-01-01'",
+             "ix_schedules_enabled_next_run"),
+        ):
+            with self.subTest(index=index):
+                self.assertIn(f"INDEX {index}", self.explain(sql))
+
+
+if __name__ == '__main__':
+    unittest.main()
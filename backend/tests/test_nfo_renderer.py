@@ -0,0 +1,104 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.file_manager import FileManager
+from app.services.nfo_renderer import NfoRenderer, NfoBuilder, escape_xml, is_valid_tmdb_id, renderer
+
+
+class TestNfoRenderer(unittest.TestCase):
+    def setUp(self):
+        self.fm = FileManager("/tmp/test_output")
+
+    def test_escape_xml(self):
+        self.assertEqual(escape_xml('a & <b> "c" \'d\''), 'a &amp; &lt;b&gt; &quot;c&quot; &apos;d&apos;')
+        self.assertEqual(escape_xml('&amp;'), '&amp;amp;')
+        self.assertEqual(escape_xml(None), '')
+        self.assertEqual(escape_xml(0), '')
+
+    def test_is_valid_tmdb_id(self):
+        for value in ['12345', 42, ' 7 ']:
+            self.assertTrue(is_valid_tmdb_id(value), value)
+        for value in [None, '', '0', 0, 'null', 'None', 'abc', -3]:
+            self.assertFalse(is_valid_tmdb_id(value), value)
+
+    def test_movie_nfo_full_output(self):
+        data = {
+            "name": "EN - Big_Movie_2024", "tmdb": "12345", "imdb": "tt0001",
+            "plot": "Plot & more", "year": "2024-05-01", "rating": "4.1", "rating_5based": 4.1,
+            "genre": "Action, Drama / Sci-Fi", "cast": "A, B", "duration": "01:45:10",
+            "movie_image": "http://x/img.jpg",
+            "video": {"codec_name": "hevc", "width": 3840, "height": 2160, "bit_rate": "12500000"},
+            "audio": {"codec_name": "eac3", "channels": 6, "tags": {"language": "eng"}},
+            "duration_secs": "7260",
+        }
+        expected = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n<movie>\n'
+            '  <title>Big Movie (2024)</title>\n'
+            '  <plot>Plot &amp; more</plot>\n'
+            '  <outline>Plot &amp; more</outline>\n'
+            '  <userrating>8</userrating>\n'
+            '  <uniqueid type="tmdb" default="true">12345</uniqueid>\n'
+            '  <uniqueid type="imdb">tt0001</uniqueid>\n'
+            '  <year>2024</year>\n'
+            '  <genre>Action</genre>\n'
+            '  <genre>Drama</genre>\n'
+            '  <genre>Sci-Fi</genre>\n'
+            '  <actor><name>A</name></actor>\n'
+            '  <actor><name>B</name></actor>\n'
+            '  <runtime>105</runtime>\n'
+            '  <thumb>http://x/img.jpg</thumb>\n'
+            '  <fanart><thumb>http://x/img.jpg</thumb></fanart>\n'
+            '  <fileinfo>\n    <streamdetails>\n'
+            '      <video>\n'
+            '        <codec>hevc</codec>\n'
+            '        <width>3840</width>\n'
+            '        <height>2160</height>\n'
+            '        <durationinseconds>7260</durationinseconds>\n'
+            '        <bitrate>12500</bitrate>\n'
+            '      </video>\n'
+            '      <audio>\n'
+            '        <codec>eac3</codec>\n'
+            '        <channels>6</channels>\n'
+            '        <language>eng</language>\n'
+            '      </audio>\n'
+            '    </streamdetails>\n  </fileinfo>\n'
+            '</movie>'
+        )
+        nfo = self.fm.generate_movie_nfo(data, format_date=True, clean_name=True)
+        self.assertEqual(nfo, expected)
+
+    def test_invalid_custom_regex_falls_back_to_default(self):
+        nfo = self.fm.generate_show_nfo({"name": "FR - Series Name"}, prefix_regex=r'([bad')
+        self.assertIn("<title>Series Name</title>", nfo)
+
+    def test_episode_nfo_strips_series_name(self):
+        ep = [{"title": "My Show - Pilot", "info": [{"duration": "00:42:00"}]}]
+        nfo = self.fm.generate_episode_nfo(ep, "My Show", 1, 2)
+        self.assertIn("<title>Pilot</title>", nfo)
+        self.assertIn("<showtitle>My Show</showtitle>", nfo)
+        self.assertIn("<runtime>42</runtime>", nfo)
+        self.assertTrue(nfo.endswith("</episodedetails>"))
+
+    def test_register_custom_template(self):
+        def minimal(data, normalize):
+            b = NfoBuilder('movie')
+            b.element('title', normalize(data['name']))
+            return b.render()
+
+        custom = NfoRenderer()
+        custom.register('movie', minimal)
+        nfo = custom.render('movie', {"name": "FR - A & B"})
+        self.assertEqual(nfo, '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>\n'
+                              '<movie>\n  <title>A &amp; B</title>\n</movie>')
+        # The shared renderer is untouched
+        self.assertIn('<plot>p</plot>', renderer.render('movie', {"name": "x", "plot": "p"}))
+
+    def test_unknown_template(self):
+        with self.assertRaises(KeyError):
+            renderer.render('album', {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import asyncio
+import tempfile
+import shutil
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base_class import Base
+from app.models.output_file import OutputFile
+from app.services.file_manager import FileManager
+from app.services.output_manifest import OutputManifest, purge_root, OWNER_XTREAM
+
+
+class TestOutputManifest(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[OutputFile.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.root = tempfile.mkdtemp()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.db.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _fm(self):
+        return FileManager(self.root, OutputManifest(self.db, self.root, OWNER_XTREAM, 1))
+
+    def _write(self, fm, rel_path, content, source_key):
+        path = os.path.join(self.root, rel_path)
+        fm.ensure_directory(os.path.dirname(path))
+        self.loop.run_until_complete(fm.write_strm(path, content, source_key))
+        return path
+
+    def test_record_and_reload(self):
+        fm = self._fm()
+        path = self._write(fm, "Action/Movie.strm", "http://x/1.mp4", "movie:1")
+        self.db.commit()
+
+        row = self.db.query(OutputFile).one()
+        self.assertEqual(row.rel_path, os.path.join("Action", "Movie.strm"))
+        self.assertEqual(row.size, len("http://x/1.mp4"))
+        self.assertEqual(row.source_key, "movie:1")
+
+        fm = self._fm()
+        self.assertTrue(fm.tracks("movie:1"))
+        self.assertTrue(fm.file_exists(path))
+        self.assertFalse(fm.file_exists(os.path.join(self.root, "Action", "Other.strm")))
+
+    def test_delete_source_keeps_current_paths_and_prunes_dirs(self):
+        fm = self._fm()
+        old = self._write(fm, "Old Category/Movie/Movie.strm", "a", "movie:1")
+        new = self._write(fm, "New Category/Movie/Movie.strm", "a", "movie:1")
+
+        deleted = self.loop.run_until_complete(fm.delete_source_files("movie:1", keep=[new]))
+        self.db.commit()
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(os.path.exists(old))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "Old Category")))
+        self.assertTrue(os.path.exists(new))
+        self.assertEqual(self.db.query(OutputFile).count(), 1)
+
+    def test_other_owner_files_are_not_touched(self):
+        other = FileManager(self.root, OutputManifest(self.db, self.root, OWNER_XTREAM, 2))
+        theirs = self._write(other, "Action/Theirs.strm", "b", "movie:1")
+        self.db.commit()
+
+        fm = self._fm()
+        self.assertFalse(fm.tracks("movie:1"))
+        self.loop.run_until_complete(fm.delete_source_files("movie:1"))
+        self.assertTrue(os.path.exists(theirs))
+
+    def test_adopt_files_records_legacy_strms(self):
+        show = os.path.join(self.root, "Drama", "Show")
+        os.makedirs(os.path.join(show, "Season 01"))
+        for name, url in (("Season 01/S01E01.strm", "http://h/1"), ("tvshow.nfo", "<tvshow/>")):
+            with open(os.path.join(show, name), "w") as f:
+                f.write(url)
+        fm = self._fm()
+
+        self.assertEqual(fm.adopt_files(show, "series:5"), 1)
+        self.assertTrue(fm.tracks("series:5"))
+        episode = os.path.join(show, "Season 01", "S01E01.strm")
+        self.assertTrue(fm.is_current(episode, "http://h/1"))
+
+        # Tracked now, so deleting the series removes the adopted episode as well
+        self.loop.run_until_complete(fm.delete_source_files("series:5"))
+        self.assertFalse(os.path.exists(episode))
+
+    def test_purge_root(self):
+        fm = self._fm()
+        self._write(fm, "A/one.strm", "1", "movie:1")
+        self._write(fm, "B/two.strm", "2", "movie:2")
+        unmanaged = os.path.join(self.root, "B", "notes.txt")
+        with open(unmanaged, "w") as f:
+            f.write("keep me")
+        self.db.commit()
+
+        deleted, tracked = purge_root(self.db, self.root)
+        self.db.commit()
+
+        self.assertTrue(tracked)
+        self.assertEqual(deleted, 2)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "A")))
+        self.assertTrue(os.path.exists(unmanaged))
+        self.assertEqual(self.db.query(OutputFile).count(), 0)
+        self.assertEqual(purge_root(self.db, self.root), (0, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
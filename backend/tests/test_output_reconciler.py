@@ -0,0 +1,129 @@
+import unittest
+import asyncio
+import tempfile
+import shutil
+import time
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.base_class import Base
+from app.models.cache import MovieCache, SeriesCache
+from app.models.content_stats import ContentStats
+from app.models.output_file import OutputFile
+from app.services.file_manager import FileManager
+from app.services.output_manifest import OutputManifest, OWNER_XTREAM
+from app.services.output_reconciler import ExpectedTree, reconcile_chunk, walk_tree
+
+
+class TestOutputReconciler(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[OutputFile.__table__, MovieCache.__table__,
+                                                 SeriesCache.__table__, ContentStats.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.root = tempfile.mkdtemp()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.db.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _write(self, rel_path, source_key):
+        fm = FileManager(self.root, OutputManifest(self.db, self.root, OWNER_XTREAM, 1))
+        path = os.path.join(self.root, rel_path)
+        fm.ensure_directory(os.path.dirname(path))
+        self.loop.run_until_complete(fm.write_strm(path, "http://x", source_key))
+        self.db.commit()
+        return path
+
+    def _orphan(self, rel_path, age=3600):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("stale")
+        past = time.time() - age
+        os.utime(path, (past, past))
+        return path
+
+    def _sweep(self, budget):
+        cursor, chunks, visited = None, 0, []
+        while True:
+            chunk = walk_tree(self.root, cursor, budget)
+            reconcile_chunk(self.db, self.root, chunk, ExpectedTree.load(self.db, self.root, chunk), True)
+            self.db.commit()
+            visited.extend(d.parts for d in chunk.dirs)
+            chunks += 1
+            if chunk.done:
+                return chunks, visited
+            cursor = chunk.cursor
+
+    def test_resumable_walk_visits_each_directory_once(self):
+        for cat in ("A", "B", "C"):
+            for title in ("x", "y"):
+                self._write(f"{cat}/{title}/{title}.strm", f"movie:{cat}{title}")
+
+        chunks, visited = self._sweep(budget=2)
+
+        self.assertGreater(chunks, 1)
+        self.assertEqual(len(visited), len(set(visited)))
+        self.assertEqual(len(visited), 10)  # root + 3 categories + 6 titles
+        self.assertEqual(visited, sorted(visited))
+
+    def test_chunk_loads_only_its_rows(self):
+        for cat in ("A", "B", "C"):
+            self._write(f"{cat}/x/x.strm", f"movie:{cat}")
+        shutil.rmtree(os.path.join(self.root, "C", "x"))
+
+        def loaded(chunk):
+            tree = ExpectedTree.load(self.db, self.root, chunk)
+            return sorted(os.path.join(*d, name) for d, files in tree.files.items() for name in files)
+
+        # Just B/x walked: none of the other directories' rows are read
+        chunk = walk_tree(self.root, ("B",), 2)
+        self.assertEqual([d.parts for d in chunk.dirs], [("B", "x")])
+        self.assertEqual(loaded(chunk), ["B/x/x.strm"])
+
+        # C is walked and its manifest subdirectory x is gone from disk
+        chunk = walk_tree(self.root, ("B", "x"), 1000)
+        self.assertEqual([d.parts for d in chunk.dirs], [("C",)])
+        self.assertEqual(loaded(chunk), ["C/x/x.strm"])
+        self.assertEqual([row.rel_path for row in ExpectedTree.load(self.db, self.root, chunk).missing(chunk.dirs[0])],
+                         ["C/x/x.strm"])
+
+    def test_removes_orphans_and_keeps_tracked_files(self):
+        kept = self._write("Action/Movie.strm", "movie:1")
+        orphan = self._orphan("Old Category/Movie.strm")
+        fresh = self._orphan("Action/Fresh.nfo", age=0)
+        unmanaged = self._orphan("Action/poster.jpg")
+
+        self._sweep(budget=1000)
+
+        self.assertTrue(os.path.exists(kept))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertFalse(os.path.exists(os.path.dirname(orphan)))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertTrue(os.path.exists(unmanaged))
+
+    def test_missing_files_are_queued_for_resync(self):
+        self._write("Action/Movie.strm", "movie:7")
+        gone = self._write("Drama/Other/Other.strm", "movie:8")
+        self.db.add_all([
+            MovieCache(subscription_id=1, stream_id=7),
+            MovieCache(subscription_id=1, stream_id=8),
+        ])
+        self.db.commit()
+        shutil.rmtree(os.path.dirname(os.path.dirname(gone)))
+
+        self._sweep(budget=1000)
+
+        self.assertEqual([r.source_key for r in self.db.query(OutputFile)], ["movie:7"])
+        self.assertEqual([c.stream_id for c in self.db.query(MovieCache)], [7])
+        self.assertEqual(self.db.query(ContentStats.movies).scalar(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import unicodedata
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.path_planner import PathPlanner, fit_component, truncate_bytes
+
+
+class TestPathPlanner(unittest.TestCase):
+    def test_collisions_are_disambiguated_deterministically(self):
+        def plan(order):
+            planner = PathPlanner("/out")
+            for stream_id in order:
+                planner.add(stream_id, "Action", "Movie", stream_id)
+            return planner.resolve()
+
+        forward, backward = plan([10, 9, 100]), plan([100, 9, 10])
+        self.assertEqual(forward, backward)
+        self.assertEqual(forward[9].file(".strm"), "/out/Action/Movie.strm")
+        self.assertEqual(forward[10].stem, "Movie [10]")
+        self.assertEqual(forward[100].stem, "Movie [100]")
+
+    def test_collisions_ignore_case_and_unicode_form(self):
+        planner = PathPlanner("/out")
+        planner.add(1, "Drama", unicodedata.normalize("NFD", "Amélie"), 1)
+        planner.add(2, "Drama", "AMÉLIE", 2)
+        plan = planner.resolve()
+        self.assertEqual(plan[1].stem, "Amélie")
+        self.assertEqual(plan[2].stem, "AMÉLIE [2]")
+        self.assertEqual(planner.collisions, 1)
+
+    def test_suffix_does_not_collide_with_existing_name(self):
+        planner = PathPlanner("/out")
+        planner.add(1, "", "Movie", 1)
+        planner.add(2, "", "Movie", 2)
+        planner.add(3, "", "Movie [2]", 3)
+        stems = {p.stem for p in planner.resolve().values()}
+        self.assertEqual(len(stems), 3)
+
+    def test_duplicate_keys_are_planned_once(self):
+        planner = PathPlanner("/out")
+        self.assertTrue(planner.add(1, "A", "Movie", 1))
+        self.assertFalse(planner.add(1, "B", "Movie", 1))
+        self.assertEqual(len(planner), 1)
+        self.assertEqual(planner.duplicates, 1)
+
+    def test_folder_claims(self):
+        planner = PathPlanner("/out/")
+        planner.add(5, "Action", "Movie {tmdb-55}", 5, folder=True)
+        planned = planner.resolve()[5]
+        self.assertEqual(planned.file(".nfo"), "/out/Action/Movie {tmdb-55}/Movie {tmdb-55}.nfo")
+
+    def test_byte_length_truncation(self):
+        self.assertEqual(truncate_bytes("ééé", 5), "éé")
+        name = "é" * 200  # 400 bytes of UTF-8
+        planner = PathPlanner("/out")
+        planner.add(1, name, name, 1)
+        planner.add(2, name, name, 2)
+        plan = planner.resolve()
+        for planned in plan.values():
+            for component in planned.file(".strm").split("/"):
+                self.assertLessEqual(len(component.encode("utf-8")), 255)
+        self.assertTrue(plan[2].stem.endswith(" [2]"))
+        self.assertEqual(os.path.dirname(plan[1].file(".strm")), "/out/" + fit_component(name))
+
+    def test_total_path_length(self):
+        planner = PathPlanner("/out", max_path_bytes=64)
+        planner.add(1, "Category", "x" * 100, 1, folder=True)
+        path = planner.resolve()[1].file(".strm")
+        self.assertLessEqual(len(path.encode("utf-8")), 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
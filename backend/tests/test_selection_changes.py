@@ -0,0 +1,173 @@
+import asyncio
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+from unittest.mock import AsyncMock, MagicMock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from app.api.endpoints import m3u_selection, selection
+from app.core.database import create_db_engine
+from app.core.schema import upgrade_database
+from app.models.cache import MovieCache
+from app.models.m3u_selection import M3USelection, SelectionType
+from app.models.m3u_source import M3USource
+from app.models.selection import SelectedCategory
+from app.models.selection_change import SelectionChange
+from app.models.subscription import Subscription
+from app.models.sync_state import SyncState, SyncStatus, SyncType
+from app.services.file_manager import FileManager
+from app.services.selection_changes import acknowledge_selection_changes, pending_selection_change
+from app.tasks.sync import process_movies
+
+
+class TestSelectionChanges(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_db_engine(f"sqlite:///{os.path.join(self.dir, 'xtream.db')}")
+        upgrade_database(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        with self.Session() as db:
+            db.add(Subscription(id=1, name="sub", xtream_url="http://h", username="u", password="p",
+                                movies_dir=os.path.join(self.dir, "movies"), series_dir="/s"))
+            db.add(M3USource(id=1, name="m3u", source_type="file", output_dir=os.path.join(self.dir, "m3u")))
+            db.commit()
+
+        def get_db():
+            with self.Session() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(selection.router, prefix="/selection")
+        app.include_router(m3u_selection.router, prefix="/m3u-selection")
+        app.dependency_overrides[selection.get_db] = get_db
+        app.dependency_overrides[m3u_selection.get_db] = get_db
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def select_movies(self, *category_ids):
+        response = self.client.post("/selection/movies/1", json={"categories": [
+            {"category_id": c, "category_name": f"Category {c}"} for c in category_ids
+        ]})
+        self.assertEqual(response.status_code, 200)
+
+    def selected(self, db):
+        return {c.category_id: c.id for c in db.query(SelectedCategory).filter_by(subscription_id=1, type="movie")}
+
+    def test_save_writes_only_the_difference(self):
+        self.select_movies("1", "2")
+        with self.Session() as db:
+            before = self.selected(db)
+        self.select_movies("2", "3", "3")
+
+        with self.Session() as db:
+            after = self.selected(db)
+            self.assertEqual(set(after), {"2", "3"})
+            self.assertEqual(after["2"], before["2"])  # kept rows are not rewritten
+            changes = [(c.added, c.removed) for c in db.query(SelectionChange).order_by(SelectionChange.id)]
+            self.assertEqual(changes, [(["1", "2"], []), (["3"], ["1"])])
+
+        # Saving the same selection again is not a change
+        self.select_movies("2", "3")
+        with self.Session() as db:
+            self.assertEqual(db.query(SelectionChange).count(), 2)
+
+    def test_pending_changes_are_netted(self):
+        self.select_movies("1")
+        self.select_movies("1", "2")
+        self.select_movies("2")
+        with self.Session() as db:
+            change = pending_selection_change(db, "xtream", 1, "movie")
+            self.assertEqual((change.added, change.removed), ({"2"}, set()))
+
+            acknowledge_selection_changes(db, "xtream", 1, "movie", change.last_id)
+            db.commit()
+            self.assertEqual(pending_selection_change(db, "xtream", 1, "movie").last_id, None)
+
+    def test_group_selection_diff(self):
+        groups = [{"group_title": "Action", "entry_type": "movie"}, {"group_title": "Drama", "entry_type": "series"},
+                  {"group_title": "Live", "entry_type": "live"}]
+        response = self.client.post("/m3u-selection/1", json={"groups": groups})
+        self.assertEqual(response.json()["added"], 2)
+
+        # Scoped to movies: the series selection is left alone
+        response = self.client.post("/m3u-selection/1?selection_type=movie",
+                                    json={"groups": [{"group_title": "Comedy", "entry_type": "movie"}]})
+        self.assertEqual((response.json()["added"], response.json()["removed"]), (1, 1))
+        with self.Session() as db:
+            rows = {(s.group_title, s.selection_type) for s in db.query(M3USelection)}
+            self.assertEqual(rows, {("Comedy", SelectionType.MOVIE), ("Drama", SelectionType.SERIES)})
+            change = pending_selection_change(db, "m3u", 1, "movie")
+            self.assertEqual((change.added, change.removed), ({"Comedy"}, set()))
+
+        self.assertEqual(self.client.post("/m3u-selection/1?selection_type=live", json={"groups": []}).status_code, 400)
+
+    def synced_movie_then_added_category(self):
+        """Category 1 synced with movie 10, then category 2 added to the selection"""
+        self.select_movies("1")
+        with self.Session() as db:
+            db.add(MovieCache(subscription_id=1, stream_id=10, name="Film", category_id="1", container_extension="mp4"))
+            db.add(SyncState(subscription_id=1, type=SyncType.MOVIES, status=SyncStatus.SUCCESS))
+            acknowledge_selection_changes(db, "xtream", 1, "movie", pending_selection_change(db, "xtream", 1, "movie").last_id)
+            db.commit()
+        self.select_movies("1", "2")
+
+    def provider(self, categories, streams):
+        xc = MagicMock()
+        xc.get_vod_categories = AsyncMock(return_value=categories)
+        xc.get_vod_streams = AsyncMock(side_effect=lambda category_id=None: [
+            s for s in streams if category_id in (None, s["category_id"])
+        ])
+        xc.get_vod_info = AsyncMock(return_value={})
+        xc.get_stream_url.side_effect = lambda kind, stream_id, ext: f"http://h/movie/{stream_id}.{ext}"
+        return xc
+
+    def sync(self, xc):
+        with self.Session() as db:
+            asyncio.run(process_movies(db, xc, FileManager(os.path.join(self.dir, "movies")), 1))
+
+    def test_sync_lists_only_added_categories(self):
+        self.synced_movie_then_added_category()
+        xc = self.provider([{"category_id": "1", "category_name": "One"}, {"category_id": "2", "category_name": "Two"}], [
+            {"stream_id": 10, "name": "Film", "category_id": "1", "container_extension": "mp4"},
+            {"stream_id": 10, "name": "Film", "category_id": "2", "container_extension": "mp4"},
+            {"stream_id": 20, "name": "New", "category_id": "2", "container_extension": "mp4"},
+        ])
+        self.sync(xc)
+
+        xc.get_vod_streams.assert_awaited_once_with("2")
+        with self.Session() as db:
+            self.assertEqual({m.stream_id for m in db.query(MovieCache)}, {10, 20})
+            state = db.query(SyncState).filter_by(subscription_id=1, type=SyncType.MOVIES).one()
+            self.assertEqual((state.status, state.items_added, state.items_deleted), (SyncStatus.SUCCESS, 1, 0))
+            self.assertIsNone(pending_selection_change(db, "xtream", 1, "movie").last_id)
+
+    def test_added_category_sharing_a_folder_gets_a_full_pass(self):
+        self.synced_movie_then_added_category()
+        folder = os.path.join(self.dir, "movies", "Action")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "Film.strm"), "w") as f:
+            f.write("http://h/movie/10.mp4")
+
+        # Both categories are written to "Action": the new "Film" must not take the existing file's path
+        xc = self.provider([{"category_id": "1", "category_name": "Action"}, {"category_id": "2", "category_name": "Action"}], [
+            {"stream_id": 10, "name": "Film", "category_id": "1", "container_extension": "mp4"},
+            {"stream_id": 20, "name": "Film", "category_id": "2", "container_extension": "mp4"},
+        ])
+        self.sync(xc)
+
+        xc.get_vod_streams.assert_awaited_once_with()
+        with open(os.path.join(folder, "Film.strm")) as f:
+            self.assertEqual(f.read(), "http://h/movie/10.mp4")
+        with open(os.path.join(folder, "Film [20].strm")) as f:
+            self.assertEqual(f.read(), "http://h/movie/20.mp4")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.title_normalizer import TitleNormalizer, TitleSettings, sanitize_path_component, sanitize_m3u_name
+
+
+class TestTitleNormalizer(unittest.TestCase):
+    def test_from_settings(self):
+        titles = TitleNormalizer.from_settings({
+            "PREFIX_REGEX": "",
+            "FORMAT_DATE_IN_TITLE": "true",
+            "CLEAN_NAME": "false",
+        })
+        self.assertEqual(titles.settings, TitleSettings(None, True, False))
+        self.assertEqual(titles.display_title("FR - Movie_2024"), "Movie (2024)")
+
+    def test_display_title_depends_on_settings(self):
+        default = TitleNormalizer()
+        cleaned = TitleNormalizer(TitleSettings(clean_name=True))
+        self.assertEqual(default.display_title("EN - Big_Movie"), "Big_Movie")
+        self.assertEqual(cleaned.display_title("EN - Big_Movie"), "Big Movie")
+        custom = TitleNormalizer(TitleSettings(prefix_regex=r'^TEST - '))
+        self.assertEqual(custom.display_title("TEST - Custom Movie"), "Custom Movie")
+
+    def test_episode_title(self):
+        titles = TitleNormalizer()
+        cases = [
+            ("My Show - S01E02 - Pilot", "Pilot"),
+            ("my show: 1x02 - Pilot", "Pilot"),
+            ("S01E02", ""),
+            ("Other Title", "Other Title"),
+            ("", ""),
+        ]
+        for raw, expected in cases:
+            self.assertEqual(titles.episode_title(raw, "My Show"), expected, raw)
+
+    def test_sanitizers(self):
+        self.assertEqual(sanitize_path_component('a/b:c*?"<>|'), 'a_b_c______')
+        self.assertEqual(len(sanitize_path_component('x' * 300)), 200)
+        self.assertEqual(sanitize_m3u_name(' Movie: The (2024)! '), 'Movie The 2024')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from alembic import command
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from app.api import deps
+from app.api.endpoints import search
+from app.core.database import create_db_engine
+from app.core.schema import alembic_config, upgrade_database
+from app.models.cache import EpisodeCache, MovieCache, SeriesCache
+from app.models.m3u_entry import M3UEntry, EntryType
+from app.models.m3u_source import M3USource, SourceType
+from app.models.output_file import OutputFile
+from app.models.subscription import Subscription
+from app.services.db_writer import DBWriter
+from app.services.output_manifest import OWNER_XTREAM
+from app.services.title_search import search_titles
+
+
+class TestTitleSearch(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_db_engine(f"sqlite:///{os.path.join(self.dir, 'xtream.db')}")
+        upgrade_database(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        with self.Session() as db:
+            db.add(Subscription(id=1, name="provider", xtream_url="http://h", username="u", password="p",
+                                movies_dir="/m", series_dir="/s"))
+            db.add(M3USource(id=2, name="playlist", source_type=SourceType.FILE, output_dir="/o"))
+            db.add(MovieCache(subscription_id=1, stream_id=10, name="Star Wars", category_id="5"))
+            db.add(MovieCache(subscription_id=1, stream_id=11, name="Star Wars: The Empire Strikes Back"))
+            db.add(MovieCache(subscription_id=1, stream_id=12, name="Amélie"))
+            db.add(SeriesCache(subscription_id=1, series_id=20, name="Star Trek"))
+            db.add(EpisodeCache(id=300, subscription_id=1, series_id=20, title="The Star Wars Episode"))
+            db.add(M3UEntry(m3u_source_id=2, title="Star Wars", url="http://h/sw", group_title="Films",
+                            entry_type=EntryType.MOVIE))
+            db.add(OutputFile(owner_type=OWNER_XTREAM, owner_id=1, root="/m", rel_path="Star Wars/Star Wars.strm",
+                              source_key="movie:10", size=1, content_hash="x"))
+            db.commit()
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def titles(self, query):
+        with self.Session() as db:
+            return [(hit["kind"], hit["title"]) for hit in search_titles(db, query)]
+
+    def test_ranked_across_sources(self):
+        with self.Session() as db:
+            hits = search_titles(db, "star wars")
+        self.assertEqual({(h["kind"], h["title"]) for h in hits[:2]},
+                         {("movie", "Star Wars"), ("m3u", "Star Wars")})
+        self.assertEqual({(h["kind"], h["title"]) for h in hits[2:]},
+                         {("movie", "Star Wars: The Empire Strikes Back"), ("episode", "The Star Wars Episode")})
+        self.assertEqual(hits, sorted(hits, key=lambda h: -h["score"]))
+
+        movie = next(h for h in hits if h["kind"] == "movie" and h["title"] == "Star Wars")
+        self.assertEqual((movie["source_name"], movie["group"], movie["strm_path"]),
+                         ("provider", "5", os.path.join("/m", "Star Wars/Star Wars.strm")))
+        entry = next(h for h in hits if h["kind"] == "m3u")
+        self.assertEqual((entry["source_type"], entry["source_name"], entry["strm_path"]),
+                         ("m3u", "playlist", None))
+
+    def test_prefixes_and_accents(self):
+        self.assertEqual(self.titles("star tre"), [("series", "Star Trek")])
+        self.assertEqual(self.titles("amelie"), [("movie", "Amélie")])
+        self.assertEqual(self.titles("\"*"), [])
+
+    def test_index_follows_sync_writes(self):
+        writer = DBWriter(self.engine)
+        key, columns = ["subscription_id", "stream_id"], ["name", "category_id", "container_extension", "tmdb_id"]
+        row = {"subscription_id": 1, "stream_id": 12, "category_id": None, "container_extension": "mkv",
+               "tmdb_id": None}
+        writer.upsert(MovieCache.__table__, [dict(row, name="Le Fabuleux Destin d'Amélie Poulain")], key, columns)
+        writer.upsert(MovieCache.__table__, [dict(row, stream_id=13, name="Alien")], key, columns)
+        writer.delete(MovieCache.__table__, [{"subscription_id": 1, "stream_id": 10}])
+        writer.flush()
+        with self.Session() as db:
+            db.query(M3UEntry).delete()
+            db.commit()
+
+        self.assertEqual(self.titles("amelie"), [("movie", "Le Fabuleux Destin d'Amélie Poulain")])
+        self.assertEqual(self.titles("fabuleux"), [("movie", "Le Fabuleux Destin d'Amélie Poulain")])
+        self.assertEqual(self.titles("alien"), [("movie", "Alien")])
+        self.assertEqual({t for _, t in self.titles("star wars")},
+                         {"Star Wars: The Empire Strikes Back", "The Star Wars Episode"})
+        with self.engine.connect() as conn:
+            # One index row per titled cache row, nothing left behind
+            self.assertEqual(conn.execute(text("SELECT count(*) FROM title_search")).scalar(), 5)
+
+    def test_endpoint(self):
+        app = FastAPI()
+        app.include_router(search.router, prefix="/search")
+
+        def get_read_db():
+            db = self.Session()
+            try:
+                yield db
+            finally:
+                db.close()
+        app.dependency_overrides[deps.get_read_db] = get_read_db
+        client = TestClient(app)
+
+        hits = client.get("/search/", params={"q": "star", "limit": 2}).json()
+        self.assertEqual(len(hits), 2)
+        self.assertEqual(client.get("/search/", params={"q": ""}).status_code, 422)
+
+
+class TestTitleSearchMigration(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engine = create_db_engine(f"sqlite:///{os.path.join(self.dir, 'xtream.db')}")
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_existing_titles_are_indexed(self):
+        config = alembic_config()
+        with self.engine.begin() as conn:
+            config.attributes["connection"] = conn
+            command.upgrade(config, "0005")
+            conn.execute(text("INSERT INTO movie_cache (subscription_id, stream_id, name) VALUES (1, 1, 'Heat')"))
+            conn.execute(text("INSERT INTO movie_cache (subscription_id, stream_id) VALUES (1, 2)"))
+
+        upgrade_database(self.engine)
+        with sessionmaker(bind=self.engine)() as db:
+            self.assertEqual([h["title"] for h in search_titles(db, "heat")], ["Heat"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,14 @@ interface SyncStatus {
     error_message?: string;
 }
 
+interface CategoryRefresh {
+    task_id: string;
+    state: string;
+    phase?: string;
+    categories_synced?: number;
+    error?: string;
+}
+
 type SortKey = 'name' | 'id' | 'count';
 type SortDirection = 'asc' | 'desc';
 
@@ -152,12 +160,34 @@ export default function XTVSelection() {
         }
     };
 
+    // Categories are refreshed by a background task; poll it until it finishes
+    // States after which a refresh task will not change any more
+    const REFRESH_DONE_STATES = ['SUCCESS', 'FAILURE', 'REVOKED'];
+    // A task still PENDING after this many polls (one per second) is treated as lost,
+    // e.g. no worker is running or the task id expired
+    const REFRESH_MAX_POLLS = 120;
+
+    const waitForRefresh = async (taskId: string): Promise<CategoryRefresh> => {
+        for (let attempt = 0; attempt < REFRESH_MAX_POLLS; attempt++) {
+            const res = await api.get<CategoryRefresh>(`/selection/refresh/${taskId}`);
+            if (REFRESH_DONE_STATES.includes(res.data.state)) {
+                return res.data;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+        return { task_id: taskId, state: 'TIMEOUT', error: 'Category refresh did not finish in time, is the worker running?' };
+    };
+
     const syncMovies = async () => {
         if (!selectedSubId) return;
         setSyncingMovies(true);
         setError(null);
         try {
-            await api.post(`/selection/movies/sync/${selectedSubId}`);
+            const res = await api.post<{ task_id: string }>(`/selection/movies/sync/${selectedSubId}`);
+            const refresh = await waitForRefresh(res.data.task_id);
+            if (refresh.state !== 'SUCCESS') {
+                setError(refresh.error || "Failed to sync movie categories");
+            }
             await fetchMovies();
         } catch (error: any) {
             console.error("Failed to sync movie categories", error);
@@ -172,7 +202,11 @@ export default function XTVSelection() {
         setSyncingSeries(true);
         setError(null);
         try {
-            await api.post(`/selection/series/sync/${selectedSubId}`);
+            const res = await api.post<{ task_id: string }>(`/selection/series/sync/${selectedSubId}`);
+            const refresh = await waitForRefresh(res.data.task_id);
+            if (refresh.state !== 'SUCCESS') {
+                setError(refresh.error || "Failed to sync series categories");
+            }
             await fetchSeries();
         } catch (error: any) {
             console.error("Failed to sync series categories", error);